@@ -0,0 +1,153 @@
+"""Рассылка через имитацию Bot API: стандартная сессия aiogram против TunedAiohttpSession.
+
+Локальный aiohttp-сервер отвечает на sendMessage как Bot API, но часть
+запросов завершает ошибкой 502, а отдельные чаты получают 429 с retry_after
+(flood control). Стандартная сессия теряет такие сообщения, настроенная
+повторяет их и ждет окончания flood control только для нужного чата.
+Затем проверяются границы повторов: чат под бесконечным flood control
+отдает ошибку через max_retry_after секунд, sendMessage на закрытый порт
+(соединение не установлено) повторяется, а оборванный после отправки - нет.
+
+Запуск: python -m benchmarks.bot_api_session [сообщений] [одновременно]
+"""
+# Стандартные библиотеки
+import asyncio
+import random
+import sys
+import time
+
+# Сторонние библиотеки
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+
+# Локальные импорты
+from core.telegram_session import RetryMiddleware, TunedAiohttpSession
+
+TOKEN = "42:fake"
+FLOODED_CHAT = -1
+DROPPED_CHAT = -2
+
+
+class FakeBotApi:
+    """Bot API, отвечающий 502 с вероятностью error_rate и 429 на первый запрос в каждый flood_every-й чат."""
+    def __init__(self, error_rate: float = 0.05, retry_after: int = 1, flood_every: int = 10):
+        self._error_rate = error_rate
+        self._flood_every = flood_every
+        self._retry_after = retry_after
+        self._limited_chats: set[int] = set()
+        self.requests = 0
+        self.delivered = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        data = await request.post()
+        chat_id = int(data['chat_id'])
+        await asyncio.sleep(0.005)
+
+        if chat_id == FLOODED_CHAT:
+            return web.json_response(
+                {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                 'parameters': {'retry_after': self._retry_after}},
+                status=429
+            )
+        if chat_id == DROPPED_CHAT:
+            # Запрос принят, но соединение рвется до ответа
+            request.transport.close()
+            return web.Response()
+
+        if self._flood_every and chat_id % self._flood_every == 0 and chat_id not in self._limited_chats:
+            self._limited_chats.add(chat_id)
+            return web.json_response(
+                {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                 'parameters': {'retry_after': self._retry_after}},
+                status=429
+            )
+        if random.random() < self._error_rate:
+            return web.json_response({'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}, status=502)
+
+        self.delivered += 1
+        return web.json_response({'ok': True, 'result': {
+            'message_id': self.delivered, 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'group'}, 'text': data['text']
+        }})
+
+
+async def broadcast(session: AiohttpSession, messages: int, concurrency: int) -> tuple[int, float]:
+    bot = Bot(TOKEN, session=session)
+    semaphore = asyncio.Semaphore(concurrency)
+    sent = 0
+
+    async def send(chat_id: int):
+        nonlocal sent
+        async with semaphore:
+            try:
+                await bot.send_message(chat_id, "ping")
+                sent += 1
+            except Exception:
+                pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(-1000 - i) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+    await session.close()
+    return sent, elapsed
+
+
+async def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    random.seed(1)
+
+    fake = FakeBotApi()
+    app = web.Application()
+    app.router.add_route('POST', '/bot{token}/{method}', fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    api = TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")
+
+    print(f"Сообщений: {messages}, одновременно: {concurrency}")
+    sent, elapsed = await broadcast(AiohttpSession(api=api), messages, concurrency)
+    print(f"стандартная сессия: доставлено {sent}/{messages} за {elapsed:.2f} с")
+
+    fake._limited_chats.clear()
+    session = TunedAiohttpSession(api=api, limit=concurrency, retry=RetryMiddleware(base_delay=0.05))
+    sent, elapsed = await broadcast(session, messages, concurrency)
+    print(f"TunedAiohttpSession: доставлено {sent}/{messages} за {elapsed:.2f} с, повторы: {session.retry.stats}")
+    print(session.latency.report())
+
+    session = TunedAiohttpSession(api=api, retry=RetryMiddleware(base_delay=0.05, max_retry_after=3))
+    bot = Bot(TOKEN, session=session)
+    started = time.perf_counter()
+    try:
+        await bot.send_message(FLOODED_CHAT, "ping")
+    except TelegramRetryAfter:
+        print(f"бесконечный flood control: ошибка через {time.perf_counter() - started:.1f} с (max_retry_after=3)")
+
+    requests = fake.requests
+    try:
+        await bot.send_message(DROPPED_CHAT, "ping")
+    except TelegramNetworkError as e:
+        print(f"обрыв после отправки: {e.message}, запросов {fake.requests - requests} (без повтора)")
+    assert fake.requests - requests == 1
+    await session.close()
+
+    closed = TelegramAPIServer.from_base("http://127.0.0.1:9")
+    session = TunedAiohttpSession(api=closed, retry=RetryMiddleware(base_delay=0.05))
+    try:
+        await Bot(TOKEN, session=session).send_message(-1000, "ping")
+    except TelegramNetworkError as e:
+        print(f"соединение не установлено: {e.message.split(':', 1)[0]}, повторы: {session.retry.stats}")
+    assert session.retry.stats['retries'] == 3
+    await session.close()
+
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
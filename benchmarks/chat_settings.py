@@ -0,0 +1,91 @@
+"""Настройки чата на горячем пути: запрос на каждое обращение против ChatSettingsCache.
+
+Часть чатов получает свои настройки через update, затем N раз читаются
+настройки случайного чата - как это делают нажатие "Я первый!", /picture
+и планирование ежедневного сообщения. Наивный путь делает SELECT по
+chat_id на каждое обращение, кэш после одной загрузки - ни одного.
+SQLite (aiosqlite) в файле.
+
+Запуск: python -m benchmarks.chat_settings [обращений]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Сторонние библиотеки
+from sqlalchemy import event, select
+
+# Локальные импорты
+from benchmarks.outbox_drain import SqliteDatabase
+from core.chat_settings import DEFAULT_SETTINGS, ChatSettingsCache
+from core.clock import Clock
+from database.models import Base, Chat, ChatSettings
+
+CHATS = 1000
+CUSTOMIZED = 200
+
+
+async def prepare(path: str) -> tuple[SqliteDatabase, ChatSettingsCache]:
+    db = SqliteDatabase(path)
+    async with db.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    cache = ChatSettingsCache(Clock())
+    async for session in db.get_session():
+        session.add_all(Chat(chat_id=-100 - chat, name="bench") for chat in range(CHATS))
+        await session.commit()
+        for chat in range(CUSTOMIZED):
+            await cache.update(session, -100 - chat, {'master_points': 100 + chat, 'timezone': 'Asia/Yekaterinburg'})
+        # Вторая правка той же строки поднимает версию
+        record = await cache.update(session, -100, {'slave_points': 10})
+        assert record.version == 2 and record.master_points == 100 and record.slave_points == 10
+    return db, cache
+
+
+async def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(1)
+    chat_ids = [-100 - random.randrange(CHATS) for _ in range(lookups)]
+    print(f"Обращений: {lookups}, чатов: {CHATS}, со своими настройками: {CUSTOMIZED}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db, cache = await prepare(os.path.join(directory, "settings.sqlite"))
+        statements = 0
+
+        def count(*_):
+            nonlocal statements
+            statements += 1
+        event.listen(db.engine.sync_engine, 'before_cursor_execute', count)
+
+        started = time.perf_counter()
+        async for session in db.get_session():
+            for chat_id in chat_ids:
+                row = (await session.execute(
+                    select(ChatSettings.master_points).where(ChatSettings.chat_id == chat_id)
+                )).scalar_one_or_none()
+                master_points = DEFAULT_SETTINGS.master_points if row is None else row
+        elapsed = time.perf_counter() - started
+        print(f"SELECT на обращение: {elapsed * 1e6 / lookups:8.2f} мкс, запросов: {statements}")
+
+        statements = 0
+        started = time.perf_counter()
+        async for session in db.get_session():
+            await cache.load(session)
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        for chat_id in chat_ids:
+            master_points = cache.get(chat_id).master_points
+        elapsed = time.perf_counter() - started
+        assert cache.get(-101).master_points == 101 and cache.get(-100 - CHATS + 1) is DEFAULT_SETTINGS
+        print(
+            f"ChatSettingsCache:   {elapsed * 1e6 / lookups:8.2f} мкс, запросов: {statements} "
+            f"(загрузка {loaded * 1e3:.1f} мс), {cache.stats}"
+        )
+        await db.engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
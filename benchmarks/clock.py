@@ -0,0 +1,77 @@
+"""CPU на вопрос "какой сегодня день": pytz на каждый запрос против Clock.
+
+Раньше /daily_status, кнопка "Я первый!" и лимит картинок каждый раз брали
+datetime.now(pytz.UTC), переводили его в Москву и для промаха кэша строили
+границы дня через localize. Clock считает день пояса один раз до полуночи,
+а на запрос остается сравнение time.time() с концом дня. Отдельно - проверка,
+приходится ли время задачи на сегодня. Половина чатов - со своим поясом.
+Бот pytz больше не использует, он нужен только для прежнего пути и ставится
+как зависимость APScheduler 3.x.
+
+Запуск: python -m benchmarks.clock [повторов]
+"""
+# Стандартные библиотеки
+import sys
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as day_time
+
+# Сторонние библиотеки
+import pytz
+
+# Локальные импорты
+from core.clock import Clock
+
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+CHATS = 100
+
+
+# Прежние функции из core/daily_state.py - для сравнения
+def moscow_day(moment: datetime) -> date:
+    return moment.astimezone(MOSCOW_TZ).date()
+
+def moscow_day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = MOSCOW_TZ.localize(datetime.combine(day, day_time.min))
+    end = MOSCOW_TZ.localize(datetime.combine(day + timedelta(days=1), day_time.min))
+    return start, end
+
+
+def measure(function, repeats: int) -> float:
+    """Микросекунд на вызов."""
+    started = time.perf_counter()
+    for i in range(repeats):
+        function(-100 - i % CHATS)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    clock = Clock()
+    for chat in range(0, CHATS, 2):
+        clock.set_chat_timezone(-100 - chat, 'Asia/Yekaterinburg')
+    scheduled = datetime.now(pytz.UTC)
+
+    def legacy_today(chat_id: int):
+        day = moscow_day(datetime.now(pytz.UTC))
+        return day, moscow_day_bounds(day)
+
+    def clock_today(chat_id: int):
+        today = clock.today(chat_id)
+        return today.date, today.start, today.end
+
+    def legacy_is_today(chat_id: int):
+        return moscow_day(datetime.now(pytz.UTC)) == moscow_day(scheduled)
+
+    def clock_is_today(chat_id: int):
+        return scheduled in clock.today(chat_id)
+
+    print(f"Повторов: {repeats}, чатов: {CHATS} (половина - Asia/Yekaterinburg)")
+    print(f"Сегодня и границы дня: pytz {measure(legacy_today, repeats):6.2f} мкс, "
+          f"Clock {measure(clock_today, repeats):6.2f} мкс")
+    print(f"Задача на сегодня?     pytz {measure(legacy_is_today, repeats):6.2f} мкс, "
+          f"Clock {measure(clock_is_today, repeats):6.2f} мкс")
+    print(f"Clock: {clock.stats}")
+
+
+if __name__ == '__main__':
+    main()
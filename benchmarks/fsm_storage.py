@@ -0,0 +1,105 @@
+"""Задержка get/set FSM: MemoryStorage против SqlStorage на SQLite (aiosqlite).
+
+Сценарий повторяет /send из handlers/admin: update_data, set_state, затем
+get_state и get_data при следующем сообщении и clear. Запросы к БД
+считаются: в кэше SqlStorage помещается только половина ключей, остальные
+читаются из БД по одному запросу, а для ключей без состояния (так читает
+каждый апдейт) запросов быть не должно. Затем часть записей истекает и
+очищается пачками.
+
+Запуск: python -m benchmarks.fsm_storage [ключей]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Сторонние библиотеки
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import event
+
+# Локальные импорты
+from core.fsm_storage import SqlStorage
+from handlers.admin import AdminMessageStates
+
+
+async def flow(storage: BaseStorage, keys: list[StorageKey]) -> tuple[float, float]:
+    """Среднее время записи (update_data + set_state) и чтения (get_state + get_data) в мкс."""
+    contexts = [FSMContext(storage, key) for key in keys]
+
+    started = time.perf_counter()
+    for context in contexts:
+        await context.update_data(chat_id='all')
+        await context.set_state(AdminMessageStates.waiting_for_message)
+    write = (time.perf_counter() - started) / len(keys)
+
+    started = time.perf_counter()
+    for context in contexts:
+        assert await context.get_state() == AdminMessageStates.waiting_for_message.state
+        assert (await context.get_data())['chat_id'] == 'all'
+    read = (time.perf_counter() - started) / len(keys)
+    return 1e6 * write, 1e6 * read
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    keys = [StorageKey(bot_id=42, chat_id=user_id, user_id=user_id) for user_id in range(count)]
+    print(f"Ключей: {count}")
+
+    write, read = await flow(MemoryStorage(), keys)
+    print(f"{'MemoryStorage':<26} запись {write:8.1f} мкс, чтение {read:8.1f} мкс")
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite+aiosqlite:///{os.path.join(directory, 'fsm.sqlite')}"
+        storage = SqlStorage.from_url(url, cache_size=max(count // 2, 1), sweep_interval=3600)
+        await storage.start()
+        selects = 0
+
+        def count_select(connection, cursor, statement, *_):
+            # Очистка в фоне выполняет DELETE - считаются только чтения
+            nonlocal selects
+            selects += statement.lstrip().upper().startswith('SELECT')
+        event.listen(storage._db.engine.sync_engine, 'before_cursor_execute', count_select)
+
+        write, read = await flow(storage, keys)
+        # Каждое чтение из БД - промах кэша
+        assert selects == storage.stats['misses'] > 0
+        misses = selects
+        # Апдейт от пользователя без состояния
+        started = time.perf_counter()
+        for key in keys:
+            assert await storage.get_state(StorageKey(bot_id=42, chat_id=-key.chat_id - 1, user_id=key.user_id)) is None
+        absent = 1e6 * (time.perf_counter() - started) / count
+        print(
+            f"{'SqlStorage':<26} запись {write:8.1f} мкс, чтение {read:8.1f} мкс, без состояния {absent:.1f} мкс, "
+            f"промахов кэша на {storage._cache_size} ключей: {misses}"
+        )
+        assert selects == misses, 'чтение ключа без состояния не должно ходить в БД'
+
+        # Состояния переживают перезапуск: новое хранилище загружает ключи при старте
+        restarted = SqlStorage.from_url(url)
+        await restarted.start()
+        assert await restarted.get_state(keys[0]) == AdminMessageStates.waiting_for_message.state
+        assert restarted.stats['stored'] == count
+        await restarted.close()
+        await restarted._db.engine.dispose()
+
+        # Половина ключей истекает, clear удаляет строку сразу
+        await FSMContext(storage, keys[0]).clear()
+        storage._ttl = -1
+        for key in keys[1:count // 2]:
+            await storage.set_data(key, {'chat_id': 'all'})
+        started = time.perf_counter()
+        removed = await storage.sweep()
+        print(f"{'':<26} очистка: {removed} строк за {1000 * (time.perf_counter() - started):.1f} мс, {storage.stats}")
+
+        await storage.close()
+        await storage._db.engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""Кнопка команды в меню /help: вызовы Bot API и апдейты на одно действие.
+
+Раньше кнопка "Рейтинг" отвечала "вот нужная тебе команда: /ratings" и
+удаляла меню, после чего пользователь отправлял /ratings отдельным апдейтом.
+Теперь кнопка выполняет команду сразу и показывает результат на месте меню.
+Оба сценария прогоняются через Dispatcher с настоящими роутерами и
+middleware, Bot API подменен сессией, которая записывает вызовы. Данные
+лидерборда - в SQLite (aiosqlite).
+
+Запуск: python -m benchmarks.help_menu [повторов]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+# Сторонние библиотеки
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, TelegramMethod
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+# Локальные импорты
+from benchmarks.outbox_drain import SqliteDatabase
+from core.chat_settings import ChatSettingsCache
+from core.middleware import ChatSettingsMiddleware, LeaderboardMiddleware, SchedulerMiddleware, VKMiddleware
+from core.ttl_cache import TtlCache
+from database import DatabaseMiddleware
+from database.models import Base, Chat as ChatModel, User as UserModel, UserStats
+from handlers import help, stats
+
+CHAT = Chat(id=-100, type='supergroup', title="bench")
+USER = User(id=1001, is_bot=False, first_name="user", username="user1")
+BOT_USER = User(id=42, is_bot=True, first_name="bot", username="bench_bot")
+
+
+class RecordingSession(BaseSession):
+    """Вместо запросов к Telegram записывает вызванные методы и отдает правдоподобный ответ."""
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        self.calls[method.__api_method__] += 1
+        if isinstance(method, GetMe):
+            return BOT_USER
+        if method.__returning__ is bool:
+            return True
+        return Message(message_id=1, date=datetime.now(), chat=CHAT, from_user=BOT_USER, text="ok")
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# Прежнее поведение кнопки - для сравнения (отличается по chat_instance="legacy")
+legacy_router = Router()
+
+@legacy_router.callback_query(F.data.startswith("cmd_"), F.chat_instance == "legacy")
+async def legacy_command_button(callback: CallbackQuery):
+    command = callback.data.replace("cmd_", "")
+    await callback.message.answer(f"@{callback.from_user.username}\nвот нужная тебе команда: /{command}")
+    await callback.message.reply_to_message.delete()
+    await callback.message.delete()
+
+
+def menu_press(update_id: int, chat_instance: str) -> Update:
+    help_request = Message(message_id=10, date=datetime.now(), chat=CHAT, from_user=USER, text="/help")
+    menu = Message(
+        message_id=11, date=datetime.now(), chat=CHAT, from_user=BOT_USER,
+        text="Вот пидорские команды:", reply_to_message=help_request
+    )
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=USER, chat_instance=chat_instance, message=menu, data="cmd_ratings"
+    ))
+
+
+def command_message(update_id: int) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=12, date=datetime.now(), chat=CHAT, from_user=USER, text="/ratings"
+    ))
+
+
+async def run(dp: Dispatcher, bot: Bot, session: RecordingSession, repeats: int, legacy: bool):
+    session.calls.clear()
+    updates = 0
+    started = time.perf_counter()
+    for i in range(repeats):
+        await dp.feed_update(bot, menu_press(i, "legacy" if legacy else "menu"))
+        updates += 1
+        if legacy:
+            # Пользователь отправляет подсказанную команду
+            await dp.feed_update(bot, command_message(i))
+            updates += 1
+    elapsed = time.perf_counter() - started
+    calls = sum(session.calls.values())
+    print(
+        f"{'прежняя кнопка' if legacy else 'прямой вызов':<16} апдейтов: {updates / repeats:.0f}, "
+        f"вызовов Bot API: {calls / repeats:.0f} ({dict(session.calls)}), "
+        f"{1000 * elapsed / repeats:.2f} мс на действие"
+    )
+
+
+async def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = SqliteDatabase(os.path.join(directory, "help.sqlite"))
+        async with db.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async for db_session in db.get_session():
+            db_session.add(ChatModel(chat_id=CHAT.id, name="bench"))
+            db_session.add_all(UserModel(id=i, user_id=USER.id + i, chat_id=CHAT.id, username=f"user{i}") for i in range(30))
+            db_session.add_all(UserStats(id=i, rating=i) for i in range(30))
+            await db_session.commit()
+
+        session = RecordingSession()
+        bot = Bot("42:fake", session=session)
+        dp = Dispatcher()
+        dp.update.middleware(DatabaseMiddleware(db))
+        dp.update.middleware(SchedulerMiddleware(None))
+        dp.update.middleware(VKMiddleware("vk-token"))
+        dp.update.middleware(LeaderboardMiddleware(TtlCache(ttl=0)))
+        dp.update.middleware(ChatSettingsMiddleware(ChatSettingsCache()))
+        dp.include_router(legacy_router)
+        dp.include_router(stats.router)
+        dp.include_router(help.router)
+
+        print(f"Действий: {repeats}")
+        await run(dp, bot, session, repeats, legacy=True)
+        await run(dp, bot, session, repeats, legacy=False)
+
+        await db.engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""CPU на переход по меню /help: сборка клавиатуры при каждом нажатии против KeyboardRegistry.
+
+Переход по меню - это клавиатура и запрос editMessageText, который сессия
+превращает в форму для Bot API. Раньше клавиатура собиралась через
+InlineKeyboardBuilder и сериализовалась на каждом нажатии, теперь она
+берется из реестра, а TunedAiohttpSession подставляет готовый JSON. Сеть
+не участвует - замеряется только CPU. Отдельно - кнопка "Я первый!" для
+outbox: модель и model_dump против шаблона.
+
+Запуск: python -m benchmarks.keyboards [повторов]
+"""
+# Стандартные библиотеки
+import sys
+import time
+
+# Сторонние библиотеки
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import EditMessageText
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+# Локальные импорты
+from core.daily import DAILY_KEYBOARD
+from core.telegram_session import TunedAiohttpSession
+from handlers.help import ACTIVATION_KEYBOARD, FUN_KEYBOARD, MAIN_KEYBOARD, STATS_KEYBOARD
+
+CALLBACK_DATA = "df:1f4:b4a1d:AAECAwQFBgc"
+
+
+# Прежние функции из handlers/help.py - для сравнения
+def get_main_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="📋 База", callback_data="activation"))
+    builder.row(InlineKeyboardButton(text="📊 Статистика", callback_data="stats"))
+    builder.row(InlineKeyboardButton(text="🎮 Фан", callback_data="fun"))
+    builder.row(InlineKeyboardButton(text="❌ Закрыть", callback_data="close"))
+    return builder.as_markup()
+
+def get_activation_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="Активироваться", callback_data="cmd_addme"))
+    builder.row(InlineKeyboardButton(text="Деактивироваться", callback_data="cmd_disableme"))
+    builder.row(InlineKeyboardButton(text="Статус локатора", callback_data="cmd_daily_status"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back"))
+    return builder.as_markup()
+
+def get_stats_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="Рейтинг", callback_data="cmd_ratings"))
+    builder.row(InlineKeyboardButton(text="Пидорасы", callback_data="cmd_masters"))
+    builder.row(InlineKeyboardButton(text="Пассивы", callback_data="cmd_slaves"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back"))
+    return builder.as_markup()
+
+def get_fun_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="Картинка", callback_data="cmd_picture"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back"))
+    return builder.as_markup()
+
+
+def navigate(session: AiohttpSession, bot: Bot, keyboards, repeats: int) -> float:
+    """Секунд на один переход: клавиатура + форма запроса editMessageText."""
+    started = time.perf_counter()
+    for i in range(repeats):
+        keyboard = keyboards[i % len(keyboards)]
+        markup = keyboard() if callable(keyboard) else keyboard
+        method = EditMessageText(text="Вот пидорские команды:", chat_id=-100, message_id=11, reply_markup=markup)
+        session.build_form_data(bot, method)
+    return (time.perf_counter() - started) / repeats
+
+
+def daily_model(callback_data: str) -> dict:
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="Я первый! 🚀", callback_data=callback_data)
+    ]]).model_dump(exclude_none=True)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    bot = Bot("42:fake")
+
+    # Формы обоих путей должны совпадать байт в байт
+    for old, new in zip(
+        (get_main_keyboard, get_activation_keyboard, get_stats_keyboard, get_fun_keyboard),
+        (MAIN_KEYBOARD, ACTIVATION_KEYBOARD, STATS_KEYBOARD, FUN_KEYBOARD)
+    ):
+        method = lambda markup: EditMessageText(text="x", chat_id=1, message_id=2, reply_markup=markup)
+        fields = lambda session, markup: sorted(
+            (options['name'], value) for options, _, value in session.build_form_data(bot, method(markup))._fields
+        )
+        assert fields(AiohttpSession(), old()) == fields(TunedAiohttpSession(), new)
+        # Зарегистрированная клавиатура отправляется и через стандартную сессию
+        assert fields(AiohttpSession(), new) == fields(AiohttpSession(), old())
+    assert daily_model(CALLBACK_DATA) == DAILY_KEYBOARD.payload(CALLBACK_DATA)
+
+    old = navigate(AiohttpSession(), bot, [get_main_keyboard, get_activation_keyboard, get_stats_keyboard, get_fun_keyboard], repeats)
+    new = navigate(TunedAiohttpSession(), bot, [MAIN_KEYBOARD, ACTIVATION_KEYBOARD, STATS_KEYBOARD, FUN_KEYBOARD], repeats)
+    print(f"Переходов по меню: {repeats}")
+    print(f"сборка на каждое нажатие: {1e6 * old:8.1f} мкс, {1 / old:8.0f} переходов/с")
+    print(f"KeyboardRegistry:         {1e6 * new:8.1f} мкс, {1 / new:8.0f} переходов/с ({old / new:.1f}x)")
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        daily_model(CALLBACK_DATA)
+    old = (time.perf_counter() - started) / repeats
+    started = time.perf_counter()
+    for _ in range(repeats):
+        DAILY_KEYBOARD.payload(CALLBACK_DATA)
+    new = (time.perf_counter() - started) / repeats
+    print(f"кнопка \"Я первый!\": модель {1e6 * old:.1f} мкс, шаблон {1e6 * new:.1f} мкс ({old / new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Повторные запросы лидерборда одного чата.
+
+N запросов рейтинга одного чата подряд, как после публикации результата
+дня (апдейты чата выполняются по очереди). Сессия БД подменена счетчиком
+запросов с задержкой 20 мс. Без кэша выполняется N запросов, с TtlCache - один.
+Затем те же N запросов идут одновременно (листание страницы несколькими
+пользователями): пока первый выполняется, остальные ждут его результат.
+
+Запуск: python -m benchmarks.leaderboard_cache [число_запросов] [пользователей_в_чате]
+"""
+# Стандартные библиотеки
+import asyncio
+import sys
+import time
+
+# Локальные импорты
+from core.ttl_cache import TtlCache
+from handlers.stats import StatsHandler
+
+
+class CountingSession:
+    """Отдает заранее созданные строки и считает выполненные запросы."""
+    def __init__(self, rows):
+        self._rows = rows
+        self.queries = 0
+
+    async def execute(self, query):
+        self.queries += 1
+        await asyncio.sleep(0.02)
+        return self
+
+    def all(self):
+        return self._rows
+
+
+def make_rows(users: int):
+    return [
+        # Строки проекции: id, user_id, username, is_active, rating, master_count, slave_count
+        (i, 1000 + i, f"user{i}", i % 10 != 0, users - i, 0, 0)
+        for i in range(users)
+    ]
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rows = make_rows(users)
+
+    session = CountingSession(rows)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await StatsHandler._build_leaderboard(session, -1, 'rating')
+    plain = time.perf_counter() - started
+    plain_queries = session.queries
+
+    session = CountingSession(rows)
+    leaderboards = TtlCache(ttl=5.0)
+    started = time.perf_counter()
+    boards = [
+        await leaderboards.get_or_load((-1, 'rating'), lambda: StatsHandler._build_leaderboard(session, -1, 'rating'))
+        for _ in range(requests)
+    ]
+    texts = [board.render(1000 + i) for i, board in enumerate(boards)]
+    shared = time.perf_counter() - started
+
+    print(f"Запросов подряд: {requests}, пользователей в чате: {users}")
+    print(f"без кэша: {plain_queries} запросов к БД, {1000 * plain:.1f} мс")
+    print(f"TtlCache: {session.queries} запрос(ов) к БД, {1000 * shared:.1f} мс, отрисовано {len(texts)} ответов")
+    assert session.queries == 1
+
+    session = CountingSession(rows)
+    leaderboards = TtlCache(ttl=5.0)
+    started = time.perf_counter()
+    boards = await asyncio.gather(*(
+        leaderboards.get_or_load((-1, 'rating'), lambda: StatsHandler._build_leaderboard(session, -1, 'rating'))
+        for _ in range(requests)
+    ))
+    concurrent = time.perf_counter() - started
+    print(f"одновременно: {session.queries} запрос(ов) к БД, {1000 * concurrent:.1f} мс, {leaderboards.stats}")
+    assert session.queries == 1 and len(boards) == requests
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
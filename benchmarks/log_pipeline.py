@@ -0,0 +1,91 @@
+"""Блокировка event loop логированием под нагрузкой.
+
+Сравнивает basicConfig (запись в поток прямо в event loop, f-строки) с очередью
+из core.log_pipeline (ленивое форматирование, запись в фоновом потоке).
+Логи пишутся в поток, где каждая запись блокируется на 50 мкс (как медленный
+pipe/journald или диск). Измеряется время, проведенное корутинами внутри
+вызовов logging, и медианная задержка тикера event loop.
+
+Запуск: python -m benchmarks.log_pipeline [число_корутин] [записей_на_корутину]
+"""
+# Стандартные библиотеки
+import asyncio
+import logging
+import sys
+import time
+
+# Локальные импорты
+from core.log_pipeline import CATEGORY_SCHEDULE, setup_logging
+
+
+class SlowStream:
+    """Поток с блокирующей записью."""
+    def write(self, text: str):
+        time.sleep(0.00005)
+
+    def flush(self):
+        pass
+
+
+async def ticker(stop: asyncio.Event, lags: list[float]):
+    """Замеряет, насколько позже положенного просыпается event loop."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - started - 0.001)
+
+
+async def worker(records: int, lazy: bool) -> float:
+    spent = 0.0
+    for i in range(records):
+        started = time.perf_counter()
+        if lazy:
+            logging.info(
+                "Запланирована задача %s для чата %s на %s", i, -100 - i, "2026-10-20 06:00:00+00:00",
+                extra={'category': CATEGORY_SCHEDULE, 'chat_id': -100 - i}
+            )
+        else:
+            logging.info(f"Запланирована задача {i} для чата {-100 - i} на 2026-10-20 06:00:00+00:00")
+        spent += time.perf_counter() - started
+        if i % 10 == 0:
+            await asyncio.sleep(0)
+    return spent
+
+
+async def run(workers: int, records: int, lazy: bool) -> tuple[float, float]:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    tick = asyncio.create_task(ticker(stop, lags))
+    spent = await asyncio.gather(*(worker(records, lazy) for _ in range(workers)))
+    stop.set()
+    await tick
+    lags.sort()
+    return sum(spent), lags[len(lags) // 2] if lags else 0.0
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    records = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    total = workers * records
+
+    stream = SlowStream()
+    logging.basicConfig(level=logging.INFO, stream=stream, force=True)
+    sync_spent, sync_lag = asyncio.run(run(workers, records, lazy=False))
+
+    listener = setup_logging('INFO', stream=stream)
+    queue_spent, queue_lag = asyncio.run(run(workers, records, lazy=True))
+    listener.stop()
+
+    # Прореживание: сохраняется 10% записей категории schedule
+    listener = setup_logging('INFO', sampling={CATEGORY_SCHEDULE: 0.1}, stream=stream)
+    sampled_spent, sampled_lag = asyncio.run(run(workers, records, lazy=True))
+    listener.stop()
+
+    print(f"Записей: {total}")
+    print(f"basicConfig:        {sync_spent:.3f} с в logging, {1e6 * sync_spent / total:.1f} мкс/запись, медианная задержка loop {1000 * sync_lag:.1f} мс")
+    print(f"очередь:            {queue_spent:.3f} с в logging, {1e6 * queue_spent / total:.1f} мкс/запись, медианная задержка loop {1000 * queue_lag:.1f} мс")
+    print(f"очередь + sampling: {sampled_spent:.3f} с в logging, {1e6 * sampled_spent / total:.1f} мкс/запись, медианная задержка loop {1000 * sampled_lag:.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
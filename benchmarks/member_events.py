@@ -0,0 +1,138 @@
+"""Набег на чат: обработка каждого входа и выхода против MemberEventAggregator.
+
+В чат с участниками за пару секунд заходят N ботов, а N участников выходят.
+Старый путь на каждый выход делает UPDATE с коммитом, на каждое событие
+шлет сообщение. Агрегатор копит события окна (здесь окна укорочены) и
+отправляет одно сообщение на окно, а окна, закрытые до истечения интервала
+сообщений, сливает в одно. В конце в обоих случаях вышедшие должны
+быть неактивны. Bot API заменен счетчиком вызовов, SQLite (aiosqlite) в файле.
+
+Запуск: python -m benchmarks.member_events [событий каждого вида]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Сторонние библиотеки
+from sqlalchemy import func, select
+
+# Локальные импорты
+from benchmarks.outbox_drain import SqliteDatabase
+from core.member_events import MemberEventAggregator
+from database.members import deactivate_member, sync_members
+from database.models import Base, Chat, User
+
+CHAT_ID = -100
+MEMBERS = 2000
+BURST = 100  # событий между паузами - апдейты приходят пачками getUpdates
+PAUSE = 0.02
+WAVES = 5
+
+
+class CountingBot:
+    """Вместо Bot: считает send_message."""
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent += 1
+
+
+def raid(count: int) -> list[tuple[str, int]]:
+    """Входы новых пользователей вперемешку с выходами старых участников."""
+    events = []
+    for i in range(count):
+        events.append(("join", 10_000_000 + i))
+        events.append(("leave", 1000 + i))
+    return events
+
+
+async def prepare(path: str) -> SqliteDatabase:
+    db = SqliteDatabase(path)
+    async with db.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async for session in db.get_session():
+        session.add(Chat(chat_id=CHAT_ID, name="bench"))
+        await session.flush()
+        await sync_members(session, CHAT_ID, [(1000 + i, f"user{1000 + i}") for i in range(MEMBERS)])
+        await session.commit()
+    return db
+
+
+async def active_count(db: SqliteDatabase) -> int:
+    async for session in db.get_session():
+        return (await session.execute(
+            select(func.count()).select_from(User).where(User.chat_id == CHAT_ID, User.is_active)
+        )).scalar_one()
+
+
+async def replay(events: list[tuple[str, int]], handle):
+    for i, (kind, user_id) in enumerate(events, start=1):
+        await handle(kind, user_id)
+        if i % BURST == 0:
+            await asyncio.sleep(PAUSE)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    events = raid(count)
+    print(f"Входов: {count}, выходов: {count}, участников до набега: {MEMBERS}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = await prepare(os.path.join(directory, "legacy.sqlite"))
+        bot = CountingBot()
+
+        async def legacy(kind: str, user_id: int):
+            if kind == "join":
+                await bot.send_message(CHAT_ID, f"Привет, bot{user_id}! 👋")
+                return
+            async for session in db.get_session():
+                user = await deactivate_member(session, CHAT_ID, user_id)
+                await session.commit()
+            if user:
+                await bot.send_message(CHAT_ID, f"Пользователь {user.username} сбежал из видимости моего радара!")
+
+        started = time.perf_counter()
+        await replay(events, legacy)
+        elapsed = time.perf_counter() - started
+        assert await active_count(db) == MEMBERS - count
+        print(f"Событие за событием: {elapsed:6.2f} с, сообщений: {bot.sent}, коммитов: {count}")
+        await db.engine.dispose()
+
+        db = await prepare(os.path.join(directory, "aggregated.sqlite"))
+        bot = CountingBot()
+        aggregator = MemberEventAggregator(bot, db, window=0.1, max_delay=1.0, message_interval=2.0)
+
+        async def aggregated(kind: str, user_id: int):
+            if kind == "join":
+                aggregator.joined(CHAT_ID, user_id, f"bot{user_id}")
+            else:
+                aggregator.left(CHAT_ID, user_id)
+
+        started = time.perf_counter()
+        await replay(events, aggregated)
+        # Дожидаемся окон, как при остановке бота
+        await aggregator.stop()
+        elapsed = time.perf_counter() - started
+        assert await active_count(db) == MEMBERS - count
+        print(f"Агрегатор:           {elapsed:6.2f} с, сообщений: {bot.sent}, {aggregator.stats}")
+
+        # Волны с паузами длиннее окна: первое окно отправляется сразу, остальные
+        # сливаются в одно ожидающее сообщение, и при остановке уходит только оно
+        bot = CountingBot()
+        aggregator = MemberEventAggregator(bot, db, window=0.05, max_delay=1.0, message_interval=60.0)
+        for wave in range(WAVES):
+            for i in range(BURST):
+                aggregator.joined(CHAT_ID, 20_000_000 + wave * BURST + i, f"wave{wave}")
+            await asyncio.sleep(0.1)
+        await aggregator.stop()
+        assert bot.sent == 2 and not aggregator._messages
+        print(f"Волн: {WAVES}, сообщений: {bot.sent}, {aggregator.stats}")
+        await db.engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Регистрация 10k участников: по одному (прежний RegistrationHandler._create_user) против sync_members.
+
+По одному - вставка пользователя, flush, вставка статистики и коммит на
+каждого (путь /addme). sync_members пишет пачками по 1000 строк одним
+INSERT ... ON CONFLICT DO UPDATE и одним INSERT ... SELECT и коммитит один
+раз. Затем импорт повторяется после деактивации части участников - он должен
+вернуть их в поиск, не создав дублей. SQLite (aiosqlite) в файле.
+
+Запуск: python -m benchmarks.member_sync [участников]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Сторонние библиотеки
+from sqlalchemy import func, select, update
+
+# Локальные импорты
+from benchmarks.outbox_drain import SqliteDatabase
+from database.members import read_members_csv, sync_members
+from database.models import Base, Chat, User, UserStats
+
+CHAT_ID = -100
+
+
+async def create_user(session, user_id: int, chat_id: int, username: str | None) -> User:
+    """Прежний RegistrationHandler._create_user - для сравнения."""
+    new_user = User(user_id=user_id, chat_id=chat_id, username=username, is_active=True)
+    session.add(new_user)
+    await session.flush()
+    session.add(UserStats(id=new_user.id))
+    await session.commit()
+    return new_user
+
+
+async def prepare(path: str) -> SqliteDatabase:
+    db = SqliteDatabase(path)
+    async with db.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async for session in db.get_session():
+        session.add(Chat(chat_id=CHAT_ID, name="bench"))
+        await session.commit()
+    return db
+
+
+async def counts(db: SqliteDatabase) -> tuple[int, int]:
+    async for session in db.get_session():
+        users = (await session.execute(select(func.count()).select_from(User))).scalar_one()
+        stats = (await session.execute(select(func.count()).select_from(UserStats))).scalar_one()
+    return users, stats
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    csv_content = "user_id,username\n" + "".join(f"{1000 + i},user{i}\n" for i in range(count))
+    members = read_members_csv(csv_content)
+    print(f"Участников: {count}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = await prepare(os.path.join(directory, "single.sqlite"))
+        started = time.perf_counter()
+        async for session in db.get_session():
+            for user_id, username in members:
+                await create_user(session, user_id, CHAT_ID, username)
+        elapsed = time.perf_counter() - started
+        print(f"по одному:    {elapsed:7.2f} с, {count / elapsed:8.0f} участников/с, строк {await counts(db)}")
+        await db.engine.dispose()
+
+        db = await prepare(os.path.join(directory, "bulk.sqlite"))
+        started = time.perf_counter()
+        async for session in db.get_session():
+            result = await sync_members(session, CHAT_ID, members)
+            await session.commit()
+        elapsed = time.perf_counter() - started
+        print(f"sync_members: {elapsed:7.2f} с, {count / elapsed:8.0f} участников/с, строк {await counts(db)}, {result}")
+
+        # Часть участников вышла из поиска, затем импорт повторяется
+        async for session in db.get_session():
+            await session.execute(update(User).where(User.user_id % 4 == 0).values(is_active=False))
+            await session.commit()
+        started = time.perf_counter()
+        async for session in db.get_session():
+            result = await sync_members(session, CHAT_ID, members)
+            await session.commit()
+        elapsed = time.perf_counter() - started
+        print(f"повторно:     {elapsed:7.2f} с, строк {await counts(db)}, {result}")
+        assert result.reactivated == count // 4 and await counts(db) == (count, count)
+        await db.engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Пропускная способность OutboxWorker на имитации Bot API.
+
+В outbox (SQLite через aiosqlite) дважды ставится N сообщений с одними и теми
+же ключами - вторая постановка не должна создать дублей. Затем воркер
+отправляет их на локальный FakeBotApi (5% ответов 502, 429 с retry_after=1
+для каждого flood_every-го чата, 0 - без 429) и печатает время, сообщения
+в секунду и статистику.
+
+Запуск: python -m benchmarks.outbox_drain [сообщений] [одновременно] [flood_every]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Сторонние библиотеки
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Локальные импорты
+from benchmarks.bot_api_session import TOKEN, FakeBotApi
+from core.outbox import OutboxWorker, enqueue_message
+from core.telegram_session import RetryMiddleware, TunedAiohttpSession
+from database.models import Base, OutboxMessage, OutboxStatus
+
+
+class SqliteDatabase:
+    """То же, что Database.get_session, но для файла SQLite."""
+    def __init__(self, path: str):
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        self._session_maker = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_session(self):
+        async with self._session_maker() as session:
+            yield session
+
+
+async def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    flood_every = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    random.seed(1)
+
+    fake = FakeBotApi(flood_every=flood_every)
+    app = web.Application()
+    app.router.add_route('POST', '/bot{token}/{method}', fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = SqliteDatabase(os.path.join(directory, "outbox.sqlite"))
+        async with db.engine.begin() as connection:
+            await connection.run_sync(lambda sync: Base.metadata.create_all(sync, tables=[OutboxMessage.__table__]))
+
+        for _ in range(2):
+            async for session in db.get_session():
+                for i in range(messages):
+                    await enqueue_message(session, f"bench:{i}", -1000 - i, "ping")
+                await session.commit()
+
+        session = TunedAiohttpSession(
+            api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"),
+            retry=RetryMiddleware(base_delay=0.05)
+        )
+        bot = Bot(TOKEN, session=session)
+        worker = OutboxWorker(bot, db, concurrency=concurrency, batch_size=100, poll_interval=0.05)
+
+        started = time.perf_counter()
+        worker.start()
+        while True:
+            async for db_session in db.get_session():
+                pending = (await db_session.execute(
+                    select(func.count()).where(OutboxMessage.status == OutboxStatus.PENDING)
+                )).scalar_one()
+            if not pending:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        await worker.stop()
+
+        print(f"Сообщений: {messages} (поставлено дважды), одновременно: {concurrency}")
+        print(f"доставлено {fake.delivered} за {elapsed:.2f} с - {messages / elapsed:.0f} сообщений/с")
+        print(f"воркер: {worker.stats}")
+        print(f"повторы сессии: {session.retry.stats}")
+        assert fake.delivered == messages
+
+        await session.close()
+        await db.engine.dispose()
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""CPU на запрос: сборка select/update при каждом вызове против заранее собранных.
+
+Запросы выполняются через ORM-сессию на SQLite в памяти, так что в замер
+попадают сборка конструкции, вычисление ключа кэша, компиляция (или попадание
+в кэш) и выполнение. Сетевой задержки нет - разница целиком в CPU.
+
+Запуск: python -m benchmarks.prebuilt_queries [повторов]
+"""
+# Стандартные библиотеки
+import sys
+import time
+
+# Сторонние библиотеки
+from sqlalchemy import and_, case, create_engine, or_, select, update
+from sqlalchemy.orm import Session
+
+# Локальные импорты
+from database import queries
+from database.models import Base, Chat, User, UserStats
+
+
+def adhoc_get_user(session: Session, user_id: int, chat_id: int):
+    query = select(User).where(
+        User.user_id == user_id,
+        User.chat_id == chat_id
+    )
+    return session.execute(query).scalar_one_or_none()
+
+
+def prebuilt_get_user(session: Session, user_id: int, chat_id: int):
+    return session.execute(queries.GET_USER, {'user_id': user_id, 'chat_id': chat_id}).scalar_one_or_none()
+
+
+def adhoc_update_stats(session: Session, master_id: int, slave_id: int, initiator_id: int):
+    session.execute(
+        update(UserStats)
+        .where(
+            or_(
+                UserStats.id == master_id,
+                UserStats.id == slave_id,
+                UserStats.id == initiator_id
+            )
+        )
+        .values(
+            master_count=case(
+                (UserStats.id == master_id, UserStats.master_count + 1),
+                else_=UserStats.master_count
+            ),
+            slave_count=case(
+                (UserStats.id == slave_id, UserStats.slave_count + 1),
+                else_=UserStats.slave_count
+            ),
+            launched_count=case(
+                (UserStats.id == initiator_id, UserStats.launched_count + 1),
+                else_=UserStats.launched_count
+            ),
+            rating=case(
+                (UserStats.id == master_id, UserStats.rating + 100),
+                (UserStats.id == slave_id, UserStats.rating + 50),
+                else_=UserStats.rating
+            )
+        )
+    )
+
+
+def prebuilt_update_stats(session: Session, master_id: int, slave_id: int, initiator_id: int):
+    session.execute(
+        queries.UPDATE_DAILY_STATS,
+        {
+            'master_id': master_id,
+            'slave_id': slave_id,
+            'initiator_id': initiator_id,
+            'master_points': 100,
+            'slave_points': 50
+        }
+    )
+
+
+def measure(session: Session, func, repeats: int, *args) -> float:
+    func(session, *args)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func(session, *args)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Chat(chat_id=-1, name="bench"))
+        session.add_all(User(id=i, user_id=100 + i, chat_id=-1, username=f"user{i}") for i in range(1, 4))
+        session.add_all(UserStats(id=i) for i in range(1, 4))
+        session.commit()
+
+        for name, adhoc, prebuilt, args in (
+            ("GET_USER", adhoc_get_user, prebuilt_get_user, (101, -1)),
+            ("UPDATE_DAILY_STATS", adhoc_update_stats, prebuilt_update_stats, (1, 2, 3)),
+        ):
+            adhoc_us = measure(session, adhoc, repeats, *args)
+            prebuilt_us = measure(session, prebuilt, repeats, *args)
+            print(f"{name:<20} сборка на каждый вызов: {adhoc_us:6.1f} мкс, заранее собранный: {prebuilt_us:6.1f} мкс ({100 * (1 - prebuilt_us / adhoc_us):.0f}% меньше)")
+
+
+if __name__ == '__main__':
+    main()
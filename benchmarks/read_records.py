@@ -0,0 +1,101 @@
+"""Память на чтение: ORM-объекты против проекций колонок в легкие записи.
+
+На SQLite в памяти создается чат со 100k пользователей и 100k задач. Затем
+они читаются как на горячих путях до и после перехода на записи: лидерборд
+(User + UserStats), задачи при восстановлении планировщика. tracemalloc
+показывает пик памяти на время чтения и сколько удерживает результат.
+
+Запуск: python -m benchmarks.read_records [число_строк]
+"""
+# Стандартные библиотеки
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# Сторонние библиотеки
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+# Локальные импорты
+from database.models import Base, Chat, SchedulerTask, TaskType, User, UserStats
+from database.records import LeaderboardRow, TaskRecord
+
+
+def fill(session: Session, count: int):
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    session.add(Chat(chat_id=-1, name="bench"))
+    session.flush()
+    session.execute(insert(User), [
+        {'id': i, 'user_id': 1000 + i, 'chat_id': -1, 'username': f"user{i}", 'is_active': i % 10 != 0}
+        for i in range(1, count + 1)
+    ])
+    session.execute(insert(UserStats), [
+        {'id': i, 'rating': i % 500, 'master_count': i % 7, 'slave_count': i % 5}
+        for i in range(1, count + 1)
+    ])
+    session.execute(insert(SchedulerTask), [
+        {'id': i, 'chat_id': -1, 'task_type': TaskType.DAILY_MESSAGE,
+         'scheduled_time': start + timedelta(seconds=i % 46800), 'is_completed': False}
+        for i in range(1, count + 1)
+    ])
+    session.commit()
+
+
+def orm_leaderboard(session: Session):
+    return session.execute(select(User, UserStats).join(UserStats, User.id == UserStats.id)).all()
+
+
+def record_leaderboard(session: Session):
+    query = select(
+        User.id, User.user_id, User.username, User.is_active,
+        UserStats.rating, UserStats.master_count, UserStats.slave_count
+    ).join(UserStats, User.id == UserStats.id)
+    return [LeaderboardRow(*row) for row in session.execute(query)]
+
+
+def orm_tasks(session: Session):
+    return session.execute(select(SchedulerTask)).scalars().all()
+
+
+def record_tasks(session: Session):
+    query = select(SchedulerTask.id, SchedulerTask.chat_id, SchedulerTask.scheduled_time, SchedulerTask.is_completed)
+    return [TaskRecord(*row) for row in session.execute(query)]
+
+
+def measure(engine, func) -> tuple[float, float, float]:
+    """Возвращает (удержано МБ, пик МБ, секунды)."""
+    with Session(engine) as session:
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = func(session)
+        elapsed = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+    return retained / 2**20, peak / 2**20, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        fill(session, count)
+
+    print(f"Строк: {count}")
+    for name, orm, record in (
+        ("лидерборд", orm_leaderboard, record_leaderboard),
+        ("задачи", orm_tasks, record_tasks),
+    ):
+        orm_retained, orm_peak, orm_time = measure(engine, orm)
+        rec_retained, rec_peak, rec_time = measure(engine, record)
+        print(
+            f"{name:<10} ORM: удержано {orm_retained:6.1f} МБ, пик {orm_peak:6.1f} МБ, {orm_time:.2f} с | "
+            f"записи: удержано {rec_retained:6.1f} МБ, пик {rec_peak:6.1f} МБ, {rec_time:.2f} с"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Время восстановления задач планировщика при запуске.
+
+Сравнивает первый запуск (хранилище задач пустое), теплый перезапуск (все
+задачи уже лежат в постоянном хранилище) и перезапуск с половиной
+перенесенных задач на локальном SQLite. Планировщик запущен на паузе, как в
+setup_jobs, поэтому задачи действительно пишутся в хранилище. Для сравнения
+замеряется add_job по одной задаче.
+Невыполненные задачи из scheduler_tasks подставляются готовым списком строк.
+
+Запуск: python -m benchmarks.scheduler_restore [число_задач]
+"""
+# Стандартные библиотеки
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from os.path import join
+
+# Сторонние библиотеки
+from aiogram import Bot
+
+# Локальные импорты
+from core.clock import clock
+from core.scheduler import Scheduler
+
+
+class PendingTasksSession:
+    """Сессия, возвращающая заранее подготовленные строки (id, chat_id, scheduled_time)."""
+    def __init__(self, rows: list[tuple[int, int, datetime]]):
+        self._rows = rows
+
+    async def stream(self, query):
+        return self
+
+    async def __aiter__(self):
+        for row in self._rows:
+            yield row
+
+
+def make_rows(count: int) -> list[tuple[int, int, datetime]]:
+    start = clock.now().replace(microsecond=0) + timedelta(days=1)
+    return [
+        (task_id, -1000000000000 - task_id, start + timedelta(seconds=task_id % 46800))
+        for task_id in range(count)
+    ]
+
+
+async def restore(url: str, rows) -> float:
+    """Восстановление на планировщике, запущенном на паузе, - как в setup_jobs."""
+    scheduler = Scheduler(Bot(token='42:TEST'), None, url)
+    await asyncio.to_thread(scheduler._scheduler.start, paused=True)
+    started = time.perf_counter()
+    await scheduler._restore_pending_tasks(PendingTasksSession(rows))
+    elapsed = time.perf_counter() - started
+    scheduler.shutdown()
+    return elapsed
+
+
+async def add_one_by_one(url: str, rows) -> float:
+    """Прежний путь: add_job на каждую задачу, отдельный INSERT и коммит."""
+    scheduler = Scheduler(Bot(token='42:TEST'), None, url)
+    await asyncio.to_thread(scheduler._scheduler.start, paused=True)
+    started = time.perf_counter()
+    await asyncio.to_thread(lambda: [scheduler._add_daily_job(*row) for row in rows])
+    elapsed = time.perf_counter() - started
+    scheduler.shutdown()
+    return elapsed
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = make_rows(count)
+    one_by_one_rows = rows[:min(count, 5000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{join(directory, 'jobs.sqlite')}"
+        cold = await restore(url, rows)
+        warm = await restore(url, rows)
+        # Половина задач перенесена на другое время
+        moved = [(task_id, chat_id, scheduled_time + timedelta(minutes=1)) for task_id, chat_id, scheduled_time in rows[::2]]
+        partial = await restore(url, moved + rows[1::2])
+
+        single = await add_one_by_one(f"sqlite:///{join(directory, 'single.sqlite')}", one_by_one_rows)
+
+    print(f"Задач: {count}")
+    print(f"Первый запуск (пустое хранилище): {cold:.3f} с")
+    print(f"Теплый перезапуск:                {warm:.3f} с")
+    print(f"Изменена половина задач:          {partial:.3f} с")
+    print(f"add_job по одной, {len(one_by_one_rows)} задач:    {single:.3f} с ({single * count / len(one_by_one_rows):.1f} с на {count})")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
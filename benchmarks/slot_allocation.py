@@ -0,0 +1,51 @@
+"""Симуляция распределения ежедневных сообщений по времени.
+
+Сравнивает пиковую нагрузку (задач в минуту и в секунду) у старой схемы
+random.randint(6, 18) / random.randint(0, 59) и у SlotAllocator.
+
+Запуск: python -m benchmarks.slot_allocation [число_чатов]
+"""
+# Стандартные библиотеки
+import random
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+# Локальные импорты
+from core.clock import UTC
+from core.slots import SlotAllocator
+
+
+def simulate_naive(chats: int, day: date) -> tuple[int, int]:
+    per_minute = Counter()
+    for _ in range(chats):
+        moment = datetime(day.year, day.month, day.day, random.randint(6, 18), random.randint(0, 59), tzinfo=UTC)
+        per_minute[moment] += 1
+    # Все задачи минуты уходят в нулевую секунду
+    peak = max(per_minute.values())
+    return peak, peak
+
+
+def simulate_allocator(chats: int, day: date) -> tuple[int, int]:
+    allocator = SlotAllocator()
+    for chat_id in range(chats):
+        allocator.book(chat_id, allocator.pick(day))
+    return allocator.peak_minute(), allocator.peak_second()
+
+
+def main():
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    day = date.today() + timedelta(days=1)
+    random.seed(0)
+
+    naive_minute, naive_second = simulate_naive(chats, day)
+    slots_minute, slots_second = simulate_allocator(chats, day)
+
+    print(f"Чатов: {chats}, среднее на минуту: {chats / (13 * 60):.1f}")
+    print(f"randint:       пик {naive_minute} задач/мин, {naive_second} задач/сек")
+    print(f"SlotAllocator: пик {slots_minute} задач/мин, {slots_second} задач/сек")
+    print(f"Снижение пика по минутам: {100 * (1 - slots_minute / naive_minute):.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Актуальные имена пользователей: UPDATE на каждое сообщение против UsernameTracker.
+
+Поток сообщений от участников нескольких чатов, часть участников меняет
+имя по ходу. Наивный путь пишет имя при каждом сообщении, UsernameTracker
+сравнивает с кэшем и сбрасывает изменения пачками. В конце в обоих
+случаях в users должны быть последние имена. SQLite (aiosqlite) в файле.
+
+Запуск: python -m benchmarks.username_refresh [сообщений]
+"""
+# Стандартные библиотеки
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Сторонние библиотеки
+from sqlalchemy import select
+
+# Локальные импорты
+from benchmarks.outbox_drain import SqliteDatabase
+from core.ttl_cache import TtlCache
+from core.usernames import UsernameTracker
+from database import queries
+from database.members import sync_members
+from database.models import Base, Chat, User
+
+CHATS = 10
+USERS_PER_CHAT = 100
+FLUSH_EVERY = 1000  # сообщений между сбросами - вместо таймера
+
+
+def message_stream(count: int) -> list[tuple[int, int, str]]:
+    """(chat_id, user_id, username); каждое 200-е сообщение - от пользователя с новым именем."""
+    random.seed(1)
+    names = {}
+    stream = []
+    for i in range(count):
+        key = (-100 - random.randrange(CHATS), 1000 + random.randrange(USERS_PER_CHAT))
+        if i % 200 == 0 or key not in names:
+            names[key] = f"user{key[1]}_{i}" if i % 200 == 0 else f"user{key[1]}"
+        stream.append((*key, names[key]))
+    return stream
+
+
+async def prepare(path: str) -> SqliteDatabase:
+    db = SqliteDatabase(path)
+    async with db.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async for session in db.get_session():
+        for chat in range(CHATS):
+            session.add(Chat(chat_id=-100 - chat, name="bench"))
+            await session.flush()
+            await sync_members(session, -100 - chat, [(1000 + i, f"user{1000 + i}") for i in range(USERS_PER_CHAT)])
+        await session.commit()
+    return db
+
+
+async def current_names(db: SqliteDatabase) -> dict[tuple[int, int], str]:
+    async for session in db.get_session():
+        rows = (await session.execute(select(User.chat_id, User.user_id, User.username))).all()
+    return {(chat_id, user_id): username for chat_id, user_id, username in rows}
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    stream = message_stream(count)
+    expected = {(chat_id, user_id): username for chat_id, user_id, username in stream}
+    print(f"Сообщений: {count}, участников: {CHATS * USERS_PER_CHAT}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = await prepare(os.path.join(directory, "naive.sqlite"))
+        started = time.perf_counter()
+        async for session in db.get_session():
+            for chat_id, user_id, username in stream:
+                await session.execute(queries.update_usernames([(chat_id, user_id, username)]))
+                await session.commit()
+        elapsed = time.perf_counter() - started
+        assert {key: name for key, name in (await current_names(db)).items() if key in expected} == expected
+        print(f"UPDATE на сообщение: {elapsed:6.2f} с, запросов: {count}")
+        await db.engine.dispose()
+
+        db = await prepare(os.path.join(directory, "tracker.sqlite"))
+        leaderboards = TtlCache(ttl=3600)
+        tracker = UsernameTracker(db, leaderboards)
+        started = time.perf_counter()
+        for i, (chat_id, user_id, username) in enumerate(stream, start=1):
+            tracker.observe(chat_id, user_id, username)
+            if i % FLUSH_EVERY == 0:
+                await tracker.flush()
+        await tracker.flush()
+        elapsed = time.perf_counter() - started
+        # Лидерборд чата, где сменилось имя, сбрасывается
+        renamed_chat, renamed_user, _ = stream[-200]
+        await leaderboards.get_or_load((renamed_chat, 'rating'), lambda: asyncio.sleep(0))
+        tracker.observe(renamed_chat, renamed_user, "renamed")
+        assert await tracker.flush() == 1 and leaderboards.stats['executed'] == 1
+        await leaderboards.get_or_load((renamed_chat, 'rating'), lambda: asyncio.sleep(0))
+        assert leaderboards.stats['executed'] == 2
+        assert tracker.stats['updated'] > 0
+        expected[renamed_chat, renamed_user] = "renamed"
+        assert {key: name for key, name in (await current_names(db)).items() if key in expected} == expected
+        print(f"UsernameTracker:     {elapsed:6.2f} с, пачек: {tracker.stats['flushes']}, {tracker.stats}")
+        await db.engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
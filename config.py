@@ -4,6 +4,8 @@ from environs import Env
 @dataclass
 class TgBot:
     token: str
+    api_url: str | None
+    connection_limit: int
 
 @dataclass
 class DatabaseConfig:
@@ -12,16 +14,55 @@ class DatabaseConfig:
     password: str
     user: str
     database: str
+    fast_path: bool
 
 @dataclass
 class VKConfig:
     token: str
 
+@dataclass
+class SchedulerConfig:
+    max_sends_per_second: int
+    jobstore_url: str | None
+    outbox_concurrency: int
+    timezone: str
+
+@dataclass
+class UpdatesConfig:
+    max_chat_queue: int
+    leaderboard_ttl: float
+    drain_timeout: float
+    username_flush_interval: float
+
+@dataclass
+class FsmConfig:
+    storage_url: str | None
+    ttl: float
+    cache_size: int
+
+@dataclass
+class MemberEventsConfig:
+    window: float
+    max_delay: float
+    message_interval: float
+    max_names: int
+
+@dataclass
+class LoggingConfig:
+    level: str
+    json: bool
+    sampling: dict[str, float]
+
 @dataclass
 class Config:
     tg_bot: TgBot
     db: DatabaseConfig
     vk: VKConfig
+    scheduler: SchedulerConfig
+    logging: LoggingConfig
+    updates: UpdatesConfig
+    fsm: FsmConfig
+    member_events: MemberEventsConfig
 
 def load_config(path: str | None = None) -> Config:
     env = Env()
@@ -29,16 +70,60 @@ def load_config(path: str | None = None) -> Config:
 
     return Config(
         tg_bot=TgBot(
-            token=env('BOT_TOKEN')
+            token=env('BOT_TOKEN'),
+            # Адрес локального Bot API сервера (или его имитации), по умолчанию - api.telegram.org
+            api_url=env('TELEGRAM_API_URL', None),
+            connection_limit=env.int('TELEGRAM_CONNECTION_LIMIT', 100)
         ),
         db=DatabaseConfig(
             host=env('DB_HOST'),
             port=env.int('DB_PORT'),
             password=env('DB_PASS'),
             user=env('DB_USER'),
-            database=env('DB_NAME')
+            database=env('DB_NAME'),
+            # Прямой asyncpg для самых частых запросов на чтение
+            fast_path=env.bool('DB_FAST_PATH', False)
         ),
         vk=VKConfig(
             token=env('VK_TOKEN')
+        ),
+        scheduler=SchedulerConfig(
+            max_sends_per_second=env.int('MAX_SENDS_PER_SECOND', 25),
+            jobstore_url=env('JOBSTORE_URL', None),
+            # Одновременных отправок из outbox
+            outbox_concurrency=env.int('OUTBOX_CONCURRENCY', 8),
+            # Пояс "сегодня" для чатов без своего пояса
+            timezone=env('TIMEZONE', 'Europe/Moscow')
+        ),
+        logging=LoggingConfig(
+            level=env('LOG_LEVEL', 'INFO'),
+            json=env.bool('LOG_JSON', True),
+            # Доля сохраняемых записей по категориям, например: schedule=0.1,vk=0.5
+            sampling=env.dict('LOG_SAMPLING', subcast_values=float, default={})
+        ),
+        updates=UpdatesConfig(
+            max_chat_queue=env.int('MAX_CHAT_QUEUE', 20),
+            leaderboard_ttl=env.float('LEADERBOARD_TTL', 5.0),
+            # Сколько секунд при остановке ждать незавершенные апдейты и задачи
+            drain_timeout=env.float('DRAIN_TIMEOUT', 25.0),
+            # Как часто записывать изменившиеся имена пользователей
+            username_flush_interval=env.float('USERNAME_FLUSH_INTERVAL', 60.0)
+        ),
+        fsm=FsmConfig(
+            # Отдельная БД для состояний FSM (например, sqlite+aiosqlite:///fsm.sqlite), по умолчанию - основная
+            storage_url=env('FSM_STORAGE_URL', None),
+            # Через сколько секунд без изменений состояние FSM удаляется
+            ttl=env.float('FSM_TTL', 86400.0),
+            # Сколько состояний держать в памяти, остальные читаются из БД
+            cache_size=env.int('FSM_CACHE_SIZE', 1024)
+        ),
+        member_events=MemberEventsConfig(
+            # Входы и выходы копятся, пока между ними меньше window секунд, но не дольше max_delay
+            window=env.float('MEMBER_EVENTS_WINDOW', 5.0),
+            max_delay=env.float('MEMBER_EVENTS_MAX_DELAY', 30.0),
+            # Не чаще одного сообщения о входах и выходах в чат за столько секунд
+            message_interval=env.float('MEMBER_MESSAGE_INTERVAL', 60.0),
+            # Сколько имен перечислять в сообщении
+            max_names=env.int('MEMBER_MESSAGE_NAMES', 20)
         )
     )
\ No newline at end of file
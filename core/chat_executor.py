@@ -0,0 +1,72 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _ChatSlot:
+    """Очередь одного чата: замок (FIFO) и ожидающие апдейты."""
+    __slots__ = ('lock', 'waiting', 'merge_keys')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+        self.merge_keys: set[Hashable] = set()
+
+
+class ChatKeyedExecutor:
+    """Выполняет работу последовательно внутри одного чата и параллельно между чатами.
+
+    Очередь каждого чата ограничена max_queue ожидающими апдейтами, лишние
+    отбрасываются. Если в очереди уже ждет апдейт с тем же merge_key
+    (например, повторный /ratings), новый не ставится - его ответ даст ожидающий.
+    """
+    _max_queue: int
+    _slots: dict[int, _ChatSlot]
+
+    def __init__(self, max_queue: int = 20):
+        self._max_queue = max_queue
+        self._slots = {}
+        self.stats = {'executed': 0, 'dropped': 0, 'merged': 0}
+
+    async def run(
+        self,
+        chat_id: int,
+        func: Callable[[], Awaitable[Any]],
+        merge_key: Hashable | None = None
+    ) -> Any:
+        slot = self._slots.get(chat_id)
+        if slot is None:
+            slot = self._slots[chat_id] = _ChatSlot()
+
+        if merge_key is not None and merge_key in slot.merge_keys:
+            self.stats['merged'] += 1
+            return None
+        if slot.waiting >= self._max_queue:
+            self.stats['dropped'] += 1
+            logging.warning("Очередь чата %s переполнена, апдейт отброшен", chat_id)
+            return None
+
+        slot.waiting += 1
+        if merge_key is not None:
+            slot.merge_keys.add(merge_key)
+        waiting = True
+        try:
+            async with slot.lock:
+                # Апдейт начал выполняться - такой же снова можно ставить в очередь
+                waiting = False
+                slot.waiting -= 1
+                slot.merge_keys.discard(merge_key)
+                self.stats['executed'] += 1
+                return await func()
+        finally:
+            if waiting:
+                slot.waiting -= 1
+                slot.merge_keys.discard(merge_key)
+            if slot.waiting == 0 and not slot.lock.locked() and self._slots.get(chat_id) is slot:
+                del self._slots[chat_id]
+
+    def queued(self, chat_id: int) -> int:
+        """Число апдейтов чата, ожидающих выполнения."""
+        slot = self._slots.get(chat_id)
+        return slot.waiting if slot else 0
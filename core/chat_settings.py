@@ -0,0 +1,148 @@
+# Стандартные библиотеки
+import logging
+from dataclasses import dataclass, fields, replace
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Сторонние библиотеки
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Локальные импорты
+from database.models import ChatSettings
+from .clock import Clock, clock as default_clock
+
+_INSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+_TRUE = ('1', 'true', 'on', 'да')
+_FALSE = ('0', 'false', 'off', 'нет')
+
+
+@dataclass(slots=True, frozen=True)
+class ChatSettingsRecord:
+    """Действующие настройки чата: строка chat_settings поверх значений по умолчанию."""
+    daily_start_hour: int = 6  # окно ежедневного сообщения, местные часы пояса чата
+    daily_end_hour: int = 18
+    initiator_points: int = 25
+    master_points: int = 100
+    slave_points: int = 50
+    picture_limited: bool = True
+    picture_limit_message: str = "Картинка на сегодня уже была 🙅"
+    daily_message: str = "Запустить локатор пидоров! 📡"
+    timezone: str | None = None  # None - пояс бота по умолчанию
+    version: int = 0  # 0 - строки в chat_settings нет
+
+
+DEFAULT_SETTINGS = ChatSettingsRecord()
+SETTING_NAMES = tuple(field.name for field in fields(ChatSettingsRecord) if field.name != 'version')
+_SELECT_COLUMNS = (ChatSettings.chat_id, ChatSettings.version, *(getattr(ChatSettings, name) for name in SETTING_NAMES))
+
+
+def _record(version: int, values) -> ChatSettingsRecord:
+    overrides = {name: value for name, value in zip(SETTING_NAMES, values) if value is not None}
+    return replace(DEFAULT_SETTINGS, **overrides, version=version)
+
+
+def parse_setting(name: str, text: str) -> Any:
+    """Значение настройки из текста команды; '-' - вернуть значение по умолчанию (None).
+
+    Неизвестная настройка или неверное значение - ValueError.
+    """
+    if name not in SETTING_NAMES:
+        raise ValueError(f"неизвестная настройка {name}")
+    if text == '-':
+        return None
+
+    default = getattr(DEFAULT_SETTINGS, name)
+    if name == 'timezone':
+        try:
+            ZoneInfo(text)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"неизвестный часовой пояс {text}")
+        return text
+    if isinstance(default, bool):
+        if text.lower() in _TRUE:
+            return True
+        if text.lower() in _FALSE:
+            return False
+        raise ValueError(f"{name}: ожидается да/нет")
+    if isinstance(default, int):
+        if not text.lstrip('-').isdigit():
+            raise ValueError(f"{name}: ожидается целое число")
+        value = int(text)
+        if name.endswith('_hour') and not 0 <= value <= 23:
+            raise ValueError(f"{name}: час от 0 до 23")
+        return value
+    return text
+
+
+class ChatSettingsCache:
+    """Настройки чатов в памяти: на горячем пути ни одного запроса.
+
+    Все строки chat_settings загружаются одним запросом при запуске, дальше
+    get берет настройки из словаря (чат без строки - DEFAULT_SETTINGS).
+    Изменения идут только через update: строка пишется в БД, ее версия
+    растет, и запись кэша заменяется сразу после коммита. Запись с версией
+    старше кэшированной не применяется. Пояс чата передается в Clock, по
+    нему считаются и часы окна ежедневного сообщения.
+    """
+    _clock: Clock
+    _settings: dict[int, ChatSettingsRecord]
+
+    def __init__(self, clock: Clock = default_clock):
+        self._clock = clock
+        self._settings = {}
+        self.stats = {'lookups': 0, 'loaded': 0, 'updates': 0}
+
+    def get(self, chat_id: int) -> ChatSettingsRecord:
+        self.stats['lookups'] += 1
+        return self._settings.get(chat_id, DEFAULT_SETTINGS)
+
+    async def load(self, session: AsyncSession) -> int:
+        """Загружает настройки всех чатов. Возвращает число чатов со своими настройками."""
+        result = await session.execute(select(*_SELECT_COLUMNS))
+        self._settings = {}
+        for chat_id, version, *values in result.all():
+            self._apply(chat_id, _record(version, values))
+        self.stats['loaded'] = len(self._settings)
+        logging.info(f"Загружены настройки {len(self._settings)} чатов")
+        return len(self._settings)
+
+    async def update(self, session: AsyncSession, chat_id: int, changes: dict[str, Any]) -> ChatSettingsRecord:
+        """Меняет настройки чата (None - значение по умолчанию) и коммитит.
+
+        Чат должен существовать. Окно с началом позже конца - ValueError.
+        """
+        merged = replace(self.get(chat_id), **{
+            name: getattr(DEFAULT_SETTINGS, name) if value is None else value
+            for name, value in changes.items()
+        })
+        if merged.daily_start_hour > merged.daily_end_hour:
+            raise ValueError("daily_start_hour не может быть больше daily_end_hour")
+
+        insert = _INSERT[session.get_bind().dialect.name]
+        statement = insert(ChatSettings).values(chat_id=chat_id, version=1, **changes)
+        row = (await session.execute(
+            statement
+            .on_conflict_do_update(index_elements=['chat_id'], set_={**changes, 'version': ChatSettings.version + 1})
+            .returning(*_SELECT_COLUMNS)
+        )).one()
+        await session.commit()
+
+        _, version, *values = row
+        record = _record(version, values)
+        self._apply(chat_id, record)
+        self.stats['updates'] += 1
+        return record
+
+    def _apply(self, chat_id: int, record: ChatSettingsRecord):
+        current = self._settings.get(chat_id)
+        if current is not None and current.version > record.version:
+            return
+        try:
+            self._clock.set_chat_timezone(chat_id, record.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            logging.error(f"Неизвестный часовой пояс {record.timezone!r} у чата {chat_id}, используется пояс по умолчанию")
+            self._clock.set_chat_timezone(chat_id, None)
+        self._settings[chat_id] = record
@@ -1,14 +1,14 @@
 # Стандартные библиотеки
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 # Сторонние библиотеки
-import pytz
 from sqlalchemy import and_, delete
 
 # Локальные импорты
+from .clock import clock
 from database.database import Database
-from database.models import SchedulerTask
+from database.models import OutboxMessage, OutboxStatus, SchedulerTask
 
 class CleanupHandler:
     def __init__(self, db: Database):
@@ -16,8 +16,7 @@ class CleanupHandler:
 
     async def cleanup_old_tasks(self):
         try:
-            utc_tz = pytz.UTC
-            cutoff_date = datetime.now(utc_tz) - timedelta(days=10)
+            cutoff_date = clock.now() - timedelta(days=10)
             
             async for session in self._db.get_session():
                 # Удаляем старые выполненные задачи
@@ -28,10 +27,22 @@ class CleanupHandler:
                     )
                 )
                 result = await session.execute(delete_query)
+                
+                # И обработанные сообщения outbox
+                outbox_result = await session.execute(
+                    delete(OutboxMessage).where(
+                        and_(
+                            OutboxMessage.status != OutboxStatus.PENDING,
+                            OutboxMessage.created_at < cutoff_date
+                        )
+                    )
+                )
                 await session.commit()
                 
                 deleted_count = result.rowcount
-                logging.info(f"Удалено {deleted_count} старых выполненных задач")
+                logging.info(
+                    f"Удалено {deleted_count} старых выполненных задач и {outbox_result.rowcount} сообщений outbox"
+                )
         except Exception as e:
             logging.error(f"Ошибка при очистке старых задач: {e}")
             raise e 
\ No newline at end of file
@@ -0,0 +1,164 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+UTC = timezone.utc
+DEFAULT_TIMEZONE = 'Europe/Moscow'
+MIDNIGHT = datetime.min.time()
+
+# Тик не спит дольше: границы дня могут сдвинуться при смене правил пояса
+MAX_TICK = 3600.0
+
+
+@dataclass(frozen=True, slots=True)
+class Day:
+    """Календарный день в поясе zone: [start, end) как aware datetime в UTC."""
+    date: date
+    zone: ZoneInfo
+    start: datetime
+    end: datetime
+    end_ts: float  # end.timestamp() - для сравнения с time.time()
+
+    def __contains__(self, moment: datetime) -> bool:
+        return self.start <= moment < self.end
+
+
+def _day(day: date, zone: ZoneInfo) -> Day:
+    # В UTC сравнение с временем задач не вызывает utcoffset пояса
+    start = datetime.combine(day, MIDNIGHT, tzinfo=zone).astimezone(UTC)
+    end = datetime.combine(day + timedelta(days=1), MIDNIGHT, tzinfo=zone).astimezone(UTC)
+    return Day(day, zone, start, end, end.timestamp())
+
+
+class Clock:
+    """Текущее время и границы "сегодня" для ежедневной логики.
+
+    Сегодняшний день считается один раз на пояс и берется из кэша, пока не
+    наступит полночь этого пояса: на горячем пути остается только сравнение
+    time.time() с концом дня. Фоновый тик к полуночи пересчитывает дни заранее
+    и вызывает подписчиков on_new_day. У чата может быть свой пояс, у
+    остальных - пояс по умолчанию (Москва); о смене пояса чата узнают
+    подписчики on_timezone_change. Пояса - zoneinfo, без pytz.
+    """
+    _default: ZoneInfo
+    _chat_zones: dict[int, ZoneInfo]
+    _today: dict[ZoneInfo, Day]
+    _listeners: list[Callable[[Day], None]]
+    _zone_listeners: list[Callable[[int], None]]
+    _announced: dict[ZoneInfo, date]
+
+    def __init__(self, default_timezone: str = DEFAULT_TIMEZONE):
+        self._default = ZoneInfo(default_timezone)
+        self._chat_zones = {}
+        self._today = {}
+        self._listeners = []
+        self._zone_listeners = []
+        self._announced = {}
+        self._task: asyncio.Task | None = None
+        self.stats = {'hits': 0, 'refreshes': 0}
+
+    @property
+    def default_zone(self) -> ZoneInfo:
+        return self._default
+
+    def set_default_timezone(self, name: str):
+        self._default = ZoneInfo(name)
+
+    def set_chat_timezone(self, chat_id: int, name: str | None):
+        """Пояс чата; None - пояс по умолчанию. Неизвестное имя - ZoneInfoNotFoundError."""
+        previous = self.zone(chat_id)
+        if name is None:
+            self._chat_zones.pop(chat_id, None)
+        else:
+            self._chat_zones[chat_id] = ZoneInfo(name)
+        if self.zone(chat_id) != previous:
+            for callback in self._zone_listeners:
+                callback(chat_id)
+
+    def zone(self, chat_id: int | None = None) -> ZoneInfo:
+        if chat_id is None:
+            return self._default
+        return self._chat_zones.get(chat_id, self._default)
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(UTC)
+
+    def today(self, chat_id: int | None = None) -> Day:
+        """Сегодняшний день чата (без chat_id - в поясе по умолчанию)."""
+        return self.today_in(self.zone(chat_id))
+
+    def today_in(self, zone: ZoneInfo) -> Day:
+        day = self._today.get(zone)
+        if day is not None and time.time() < day.end_ts:
+            self.stats['hits'] += 1
+            return day
+        return self._refresh(zone)
+
+    def day_of(self, moment: datetime, chat_id: int | None = None) -> date:
+        """День, на который приходится moment, в поясе чата."""
+        zone = self.zone(chat_id)
+        day = self._today.get(zone)
+        # Обычно moment - сегодня: обходимся без astimezone
+        if day is not None and moment in day:
+            return day.date
+        return moment.astimezone(zone).date()
+
+    def day(self, day: date, chat_id: int | None = None) -> Day:
+        """Границы произвольного дня в поясе чата."""
+        zone = self.zone(chat_id)
+        today = self._today.get(zone)
+        if today is not None and today.date == day:
+            return today
+        return _day(day, zone)
+
+    def on_new_day(self, callback: Callable[[Day], None]):
+        """callback(day) вызывается тиком, когда в одном из поясов наступил новый день."""
+        self._listeners.append(callback)
+
+    def on_timezone_change(self, callback: Callable[[int], None]):
+        """callback(chat_id) вызывается, когда у чата сменился пояс: его дни теперь другие."""
+        self._zone_listeners.append(callback)
+
+    def _refresh(self, zone: ZoneInfo) -> Day:
+        self.stats['refreshes'] += 1
+        day = self._today[zone] = _day(datetime.now(zone).date(), zone)
+        # Первый день пояса - точка отсчета для on_new_day
+        self._announced.setdefault(zone, day.date)
+        return day
+
+    def start(self):
+        self._task = asyncio.create_task(self._tick())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _tick(self):
+        while True:
+            now = time.time()
+            next_midnight = min((day.end_ts for day in self._today.values()), default=now + MAX_TICK)
+            await asyncio.sleep(min(max(next_midnight - now, 0.0), MAX_TICK))
+
+            # День мог смениться и раньше - при обращении к today_in после полуночи
+            for zone in list(self._today):
+                day = self.today_in(zone)
+                if self._announced[zone] == day.date:
+                    continue
+                self._announced[zone] = day.date
+                for callback in self._listeners:
+                    try:
+                        callback(day)
+                    except Exception as e:
+                        logging.error(f"Ошибка обработки нового дня {day.date} ({zone.key}): {e}")
+
+
+# Общие часы бота: нужны и фильтрам, и планировщику, и обработчикам
+clock = Clock()
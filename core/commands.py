@@ -0,0 +1,60 @@
+# Общий слой команд: логика команды не зависит от того, как она вызвана -
+# сообщением (/ratings) или кнопкой меню /help. Команда получает CommandContext
+# и возвращает CommandResult, а отправкой занимается вызывающая сторона.
+
+# Стандартные библиотеки
+from dataclasses import dataclass
+
+# Сторонние библиотеки
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+
+
+@dataclass(slots=True, frozen=True)
+class CommandContext:
+    chat_id: int
+    chat_type: str
+    chat_title: str | None
+    user_id: int
+    username: str | None
+
+    @property
+    def is_private(self) -> bool:
+        return self.chat_type == 'private'
+
+    @classmethod
+    def from_message(cls, message: Message) -> 'CommandContext':
+        return cls(
+            message.chat.id,
+            message.chat.type,
+            message.chat.title,
+            message.from_user.id,
+            message.from_user.username
+        )
+
+    @classmethod
+    def from_callback(cls, callback: CallbackQuery) -> 'CommandContext':
+        """Чат - тот, где нажата кнопка, пользователь - нажавший."""
+        chat = callback.message.chat
+        return cls(chat.id, chat.type, chat.title, callback.from_user.id, callback.from_user.username)
+
+
+@dataclass(slots=True, frozen=True)
+class CommandResult:
+    text: str
+    parse_mode: str | None = None
+    reply_markup: InlineKeyboardMarkup | None = None
+    photo: str | None = None     # с фото text становится подписью
+    as_reply: bool = True        # ответом на команду или обычным сообщением в чат
+    drop_request: bool = False   # молча удалить команду (в меню text показывается уведомлением)
+
+
+async def send_result(message: Message, result: CommandResult):
+    """Отвечает на команду, отправленную сообщением."""
+    if result.drop_request:
+        await message.delete()
+    elif result.photo:
+        await message.reply_photo(photo=result.photo, caption=result.text)
+    elif result.as_reply:
+        await message.reply(result.text, parse_mode=result.parse_mode, reply_markup=result.reply_markup)
+    else:
+        await message.answer(result.text, parse_mode=result.parse_mode, reply_markup=result.reply_markup)
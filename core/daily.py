@@ -1,63 +1,80 @@
 import logging
 
 from aiogram import Bot
-from sqlalchemy import select
+from database import queries
 from database.database import Database
-from database.models import SchedulerTask, Chat
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from database.fast import get_chat_record
+from database.models import SchedulerTask
+from .chat_settings import ChatSettingsCache
+from .clock import clock
+from .daily_button import pack_daily_button
+from .keyboards import SLOT, KeyboardTemplate
+from .log_pipeline import CATEGORY_DAILY
+from .outbox import OutboxWorker, enqueue_message
+
+# Кнопка "Я первый!" - меняется только подписанная callback_data задачи
+DAILY_KEYBOARD = KeyboardTemplate((("Я первый! 🚀", SLOT),))
 
 class DailyHandler:
     _bot: Bot
     _db: Database
+    _chat_settings: ChatSettingsCache
 
-    def __init__(self, bot: Bot, db: Database):
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        outbox: OutboxWorker | None = None,
+        chat_settings: ChatSettingsCache | None = None
+    ):
         self._bot = bot
         self._db = db
+        self._outbox = outbox
+        self._chat_settings = chat_settings or ChatSettingsCache()
 
     async def send_daily_message(self, chat_id: int, task_id: int, scheduler=None):
+        """Ставит ежедневное сообщение в outbox и отмечает задачу выполненной одной транзакцией.
+
+        Отправку делает OutboxWorker: падение процесса после коммита не теряет
+        сообщение, а повторный запуск задачи не создает дубль (ключ daily:<id задачи>).
+        """
         try:
-            # Проверяем активность чата
             async for session in self._db.get_session():
-                chat = await session.execute(
-                    select(Chat).where(Chat.chat_id == chat_id)
-                )
-                chat = chat.scalar_one_or_none()
+                # Проверяем активность чата
+                chat = await get_chat_record(session, chat_id)
                 
                 if not chat or not chat.is_active:
-                    logging.info(f"Пропуск отправки сообщения в неактивный чат {chat_id}")
+                    logging.info(
+                        "Пропуск отправки сообщения в неактивный чат %s", chat_id,
+                        extra={'category': CATEGORY_DAILY, 'chat_id': chat_id}
+                    )
                     return
 
-            message_text = "Запустить локатор пидоров! 📡"
-            
-            # Создаем клавиатуру с кнопкой
-            keyboard = InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [
-                        InlineKeyboardButton(
-                            text="Я первый! 🚀",
-                            callback_data=f"daily_first_{task_id}"
-                        )
-                    ]
-                ]
-            )
-            
-            await self._bot.send_message(
-                chat_id, 
-                message_text, 
-                reply_markup=keyboard
-            )
-            
-            # Помечаем задачу как выполненную по id
-            async for session in self._db.get_session():
-                query = select(SchedulerTask).where(SchedulerTask.id == task_id)
-                result = await session.execute(query)
+                result = await session.execute(queries.GET_TASK, {'task_id': task_id})
                 task: SchedulerTask | None = result.scalar_one_or_none()
                 
+                keyboard = DAILY_KEYBOARD.payload(
+                    pack_daily_button(self._bot.token, task_id, clock.today(chat_id).date)
+                )
+                await enqueue_message(
+                    session, f"daily:{task_id}", chat_id, self._chat_settings.get(chat_id).daily_message, keyboard
+                )
+                
+                # Помечаем задачу как выполненную в той же транзакции
                 if task:
                     task.is_completed = True
-                    await session.commit()
+                await session.commit()
+                
+                if task and scheduler:
+                    scheduler.daily_states.task_fired(chat_id, task.scheduled_time)
+
+            if self._outbox:
+                self._outbox.notify()
             
-            logging.info(f"Отправлено ежедневное сообщение в чат {chat_id}")
+            logging.info(
+                "Ежедневное сообщение для чата %s поставлено в outbox", chat_id,
+                extra={'category': CATEGORY_DAILY, 'chat_id': chat_id}
+            )
             
             # Планируем следующую задачу через переданный scheduler
             if scheduler:
@@ -65,4 +82,4 @@ class DailyHandler:
             
         except Exception as e:
             logging.error(f"Ошибка при отправке ежедневного сообщения в чат {chat_id}: {e}")
-            raise e 
+            raise e
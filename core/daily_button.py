@@ -0,0 +1,83 @@
+# Стандартные библиотеки
+import base64
+import hashlib
+import hmac
+import logging
+from datetime import date
+from typing import Any
+
+# Сторонние библиотеки
+from aiogram import Bot
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+
+# Локальные импорты
+from .clock import clock
+from .log_pipeline import CATEGORY_DAILY
+
+# callback_data кнопки "Я первый!": df:<id задачи>:<день>:<подпись>.
+# id и день (date.toordinal в поясе чата) - в шестнадцатеричном виде, подпись - 8 байт
+# HMAC-SHA256 от токена бота в base64url. Итого около 30 байт из 64 допустимых.
+PREFIX = 'df'
+LEGACY_PREFIX = 'daily_first_'
+SIGNATURE_SIZE = 8
+
+
+def _sign(token: str, payload: str) -> str:
+    key = hashlib.sha256(f'daily-button:{token}'.encode()).digest()
+    digest = hmac.new(key, payload.encode(), hashlib.sha256).digest()[:SIGNATURE_SIZE]
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def pack_daily_button(token: str, task_id: int, day: date) -> str:
+    payload = f'{PREFIX}:{task_id:x}:{day.toordinal():x}'
+    return f'{payload}:{_sign(token, payload)}'
+
+
+class DailyButtonFilter(Filter):
+    """Пропускает только нажатия на сегодняшнюю кнопку "Я первый!".
+
+    Устаревшие и поддельные нажатия отклоняются по callback_data без обращения
+    к БД: пользователю уходит только callback.answer. Хендлер получает task_id
+    и task_day. Кнопки старого формата (daily_first_<id>) пропускаются с
+    task_day=None - их день хендлер проверяет по задаче в БД.
+    """
+    def __init__(self):
+        self.stats = {'accepted': 0, 'stale': 0, 'forged': 0, 'legacy': 0}
+
+    async def __call__(self, callback: CallbackQuery, bot: Bot) -> bool | dict[str, Any]:
+        data = callback.data or ''
+
+        if data.startswith(LEGACY_PREFIX):
+            task_id = data[len(LEGACY_PREFIX):]
+            if not task_id.isdigit():
+                return False
+            self.stats['legacy'] += 1
+            return {'task_id': int(task_id), 'task_day': None}
+
+        if not data.startswith(f'{PREFIX}:'):
+            return False
+
+        payload, _, signature = data.rpartition(':')
+        if not hmac.compare_digest(signature, _sign(bot.token, payload)):
+            self.stats['forged'] += 1
+            logging.warning(
+                "Отклонена поддельная кнопка %r от пользователя %s", data, callback.from_user.id,
+                extra={'category': CATEGORY_DAILY}
+            )
+            await callback.answer()
+            return False
+
+        _, task_id, day = payload.split(':')
+        task_day = date.fromordinal(int(day, 16))
+        chat_id = callback.message.chat.id if callback.message else None
+        if task_day != clock.today(chat_id).date:
+            self.stats['stale'] += 1
+            await callback.answer("Вы не успели выполнить команду в нужный день! 😢", show_alert=True)
+            return False
+
+        self.stats['accepted'] += 1
+        return {'task_id': int(task_id, 16), 'task_day': task_day}
+
+
+daily_button = DailyButtonFilter()
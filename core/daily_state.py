@@ -0,0 +1,85 @@
+# Стандартные библиотеки
+from dataclasses import dataclass
+from datetime import date, datetime
+
+# Локальные импорты
+from database import queries
+from .clock import Clock, Day, clock as default_clock
+
+
+@dataclass(slots=True)
+class DailyState:
+    """Ежедневные задачи чата за один день (в поясе чата)."""
+    fired_at: datetime | None = None    # время последней выполненной задачи
+    pending_at: datetime | None = None  # время последней невыполненной задачи
+
+
+class DailyStateCache:
+    """Состояние ежедневного сообщения чатов на сегодня для /daily_status.
+
+    Планировщик и обработчики обновляют записи при создании и выполнении задач,
+    поэтому в обычном случае ответ берется из памяти. При промахе состояние дня
+    читается одним запросом по покрывающему индексу ix_scheduler_tasks_chat_daily.
+    """
+    _clock: Clock
+    _states: dict[tuple[int, date], DailyState]
+
+    def __init__(self, clock: Clock = default_clock):
+        self._clock = clock
+        self._states = {}
+        self.stats = {'hits': 0, 'misses': 0}
+        clock.on_new_day(self._prune)
+        clock.on_timezone_change(self.forget)
+
+    async def get(self, session, chat_id: int) -> DailyState:
+        """Состояние на сегодня в поясе чата."""
+        today = self._clock.today(chat_id)
+
+        state = self._states.get((chat_id, today.date))
+        if state is not None:
+            self.stats['hits'] += 1
+            return state
+
+        self.stats['misses'] += 1
+        result = await session.execute(
+            queries.GET_DAILY_TASKS_IN_RANGE,
+            {'chat_id': chat_id, 'start': today.start, 'end': today.end}
+        )
+        state = DailyState()
+        for scheduled_time, is_completed in result.all():
+            self._apply(state, scheduled_time, is_completed)
+        self._states[(chat_id, today.date)] = state
+        return state
+
+    def task_scheduled(self, chat_id: int, scheduled_time: datetime):
+        """Планировщик создал задачу. Других задач у чата на этот день быть не может."""
+        state = self._states.setdefault((chat_id, self._clock.day_of(scheduled_time, chat_id)), DailyState())
+        self._apply(state, scheduled_time, False)
+
+    def task_fired(self, chat_id: int, scheduled_time: datetime):
+        """Задача выполнена. Обновляется только уже загруженная запись."""
+        state = self._states.get((chat_id, self._clock.day_of(scheduled_time, chat_id)))
+        if state is None:
+            return
+        if state.pending_at == scheduled_time:
+            state.pending_at = None
+        self._apply(state, scheduled_time, True)
+
+    @staticmethod
+    def _apply(state: DailyState, scheduled_time: datetime, is_completed: bool):
+        if is_completed:
+            if state.fired_at is None or scheduled_time > state.fired_at:
+                state.fired_at = scheduled_time
+        elif state.pending_at is None or scheduled_time > state.pending_at:
+            state.pending_at = scheduled_time
+
+    def forget(self, chat_id: int):
+        """Удаляет записи чата: после смены пояса они посчитаны для других границ дня."""
+        self._states = {key: state for key, state in self._states.items() if key[0] != chat_id}
+
+    def _prune(self, day: Day):
+        """В одном из поясов наступил новый день: удаляет записи прошедших дней его чатов."""
+        self._states = {
+            (chat_id, state_day): state for (chat_id, state_day), state in self._states.items()
+            if self._clock.zone(chat_id) != day.zone or state_day >= day.date
+        }
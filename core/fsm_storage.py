@@ -0,0 +1,251 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Сторонние библиотеки
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import and_, delete, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Локальные импорты
+from database.models import FsmRecord
+
+_INSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+_PRIMARY_KEY = (FsmRecord.bot_id, FsmRecord.chat_id, FsmRecord.user_id, FsmRecord.thread_id, FsmRecord.destiny)
+
+
+class _Entry:
+    """Состояние ключа. Пустая запись (state=None, data={}) - ключа нет и в БД."""
+    __slots__ = ('state', 'data', 'expires_at')
+
+    def __init__(self, state: str | None, data: dict[str, Any], expires_at: float):
+        self.state = state
+        self.data = data
+        self.expires_at = expires_at
+
+
+class _StandaloneDatabase:
+    """Отдельная БД для хранилища, например sqlite+aiosqlite:///fsm.sqlite (нужен aiosqlite)."""
+    def __init__(self, url: str):
+        self.engine = create_async_engine(url)
+        self._session_maker = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create_table(self):
+        # Миграции Alembic ведут только основную БД - здесь таблица создается сама
+        async with self.engine.begin() as connection:
+            await connection.run_sync(lambda sync: FsmRecord.__table__.create(sync, checkfirst=True))
+
+    async def get_session(self):
+        async with self._session_maker() as session:
+            yield session
+
+
+class SqlStorage(BaseStorage):
+    """FSM-хранилище aiogram в таблице fsm_states с временем жизни записей.
+
+    Состояния читаются из LRU-кэша на cache_size ключей, промах загружает
+    запись из БД. FSMContextMiddleware читает состояние на каждом апдейте, а
+    состояние есть у немногих ключей (начатые диалоги), поэтому start()
+    загружает множество ключей, у которых есть строка в БД (без данных), и
+    для остальных ключей запроса нет: все записи идут через этот процесс.
+    Запись сквозная: БД обновляется, и только после коммита меняются кэш и
+    множество ключей, так что после перезапуска состояние сохраняется.
+    Каждая запись продлевает жизнь ключа на ttl секунд. Истекшие строки
+    удаляются фоновой задачей пачками по sweep_batch, пустые - сразу.
+    Данные FSM должны сериализоваться в JSON.
+    """
+    _db: Any
+    _ttl: float
+    _cache_size: int
+    _sweep_interval: float
+    _sweep_batch: int
+    _cache: OrderedDict[StorageKey, _Entry]
+    _stored: dict[StorageKey, float]
+
+    def __init__(
+        self,
+        db,
+        ttl: float = 86400.0,
+        cache_size: int = 1024,
+        sweep_interval: float = 300.0,
+        sweep_batch: int = 500
+    ):
+        self._db = db
+        self._ttl = ttl
+        self._cache_size = cache_size
+        self._sweep_interval = sweep_interval
+        self._sweep_batch = sweep_batch
+        self._cache = OrderedDict()
+        self._stored = {}  # ключи со строкой в БД -> expires_at
+        self._task: asyncio.Task | None = None
+        self.stats = {'stored': 0, 'hits': 0, 'misses': 0, 'absent': 0, 'writes': 0, 'expired': 0}
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> 'SqlStorage':
+        """Хранилище в собственной БД, а не в основной."""
+        return cls(_StandaloneDatabase(url), **kwargs)
+
+    async def start(self):
+        """Загружает ключи живых состояний и запускает очистку. Вызывается до старта polling."""
+        if isinstance(self._db, _StandaloneDatabase):
+            await self._db.create_table()
+        await self._load_keys()
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def _load_keys(self):
+        now = time.time()
+        async for session in self._db.get_session():
+            result = await session.execute(
+                select(*_PRIMARY_KEY, FsmRecord.expires_at).where(FsmRecord.expires_at > now)
+            )
+            self._stored = {
+                StorageKey(
+                    bot_id=bot_id, chat_id=chat_id, user_id=user_id, thread_id=thread_id or None, destiny=destiny
+                ): expires_at
+                for bot_id, chat_id, user_id, thread_id, destiny, expires_at in result.all()
+            }
+        self.stats['stored'] = len(self._stored)
+        logging.info(f"Загружено ключей состояний FSM: {len(self._stored)}")
+
+    async def close(self):
+        # Dispatcher закрывает хранилище при остановке polling, когда хендлеры
+        # еще могут дорабатывать: останавливаем только очистку
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logging.info(f"FSM-хранилище остановлено: {self.stats}")
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        entry = await self._load(key)
+        await self._write(key, _Entry(state.state if isinstance(state, State) else state, entry.data, 0))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]):
+        entry = await self._load(key)
+        await self._write(key, _Entry(entry.state, data.copy(), 0))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._load(key)).data.copy()
+
+    async def _load(self, key: StorageKey) -> _Entry:
+        now = time.time()
+        entry = self._cache.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+        # Строки в БД нет - запрос не нужен
+        if self._stored.get(key, 0) <= now:
+            self.stats['absent'] += 1
+            return _Entry(None, {}, 0)
+
+        self.stats['misses'] += 1
+        async for session in self._db.get_session():
+            row = (await session.execute(
+                select(FsmRecord.state, FsmRecord.data, FsmRecord.expires_at)
+                .where(self._match(key), FsmRecord.expires_at > now)
+            )).one_or_none()
+        if row is None:
+            return _Entry(None, {}, 0)
+        entry = _Entry(row.state, row.data or {}, row.expires_at)
+        self._remember(key, entry)
+        return entry
+
+    async def _write(self, key: StorageKey, entry: _Entry):
+        entry.expires_at = time.time() + self._ttl
+        self.stats['writes'] += 1
+
+        async for session in self._db.get_session():
+            if entry.state is None and not entry.data:
+                # После state.clear() строка не нужна
+                await session.execute(
+                    delete(FsmRecord).where(self._match(key))
+                )
+            else:
+                bot_id, chat_id, user_id, thread_id, destiny = self._key(key)
+                insert = _INSERT[session.get_bind().dialect.name]
+                statement = insert(FsmRecord).values(
+                    bot_id=bot_id,
+                    chat_id=chat_id,
+                    user_id=user_id,
+                    thread_id=thread_id,
+                    destiny=destiny,
+                    state=entry.state,
+                    data=entry.data,
+                    expires_at=int(entry.expires_at)
+                )
+                await session.execute(statement.on_conflict_do_update(
+                    index_elements=list(_PRIMARY_KEY),
+                    set_={
+                        'state': statement.excluded.state,
+                        'data': statement.excluded.data,
+                        'expires_at': statement.excluded.expires_at
+                    }
+                ))
+            await session.commit()
+
+        # Память меняется только после коммита и не расходится с БД
+        if entry.state is None and not entry.data:
+            self._cache.pop(key, None)
+            self._stored.pop(key, None)
+        else:
+            self._remember(key, entry)
+            self._stored[key] = entry.expires_at
+
+    def _remember(self, key: StorageKey, entry: _Entry):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _key(key: StorageKey) -> tuple[int, int, int, int, str]:
+        return key.bot_id, key.chat_id, key.user_id, key.thread_id or 0, key.destiny
+
+    def _match(self, key: StorageKey):
+        return and_(*(column == value for column, value in zip(_PRIMARY_KEY, self._key(key))))
+
+    async def sweep(self) -> int:
+        """Удаляет истекшие записи из памяти и БД. Возвращает число удаленных строк."""
+        now = time.time()
+        for key in [key for key, entry in self._cache.items() if entry.expires_at <= now]:
+            del self._cache[key]
+        for key in [key for key, expires_at in self._stored.items() if expires_at <= now]:
+            del self._stored[key]
+
+        removed = 0
+        while True:
+            # Пачками, чтобы не держать блокировки на всей таблице
+            async for session in self._db.get_session():
+                result = await session.execute(
+                    delete(FsmRecord)
+                    .where(tuple_(*_PRIMARY_KEY).in_(
+                        select(*_PRIMARY_KEY).where(FsmRecord.expires_at <= now).limit(self._sweep_batch)
+                    ))
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+            removed += result.rowcount
+            if result.rowcount < self._sweep_batch:
+                break
+        self.stats['expired'] += removed
+        return removed
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logging.error(f"Ошибка очистки FSM-хранилища: {e}")
+            await asyncio.sleep(self._sweep_interval)
@@ -0,0 +1,80 @@
+# Стандартные библиотеки
+from typing import Any, Callable
+
+# Сторонние библиотеки
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Кнопка: (текст, callback_data)
+Row = tuple[tuple[str, str], ...]
+
+# Место изменяемой callback_data в KeyboardTemplate
+SLOT = '{callback_data}'
+
+
+class KeyboardRegistry:
+    """Статичные клавиатуры, собранные один раз при запуске.
+
+    Клавиатура - обычная InlineKeyboardMarkup, один объект отдается всем
+    хендлерам. Модели aiogram изменяемые, поэтому зарегистрированные
+    клавиатуры менять нельзя: для другой клавиатуры нужна новая модель.
+    JSON клавиатуры считает сессия тем же путем, что и aiogram
+    (prepare_value и json_dumps), при первой отправке, дальше он берется
+    из кэша - отправка не зависит от сессии, а с TunedAiohttpSession
+    только быстрее.
+    """
+    _markups: dict[str, InlineKeyboardMarkup]
+    _payloads: dict[int, tuple[InlineKeyboardMarkup, str | None]]
+
+    def __init__(self):
+        self._markups = {}
+        self._payloads = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def add(self, name: str, *rows: Row) -> InlineKeyboardMarkup:
+        if name in self._markups:
+            raise ValueError(f"Клавиатура {name} уже зарегистрирована")
+        markup = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text=text, callback_data=data) for text, data in row] for row in rows
+        ])
+        self._markups[name] = markup
+        # Объект хранится вместе с JSON: id не переиспользуется, пока жива клавиатура
+        self._payloads[id(markup)] = (markup, None)
+        return markup
+
+    def __getitem__(self, name: str) -> InlineKeyboardMarkup:
+        return self._markups[name]
+
+    def cached_json(self, markup: Any, serialize: Callable[[InlineKeyboardMarkup], str]) -> str | None:
+        """JSON зарегистрированной клавиатуры (serialize - при первом обращении), None - для любой другой."""
+        entry = self._payloads.get(id(markup))
+        if entry is None or entry[0] is not markup:
+            return None
+        if entry[1] is None:
+            self.stats['misses'] += 1
+            entry = self._payloads[id(markup)] = (markup, serialize(markup))
+        else:
+            self.stats['hits'] += 1
+        return entry[1]
+
+
+class KeyboardTemplate:
+    """Клавиатура, в которой меняется только callback_data одной кнопки (SLOT).
+
+    Остальные кнопки собраны заранее, при отправке подставляется одна строка.
+    """
+    _rows: tuple[Row, ...]
+
+    def __init__(self, *rows: Row):
+        if sum(data == SLOT for row in rows for _, data in row) != 1:
+            raise ValueError("В шаблоне клавиатуры должна быть ровно одна кнопка с SLOT")
+        self._rows = rows
+
+    def payload(self, callback_data: str) -> dict[str, Any]:
+        """Клавиатура в виде словаря Bot API - как ее хранит outbox."""
+        return {'inline_keyboard': [
+            [{'text': text, 'callback_data': callback_data if data == SLOT else data} for text, data in row]
+            for row in self._rows
+        ]}
+
+
+keyboards = KeyboardRegistry()
@@ -0,0 +1,74 @@
+# Стандартные библиотеки
+import asyncio
+import inspect
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+
+class Lifecycle:
+    """Учет незавершенной работы и корректная остановка бота.
+
+    Хендлеры апдейтов и задачи планировщика выполняются внутри track().
+    При остановке новые апдейты больше не принимаются, незавершенная работа
+    дожидается в пределах drain_timeout, затем по порядку выполняются шаги
+    остановки (сброс буферов, закрытие пулов), зарегистрированные через on_shutdown.
+    """
+    _drain_timeout: float
+    _in_flight: dict[str, int]
+    _idle: asyncio.Event
+    _shutdown_steps: list[tuple[str, Callable[[], Awaitable[Any] | Any]]]
+
+    def __init__(self, drain_timeout: float = 25.0):
+        self._drain_timeout = drain_timeout
+        self._in_flight = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._shutdown_steps = []
+        self.accepting = True
+        self.stats = {'tracked': 0, 'rejected': 0}
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    @asynccontextmanager
+    async def track(self, kind: str):
+        """Отмечает работу вида kind ('update', 'job') как незавершенную."""
+        self.stats['tracked'] += 1
+        self._in_flight[kind] = self._in_flight.get(kind, 0) + 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight[kind] -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    def on_shutdown(self, name: str, step: Callable[[], Awaitable[Any] | Any]):
+        """Регистрирует шаг остановки. Шаги выполняются в порядке регистрации."""
+        self._shutdown_steps.append((name, step))
+
+    async def shutdown(self):
+        started = time.monotonic()
+        self.accepting = False
+
+        if self.in_flight:
+            logging.info(f"Ожидание незавершенной работы: {self._in_flight}")
+            try:
+                await asyncio.wait_for(self._idle.wait(), self._drain_timeout)
+            except asyncio.TimeoutError:
+                logging.warning(
+                    f"Не дождались завершения за {self._drain_timeout} с, осталось: {self._in_flight}"
+                )
+
+        for name, step in self._shutdown_steps:
+            try:
+                result = step()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.error(f"Ошибка на шаге остановки '{name}': {e}")
+
+        logging.info(f"Остановка завершена за {time.monotonic() - started:.2f} с")
@@ -0,0 +1,113 @@
+# Стандартные библиотеки
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Идентификаторы текущего апдейта, проставляются LoggingContextMiddleware
+update_id_var: ContextVar[int | None] = ContextVar('update_id', default=None)
+chat_id_var: ContextVar[int | None] = ContextVar('chat_id', default=None)
+
+# Категории частых сообщений, которые можно прореживать через LOG_SAMPLING
+CATEGORY_SCHEDULE = 'schedule'
+CATEGORY_DAILY = 'daily'
+CATEGORY_VK = 'vk'
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет в запись id апдейта и чата (выполняется в потоке event loop)."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'update_id'):
+            record.update_id = update_id_var.get()
+        if not hasattr(record, 'chat_id'):
+            record.chat_id = chat_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю записей своей категории. Ошибки не прореживаются."""
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self._rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rates.get(getattr(record, 'category', None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+# Аргументы этих типов не меняются после вызова логгера, их безопасно форматировать позже
+_IMMUTABLE_ARGS = (str, int, float, datetime, date, type(None))
+
+
+class LazyQueueHandler(QueueHandler):
+    """Кладет запись в очередь, по возможности без форматирования.
+
+    Стандартный QueueHandler форматирует сообщение до постановки в очередь,
+    то есть в event loop. Очередь здесь внутрипроцессная, поэтому запись
+    можно передать как есть, но только если аргументы неизменяемые: объект
+    (модель, словарь, список) к моменту работы слушателя может измениться,
+    и в лог попадет не то, что было при вызове. Такие сообщения
+    форматируются сразу, а args очищаются.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну строку JSON."""
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in ('category', 'update_id', 'chat_id'):
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(
+    level: str = 'INFO',
+    sampling: dict[str, float] | None = None,
+    as_json: bool = True,
+    stream=None
+) -> QueueListener:
+    """Настраивает логирование через очередь и запускает фоновый слушатель.
+
+    Обработчики с вводом-выводом работают в потоке слушателя, event loop только
+    кладет записи в очередь. Слушатель нужно остановить при выключении (stop()).
+    """
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(
+        JsonFormatter() if as_json else logging.Formatter('%(levelname)s:%(name)s:%(message)s')
+    )
+
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sampling or {}))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,217 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+import time
+
+# Сторонние библиотеки
+from aiogram import Bot
+
+# Локальные импорты
+from database import queries
+from database.database import Database
+from .ttl_cache import TtlCache
+
+# Пользователей в одном UPDATE ... IN (...)
+DEACTIVATE_BATCH = 1000
+
+
+class _ChatEvents:
+    """Входы и выходы одного чата, накопленные за текущее окно."""
+    __slots__ = ('joined', 'left', 'first_at', 'last_at')
+
+    def __init__(self, now: float):
+        self.joined: dict[int, str] = {}  # user_id -> имя для приветствия
+        self.left: set[int] = set()
+        self.first_at = now
+        self.last_at = now
+
+
+class _ChatMessage:
+    """Неотправленное сообщение чата: имена всех окон, закрытых после прошлой отправки."""
+    __slots__ = ('greetings', 'farewells', 'next_at')
+
+    def __init__(self, now: float):
+        self.greetings: dict[int, str] = {}
+        self.farewells: dict[int, str] = {}
+        self.next_at = now  # раньше этого времени в чат не пишем
+
+
+def _names(names: list[str], limit: int) -> str:
+    shown = ", ".join(names[:limit])
+    return f"{shown} и еще {len(names) - limit}" if len(names) > limit else shown
+
+
+class MemberEventAggregator:
+    """Обрабатывает входы и выходы участников пачками по чатам.
+
+    События чата копятся, пока идут чаще, чем раз в window секунд, но не
+    дольше max_delay секунд от первого. Затем выходы деактивируются одним
+    UPDATE, а приветствия и прощания добавляются в неотправленное сообщение
+    чата. Сообщения в чат отправляются не чаще раза в message_interval
+    секунд: окна, закрытые за это время, сливаются в одно сообщение, а не
+    встают в очередь. В сообщении перечисляется не больше max_names имен.
+    Вышедший до отправки приветствия не приветствуется. Чат, которому
+    message_interval секунд нечего отправить, больше не хранится.
+    """
+    _bot: Bot
+    _db: Database
+    _leaderboards: TtlCache | None
+    _window: float
+    _max_delay: float
+    _message_interval: float
+    _max_names: int
+    _chats: dict[int, _ChatEvents]
+    _messages: dict[int, _ChatMessage]
+
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        leaderboards: TtlCache | None = None,
+        window: float = 5.0,
+        max_delay: float = 30.0,
+        message_interval: float = 60.0,
+        max_names: int = 20
+    ):
+        self._bot = bot
+        self._db = db
+        self._leaderboards = leaderboards
+        self._window = window
+        self._max_delay = max_delay
+        self._message_interval = message_interval
+        self._max_names = max_names
+        self._chats = {}
+        self._messages = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._senders: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        # Ставится, когда при остановке все окна обработаны: тогда каждый чат получает одно сообщение
+        self._flushed = asyncio.Event()
+        self.stats = {'events': 0, 'windows': 0, 'deactivated': 0, 'messages': 0, 'merged': 0}
+
+    def joined(self, chat_id: int, user_id: int, name: str):
+        events = self._events(chat_id)
+        events.joined[user_id] = name
+
+    def left(self, chat_id: int, user_id: int):
+        events = self._events(chat_id)
+        events.joined.pop(user_id, None)
+        events.left.add(user_id)
+
+    def _events(self, chat_id: int) -> _ChatEvents:
+        self.stats['events'] += 1
+        now = time.monotonic()
+        events = self._chats.get(chat_id)
+        if events is None:
+            events = self._chats[chat_id] = _ChatEvents(now)
+            task = asyncio.create_task(self._run_window(chat_id, events))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        events.last_at = now
+        return events
+
+    async def stop(self):
+        """Сразу обрабатывает накопленные окна, не дожидаясь их окончания и интервала сообщений."""
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._flushed.set()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        logging.info(f"События участников остановлены: {self.stats}")
+
+    async def _run_window(self, chat_id: int, events: _ChatEvents):
+        # Окно продлевается новыми событиями; при остановке обрабатывается сразу
+        while True:
+            due = min(events.last_at + self._window, events.first_at + self._max_delay)
+            if not await self._wait(due - time.monotonic(), self._stopping):
+                break
+
+        # Новые события идут уже в следующее окно
+        self._chats.pop(chat_id, None)
+        self.stats['windows'] += 1
+        try:
+            await self._flush(chat_id, events)
+        except Exception as e:
+            logging.error(f"Ошибка обработки событий участников чата {chat_id}: {e}")
+
+    async def _wait(self, delay: float, stop: asyncio.Event) -> bool:
+        """Ждет delay секунд. False - ждать не нужно: время вышло или stop установлен."""
+        if delay <= 0 or stop.is_set():
+            return False
+        try:
+            await asyncio.wait_for(stop.wait(), delay)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    async def _flush(self, chat_id: int, events: _ChatEvents):
+        farewells: dict[int, str] = {}
+        if events.left:
+            user_ids = list(events.left)
+            async for session in self._db.get_session():
+                for start in range(0, len(user_ids), DEACTIVATE_BATCH):
+                    rows = (await session.execute(queries.DEACTIVATE_USERS, {
+                        'b_chat_id': chat_id,
+                        'b_user_ids': user_ids[start:start + DEACTIVATE_BATCH]
+                    })).all()
+                    farewells.update((user_id, username or str(user_id)) for user_id, username in rows)
+                await session.commit()
+            self.stats['deactivated'] += len(farewells)
+            if farewells and self._leaderboards:
+                self._leaderboards.invalidate(lambda key: key[0] == chat_id)
+            logging.info(f"В чате {chat_id} деактивировано пользователей: {len(farewells)}")
+
+        # Выходы без прощаний (пользователь не был зарегистрирован) только снимают приветствия
+        if events.joined or farewells or chat_id in self._messages:
+            self._queue_message(chat_id, events, farewells)
+
+    def _queue_message(self, chat_id: int, events: _ChatEvents, farewells: dict[int, str]):
+        message = self._messages.get(chat_id)
+        if message is None:
+            message = self._messages[chat_id] = _ChatMessage(time.monotonic())
+            task = asyncio.create_task(self._run_sender(chat_id, message))
+            self._senders.add(task)
+            task.add_done_callback(self._senders.discard)
+        elif message.greetings or message.farewells:
+            self.stats['merged'] += 1
+        for user_id in events.left:
+            message.greetings.pop(user_id, None)
+        message.greetings.update(events.joined)
+        message.farewells.update(farewells)
+
+    async def _run_sender(self, chat_id: int, message: _ChatMessage):
+        # Отправляет накопленное не чаще раза в message_interval; пока ждет, новые окна
+        # дописываются в то же сообщение. Нечего отправить за интервал - чат забывается
+        try:
+            while True:
+                await self._wait(message.next_at - time.monotonic(), self._flushed)
+                text = self._summary(list(message.greetings.values()), list(message.farewells.values()))
+                if not text:
+                    return
+                message.greetings = {}
+                message.farewells = {}
+                message.next_at = time.monotonic() + self._message_interval
+                try:
+                    await self._bot.send_message(chat_id=chat_id, text=text)
+                    self.stats['messages'] += 1
+                except Exception as e:
+                    logging.error(f"Ошибка отправки сообщения об участниках в чат {chat_id}: {e}")
+        finally:
+            self._messages.pop(chat_id, None)
+
+    def _summary(self, greetings: list[str], farewells: list[str]) -> str | None:
+        parts = []
+        if len(greetings) == 1:
+            parts.append(
+                f"Привет, {greetings[0]}! 👋\n\n"
+                f"Если хочешь участвовать в поиске пидорасов, используй команду /addme"
+            )
+        elif greetings:
+            parts.append(
+                f"Привет, {_names(greetings, self._max_names)}! 👋\n\n"
+                f"Если хотите участвовать в поиске пидорасов, используйте команду /addme"
+            )
+        if len(farewells) == 1:
+            parts.append(f"Пользователь {farewells[0]} сбежал из видимости моего радара!")
+        elif farewells:
+            parts.append(f"Пользователи {_names(farewells, self._max_names)} сбежали из видимости моего радара!")
+        return "\n\n".join(parts) or None
@@ -1,12 +1,20 @@
 # Стандартные библиотеки
+import time
 from typing import Any, Awaitable, Callable
 
 # Сторонние библиотеки
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from vk_api import VkApi
 
 # Локальные импорты
+from .chat_executor import ChatKeyedExecutor
+from .chat_settings import ChatSettingsCache
+from .lifecycle import Lifecycle
+from .log_pipeline import chat_id_var, update_id_var
+from .member_events import MemberEventAggregator
+from .profiler import StartupProfiler
+from .ttl_cache import TtlCache
+from .usernames import UsernameTracker
 from .vk_handler import VKHandler
 from core.scheduler import Scheduler
 
@@ -24,10 +32,52 @@ class SchedulerMiddleware(BaseMiddleware):
         data["scheduler"] = self._scheduler
         return await handler(event, data) 
     
+class LeaderboardMiddleware(BaseMiddleware):
+    def __init__(self, leaderboards: TtlCache) -> None:
+        self._leaderboards = leaderboards
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        data["leaderboards"] = self._leaderboards
+        return await handler(event, data)
+
+class ChatSettingsMiddleware(BaseMiddleware):
+    def __init__(self, chat_settings: ChatSettingsCache) -> None:
+        self._chat_settings = chat_settings
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        data["chat_settings"] = self._chat_settings
+        return await handler(event, data)
+
+class MemberEventsMiddleware(BaseMiddleware):
+    def __init__(self, member_events: MemberEventAggregator) -> None:
+        self._member_events = member_events
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        data["member_events"] = self._member_events
+        return await handler(event, data)
+
 class VKMiddleware(BaseMiddleware):
     def __init__(self, token: str) -> None:
-        vk_session = VkApi(token=token)
-        self._vk_handler = VKHandler(vk_session.get_api())
+        # Клиент VK создается при первом обращении к API, а не при запуске
+        self._vk_handler = VKHandler(token)
         super().__init__()
 
     async def __call__(
@@ -37,4 +87,119 @@ class VKMiddleware(BaseMiddleware):
         data: dict[str, Any]
     ) -> Any:
         data["vk_handler"] = self._vk_handler    
-        return await handler(event, data) 
\ No newline at end of file
+        return await handler(event, data)
+
+
+class StartupProfilerMiddleware(BaseMiddleware):
+    """Фиксирует время до первого апдейта и выводит профиль запуска."""
+    def __init__(self, profiler: StartupProfiler) -> None:
+        self._profiler = profiler
+        self._polling_started_at: float | None = None
+        self._first_update_seen = False
+        super().__init__()
+
+    def polling_started(self):
+        self._polling_started_at = time.perf_counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        if not self._first_update_seen:
+            self._first_update_seen = True
+            if self._polling_started_at is not None:
+                self._profiler.record("первый апдейт", time.perf_counter() - self._polling_started_at)
+            self._profiler.report()
+        return await handler(event, data)
+
+
+class LifecycleMiddleware(BaseMiddleware):
+    """Учитывает апдейты как незавершенную работу. После начала остановки отбрасывает новые."""
+    def __init__(self, lifecycle: Lifecycle) -> None:
+        self._lifecycle = lifecycle
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        if not self._lifecycle.accepting:
+            self._lifecycle.stats['rejected'] += 1
+            return None
+        async with self._lifecycle.track('update'):
+            return await handler(event, data)
+
+
+class LoggingContextMiddleware(BaseMiddleware):
+    """Проставляет id апдейта и чата для структурированных логов."""
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        # event_chat заполняет встроенный UserContextMiddleware aiogram
+        chat = data.get("event_chat")
+        update_token = update_id_var.set(getattr(event, "update_id", None))
+        chat_token = chat_id_var.set(chat.id if chat else None)
+        try:
+            return await handler(event, data)
+        finally:
+            update_id_var.reset(update_token)
+            chat_id_var.reset(chat_token)
+
+
+class UsernameMiddleware(BaseMiddleware):
+    """Передает имя отправителя в UsernameTracker (только групповые чаты - пользователи там)."""
+    def __init__(self, tracker: UsernameTracker) -> None:
+        self._tracker = tracker
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        # event_from_user и event_chat заполняет встроенный UserContextMiddleware aiogram
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        if user and chat and chat.type != 'private' and not user.is_bot:
+            self._tracker.observe(chat.id, user.id, user.username)
+        return await handler(event, data)
+
+
+class ChatSerializationMiddleware(BaseMiddleware):
+    """Обрабатывает апдейты одного чата по очереди, разных чатов - параллельно."""
+    # Повторные запросы лидербордов, ждущие в очереди, схлопываются в один
+    MERGED_COMMANDS = ("/ratings", "/masters", "/slaves")
+
+    def __init__(self, executor: ChatKeyedExecutor) -> None:
+        self._executor = executor
+        super().__init__()
+
+    def _merge_key(self, event: TelegramObject) -> str | None:
+        message = getattr(event, "message", None)
+        if not message or not message.text:
+            return None
+        command = message.text.split(maxsplit=1)[0].split("@", 1)[0]
+        return command if command in self.MERGED_COMMANDS else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+        return await self._executor.run(
+            chat.id,
+            lambda: handler(event, data),
+            self._merge_key(event)
+        )
@@ -0,0 +1,216 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Any
+
+# Сторонние библиотеки
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import and_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Локальные импорты
+from .clock import clock
+from database.database import Database
+from database.models import OutboxMessage, OutboxStatus
+
+_INSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+async def enqueue_message(
+    session,
+    idempotency_key: str,
+    chat_id: int,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | dict[str, Any] | None = None
+):
+    """Ставит сообщение в outbox в текущей транзакции сессии (коммитит вызывающий).
+
+    Сообщение с уже существующим idempotency_key не добавляется повторно.
+    reply_markup - модель или готовый словарь Bot API (KeyboardTemplate.payload).
+    """
+    payload: dict[str, Any] = {'text': text}
+    if isinstance(reply_markup, InlineKeyboardMarkup):
+        payload['reply_markup'] = reply_markup.model_dump(exclude_none=True)
+    elif reply_markup is not None:
+        payload['reply_markup'] = reply_markup
+
+    insert = _INSERT[session.get_bind().dialect.name]
+    await session.execute(
+        insert(OutboxMessage)
+        .values(
+            idempotency_key=idempotency_key,
+            chat_id=chat_id,
+            payload=payload,
+            status=OutboxStatus.PENDING,
+            attempts=0
+        )
+        .on_conflict_do_nothing(index_elements=['idempotency_key'])
+    )
+
+
+class OutboxWorker:
+    """Отправляет сообщения из outbox пачками с ограниченной параллельностью.
+
+    Пачка забирается короткой транзакцией (FOR UPDATE SKIP LOCKED + аренда на
+    lease секунд), затем соединение с БД возвращается в пул и сообщения
+    отправляются в Telegram. Результаты записываются второй короткой транзакцией.
+    Неудачные отправки повторяются с экспоненциальной задержкой, отказы
+    Telegram (бот удален из чата, неверный запрос) и исчерпанные попытки
+    помечаются как FAILED.
+    """
+    _bot: Bot
+    _db: Database
+    _concurrency: int
+    _batch_size: int
+    _poll_interval: float
+    _lease: timedelta
+    _max_attempts: int
+
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        concurrency: int = 8,
+        batch_size: int = 50,
+        poll_interval: float = 1.0,
+        lease: float = 60.0,
+        max_attempts: int = 8
+    ):
+        self._bot = bot
+        self._db = db
+        self._concurrency = concurrency
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._lease = timedelta(seconds=lease)
+        self._max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        self.stats = {'batches': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'send_time': 0.0}
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def notify(self):
+        """Будит воркер сразу после постановки сообщений, не дожидаясь опроса."""
+        self._wakeup.set()
+
+    async def stop(self):
+        """Дожидается текущей пачки и останавливает воркер."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+        logging.info(f"Outbox остановлен: {self.stats}")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logging.error(f"Ошибка обработки outbox: {e}")
+                processed = 0
+
+            # Полная пачка - в очереди, скорее всего, есть еще
+            if processed == self._batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Забирает, отправляет и отмечает одну пачку. Возвращает ее размер."""
+        batch = await self._claim_batch()
+        if not batch:
+            return 0
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def send(message_id: int, chat_id: int, payload: dict, attempts: int):
+            async with semaphore:
+                try:
+                    await self._bot.send_message(
+                        chat_id,
+                        payload['text'],
+                        reply_markup=InlineKeyboardMarkup.model_validate(payload['reply_markup'])
+                        if 'reply_markup' in payload else None
+                    )
+                    return message_id, attempts, None, False
+                except (TelegramForbiddenError, TelegramBadRequest) as e:
+                    return message_id, attempts, e, True
+                except Exception as e:
+                    return message_id, attempts, e, False
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(send(*row) for row in batch))
+        self.stats['send_time'] += time.perf_counter() - started
+        self.stats['batches'] += 1
+
+        await self._store_results(results)
+        return len(batch)
+
+    async def _claim_batch(self) -> list[tuple[int, int, dict, int]]:
+        now = clock.now()
+        async for session in self._db.get_session():
+            query = (
+                select(OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.payload, OutboxMessage.attempts)
+                .where(and_(
+                    OutboxMessage.status == OutboxStatus.PENDING,
+                    OutboxMessage.available_at <= now
+                ))
+                .order_by(OutboxMessage.available_at, OutboxMessage.id)
+                .limit(self._batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            batch = (await session.execute(query)).all()
+            if batch:
+                # Аренда: если процесс упадет во время отправки, пачку заберут после ее окончания
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_([row[0] for row in batch]))
+                    .values(available_at=now + self._lease)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+            return batch
+
+    async def _store_results(self, results: list[tuple[int, int, Exception | None, bool]]):
+        now = clock.now()
+        sent_ids = [message_id for message_id, _, error, _ in results if error is None]
+        async for session in self._db.get_session():
+            if sent_ids:
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(sent_ids))
+                    .values(status=OutboxStatus.SENT, sent_at=now, attempts=OutboxMessage.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                self.stats['sent'] += len(sent_ids)
+
+            for message_id, attempts, error, permanent in results:
+                if error is None:
+                    continue
+                attempts += 1
+                if permanent or attempts >= self._max_attempts:
+                    values = {'status': OutboxStatus.FAILED}
+                    self.stats['failed'] += 1
+                    logging.error(f"Сообщение outbox {message_id} не отправлено: {error}")
+                else:
+                    delay = random.uniform(0.5, 1.0) * min(300, 2 ** attempts)
+                    values = {'available_at': now + timedelta(seconds=delay)}
+                    self.stats['retried'] += 1
+                    logging.warning(f"Сообщение outbox {message_id}: {error}, повтор через {delay:.0f} с")
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id == message_id)
+                    .values(attempts=attempts, last_error=str(error)[:1000], **values)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
@@ -0,0 +1,51 @@
+# Стандартные библиотеки
+import logging
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Замеряет длительность этапов запуска бота.
+
+    Включается флагом --profile-startup. В выключенном состоянии ничего не делает.
+    """
+    _enabled: bool
+    _started_at: float
+    _phases: list[tuple[str, float]]
+    _reported: bool
+
+    def __init__(self, enabled: bool, started_at: float | None = None):
+        self._enabled = enabled
+        self._started_at = started_at if started_at is not None else time.perf_counter()
+        self._phases = []
+        self._reported = False
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def record(self, name: str, duration: float):
+        """Сохраняет длительность этапа в секундах."""
+        if self._enabled:
+            self._phases.append((name, duration))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замеряет этап, выполняющийся внутри блока with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self):
+        """Выводит разбивку по этапам и общее время до первого апдейта (один раз)."""
+        if not self._enabled or self._reported:
+            return
+        self._reported = True
+
+        lines = ["⏱ Профиль запуска:"]
+        for name, duration in self._phases:
+            lines.append(f"  {name:<24} {duration * 1000:9.1f} мс")
+        lines.append(f"  {'всего с начала запуска':<24} {(time.perf_counter() - self._started_at) * 1000:9.1f} мс")
+        logging.info("\n".join(lines))
@@ -1,55 +1,170 @@
 # Стандартные библиотеки
+import asyncio
 import logging
-import random
+import pickle
 from datetime import datetime, timedelta
+from typing import Awaitable, Callable
 
 # Сторонние библиотеки
-import pytz
 from aiogram import Bot
+from apscheduler.job import Job
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import select, and_
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from sqlalchemy import select, update, and_
 
 # Локальные импорты
+from .chat_settings import ChatSettingsCache
+from .clock import UTC, clock
 from .daily import DailyHandler
 from .cleanup import CleanupHandler
+from .daily_state import DailyStateCache
+from .lifecycle import Lifecycle
+from .outbox import OutboxWorker, enqueue_message
+from .log_pipeline import CATEGORY_SCHEDULE
+from .slots import SlotAllocator
 from database.database import Database
 from database.models import Chat, SchedulerTask, TaskType
 
-UTC_TZ = pytz.UTC
+DAILY_JOBSTORE = 'daily'
+# Сколько секунд после назначенного времени задача еще запускается (у APScheduler по
+# умолчанию 1 с). Пропущенные за время простоя сообщения разбирает check_missed_dailies
+DAILY_MISFIRE_GRACE_TIME = 15 * 60
+# Id задач в одном DELETE ... IN (...)
+JOBSTORE_BATCH = 1000
+
+async def run_daily_message(chat_id: int, task_id: int):
+    """Ссылка на функцию, под которой задачи лежат в постоянном хранилище.
+
+    Сама не вызывается: DailyJobStore при чтении задачи подставляет вместо
+    нее обработчик своего планировщика.
+    """
+    raise RuntimeError(f"Задача {task_id} для чата {chat_id} загружена не через DailyJobStore")
+
+class DailyJobStore(SQLAlchemyJobStore):
+    """Постоянное хранилище ежедневных задач, привязанное к обработчику.
+
+    Метод объекта нельзя сохранить в БД, поэтому задачи хранят ссылку на
+    run_daily_message, а при чтении получают handler этого хранилища.
+    """
+    def __init__(self, handler: Callable[[int, int], Awaitable], **kwargs):
+        super().__init__(**kwargs)
+        self._handler = handler
+
+    def _reconstitute_job(self, job_state):
+        job = super()._reconstitute_job(job_state)
+        job.func = self._handler
+        return job
 
 class Scheduler:
     _bot: Bot
     _db: Database 
     _scheduler: AsyncIOScheduler
+    _daily_jobstore: DailyJobStore
     _daily_handler: DailyHandler
     _cleanup_handler: CleanupHandler
+    _slot_allocator: SlotAllocator
+    daily_states: DailyStateCache
+    _chat_settings: ChatSettingsCache
+    _lifecycle: Lifecycle | None
 
-    def __init__(self, bot: Bot, db: Database):
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        jobstore_url: str,
+        max_sends_per_second: int = 25,
+        lifecycle: Lifecycle | None = None,
+        outbox: OutboxWorker | None = None,
+        chat_settings: ChatSettingsCache | None = None
+    ):
         self._bot = bot
         self._db = db
-        self._scheduler = AsyncIOScheduler(timezone=UTC_TZ)
-        self._daily_handler = DailyHandler(bot, db)
+        self._daily_jobstore = DailyJobStore(self.run_daily_message, url=jobstore_url)
+        self._scheduler = AsyncIOScheduler(
+            timezone=UTC,
+            # Цикл задан явно: планировщик запускается из потока (см. setup_jobs)
+            event_loop=asyncio.get_event_loop(),
+            jobstores={
+                'default': MemoryJobStore(),
+                DAILY_JOBSTORE: self._daily_jobstore
+            }
+        )
+        self._chat_settings = chat_settings or ChatSettingsCache()
+        self._daily_handler = DailyHandler(bot, db, outbox, self._chat_settings)
         self._cleanup_handler = CleanupHandler(db)
+        self._slot_allocator = SlotAllocator(max_sends_per_second=max_sends_per_second)
+        self.daily_states = DailyStateCache()
+        self._lifecycle = lifecycle
+        self._outbox = outbox
+        self._schedule_locks: dict[int, asyncio.Lock] = {}
+
+    async def run_daily_message(self, chat_id: int, task_id: int):
+        """Отправляет ежедневное сообщение и планирует следующее."""
+        await self._run_tracked(self._daily_handler.send_daily_message(chat_id, task_id, scheduler=self))
+
+    async def _run_cleanup(self):
+        await self._run_tracked(self._cleanup_handler.cleanup_old_tasks())
+
+    async def _run_tracked(self, job: Awaitable):
+        """Выполняет задачу как незавершенную работу, чтобы остановка ее дождалась."""
+        if self._lifecycle is None:
+            return await job
+        async with self._lifecycle.track('job'):
+            return await job
+
+    def shutdown(self):
+        """Останавливает запуск новых задач. Уже идущие дожидается Lifecycle."""
+        if self._scheduler.running:
+            self._scheduler.shutdown(wait=False)
     
     async def schedule_daily_master(self, chat_id: int):
-        """Планирует следующее ежедневное сообщение для поиска пидоров в чате."""
+        """Планирует следующее ежедневное сообщение для поиска пидоров в чате.
+
+        Если у чата уже есть будущая задача, новая не создается: /start,
+        восстановление при запуске и отправка daily могут вызвать это
+        одновременно. Проверка и создание идут под блокировкой чата.
+        """
+        # Блокировок не больше, чем чатов, поэтому они не удаляются
+        lock = self._schedule_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            await self._schedule_daily_master(chat_id)
+
+    async def _has_pending_daily(self, session, chat_id: int) -> bool:
+        result = await session.execute(
+            select(SchedulerTask.id).where(
+                and_(
+                    SchedulerTask.chat_id == chat_id,
+                    SchedulerTask.is_completed == False,
+                    SchedulerTask.scheduled_time > clock.now(),
+                    SchedulerTask.task_type == TaskType.DAILY_MESSAGE
+                )
+            ).limit(1)
+        )
+        return result.first() is not None
+
+    async def _schedule_daily_master(self, chat_id: int):
         try:
-            # Генерируем случайное время
-            hour = random.randint(6, 18)
-            minute = random.randint(0, 59)
-            
-            # Вычисляем следующее время
-            now = datetime.now(UTC_TZ)
-            next_time = now + timedelta(days=1)
-            next_time = next_time.replace(
-                hour=hour,
-                minute=minute,
-                second=0,
-                microsecond=0
+            # Выбираем случайное, но наименее загруженное время на завтра по часам чата
+            settings = self._chat_settings.get(chat_id)
+            next_time = self._slot_allocator.pick(
+                clock.today(chat_id).date + timedelta(days=1),
+                settings.daily_start_hour,
+                settings.daily_end_hour,
+                clock.zone(chat_id)
             )
             
             async for session in self._db.get_session():
+                if await self._has_pending_daily(session, chat_id):
+                    logging.info(
+                        "У чата %s уже есть запланированное сообщение", chat_id,
+                        extra={'category': CATEGORY_SCHEDULE, 'chat_id': chat_id}
+                    )
+                    return
+
                 # Создаем новую задачу
                 new_task = SchedulerTask(
                     chat_id=chat_id,
@@ -63,7 +178,10 @@ class Scheduler:
                 # Переиспользуем существующий метод для планирования
                 await self._schedule_task(new_task)
             
-            logging.info(f"Запланировано сообщение для чата {chat_id} на {next_time}")
+            logging.info(
+                "Запланировано сообщение для чата %s на %s", chat_id, next_time,
+                extra={'category': CATEGORY_SCHEDULE, 'chat_id': chat_id}
+            )
             
         except Exception as e:
             logging.error(f"Ошибка при планировании следующего сообщения для чата {chat_id}: {e}")
@@ -71,10 +189,10 @@ class Scheduler:
     async def check_missed_dailies(self, session):
         """Проверяет и обрабатывает пропущенные ежедневные сообщения."""
         try:
-            now = datetime.now(UTC_TZ)
+            now = clock.now()
             
             # Получаем все невыполненные задачи, время которых уже прошло
-            query = select(SchedulerTask).where(
+            query = select(SchedulerTask.id, SchedulerTask.chat_id, SchedulerTask.scheduled_time).where(
                 and_(
                     SchedulerTask.is_completed == False,
                     SchedulerTask.scheduled_time <= now,
@@ -83,21 +201,32 @@ class Scheduler:
             )
             
             result = await session.execute(query)
-            missed_tasks: list[SchedulerTask] = result.scalars().all()
+            missed_tasks = result.all()
             
-            for task in missed_tasks:
-                await self._bot.send_message(
-                    task.chat_id,
+            for task_id, chat_id, scheduled_time in missed_tasks:
+                # Извинение уходит через outbox в одной транзакции с отметкой задач
+                await enqueue_message(
+                    session,
+                    f"missed:{task_id}",
+                    chat_id,
                     "Извините, было пропущено запланированное сообщение из-за технических проблем! 🤖"
                 )
-                
-                # Помечаем задачу как выполненную
-                task.is_completed = True
+                self.daily_states.task_fired(chat_id, scheduled_time)
                 
                 # Планируем следующее сообщение
-                await self.schedule_daily_master(task.chat_id)
-                
+                await self.schedule_daily_master(chat_id)
+            
+            # Помечаем задачи как выполненные одним запросом
+            if missed_tasks:
+                await session.execute(
+                    update(SchedulerTask)
+                    .where(SchedulerTask.id.in_([task_id for task_id, _, _ in missed_tasks]))
+                    .values(is_completed=True)
+                    .execution_options(synchronize_session=False)
+                )
             await session.commit()
+            if missed_tasks and self._outbox:
+                self._outbox.notify()
             
             if missed_tasks:
                 logging.info(f"Обработано {len(missed_tasks)} пропущенных сообщений")
@@ -106,47 +235,144 @@ class Scheduler:
             logging.error(f"Ошибка при проверке пропущенных сообщений: {e}")
 
     async def _restore_pending_tasks(self, session) -> int:
-        """Восстанавливает существующие невыполненные задачи."""
-        now = datetime.now(UTC_TZ)
-        task_query = select(SchedulerTask).where(
+        """Восстанавливает невыполненные задачи, пропуская уже сохраненные в хранилище."""
+        now = clock.now()
+        task_query = select(
+            SchedulerTask.id,
+            SchedulerTask.chat_id,
+            SchedulerTask.scheduled_time
+        ).where(
             and_(
                 SchedulerTask.is_completed == False,
                 SchedulerTask.scheduled_time > now,
                 SchedulerTask.task_type == TaskType.DAILY_MESSAGE
             )
         )
-        result = await session.execute(task_query)
-        pending_tasks: list[SchedulerTask] = result.scalars().all()
-        
-        for task in pending_tasks:
-            await self._schedule_task(task)
-            
-        return len(pending_tasks)
+        # Строки читаются порциями, весь набор задач в памяти не держится
+        result = await session.stream(task_query.execution_options(yield_per=1000))
+
+        # Хранилище APScheduler синхронное (psycopg2): его запросы идут в потоке, не в цикле событий
+        stored_jobs = await asyncio.to_thread(self._get_stored_daily_jobs)
+        pending_count = 0
+        to_add = []
+        async for task_id, chat_id, scheduled_time in result:
+            pending_count += 1
+            self._slot_allocator.book(chat_id, scheduled_time)
+
+            # Задача уже лежит в хранилище с тем же временем - пропускаем
+            stored_time = stored_jobs.pop(self._daily_job_id(chat_id), None)
+            if stored_time == datetime_to_utc_timestamp(scheduled_time):
+                continue
+
+            to_add.append((task_id, chat_id, scheduled_time))
+
+        # Оставшиеся задачи хранилища не соответствуют ни одной невыполненной задаче
+        await asyncio.to_thread(self._write_daily_jobs, to_add)
+        await asyncio.to_thread(self._remove_stored_daily_jobs, list(stored_jobs))
+        added_count = len(to_add)
+
+        logging.info(
+            f"Восстановлено {pending_count} задач: добавлено {added_count}, "
+            f"без изменений {pending_count - added_count}, удалено устаревших {len(stored_jobs)}"
+        )
+        return pending_count
+
+    def _get_stored_daily_jobs(self) -> dict[str, float]:
+        """Читает id и время запуска задач из постоянного хранилища без распаковки."""
+        jobs_table = self._daily_jobstore.jobs_t
+        jobs_table.create(self._daily_jobstore.engine, checkfirst=True)
+        with self._daily_jobstore.engine.connect() as connection:
+            rows = connection.execute(select(jobs_table.c.id, jobs_table.c.next_run_time))
+            return dict(rows.all())
+
+    def _remove_stored_daily_jobs(self, job_ids: list[str]):
+        """Удаляет задачи из постоянного хранилища одним запросом."""
+        if not job_ids:
+            return
+        jobs_table = self._daily_jobstore.jobs_t
+        with self._daily_jobstore.engine.begin() as connection:
+            for start in range(0, len(job_ids), JOBSTORE_BATCH):
+                connection.execute(jobs_table.delete().where(jobs_table.c.id.in_(job_ids[start:start + JOBSTORE_BATCH])))
+
+    @staticmethod
+    def _daily_job_id(chat_id: int) -> str:
+        return f'daily_message_{chat_id}'
+
+    def _write_daily_jobs(self, jobs: list[tuple[int, int, datetime]]):
+        """Записывает задачи в постоянное хранилище одной транзакцией.
+
+        add_job на запущенном планировщике - отдельные INSERT и коммит на каждую
+        задачу. Здесь прежние версии задач удаляются пачками, а новые строки
+        вставляются одним executemany в том же виде, в каком их пишет
+        SQLAlchemyJobStore.add_job.
+        """
+        if not jobs:
+            return
+        jobstore = self._daily_jobstore
+        rows = []
+        for task_id, chat_id, scheduled_time in jobs:
+            job = self._daily_job(task_id, chat_id, scheduled_time)
+            rows.append({
+                'id': job.id,
+                'next_run_time': datetime_to_utc_timestamp(job.next_run_time),
+                'job_state': pickle.dumps(job.__getstate__(), jobstore.pickle_protocol)
+            })
+        job_ids = [row['id'] for row in rows]
+        with jobstore.engine.begin() as connection:
+            for start in range(0, len(job_ids), JOBSTORE_BATCH):
+                connection.execute(jobstore.jobs_t.delete().where(jobstore.jobs_t.c.id.in_(job_ids[start:start + JOBSTORE_BATCH])))
+            connection.execute(jobstore.jobs_t.insert(), rows)
+        # Планировщик на паузе разбудит resume; запущенный должен пересчитать ближайшую задачу
+        if self._scheduler.running:
+            self._scheduler.wakeup()
+
+    def _daily_job(self, task_id: int, chat_id: int, scheduled_time: datetime) -> Job:
+        """Задача ежедневного сообщения со всеми полями, которые иначе подставил бы add_job."""
+        run_date = scheduled_time.astimezone(UTC)
+        return Job(
+            self._scheduler,
+            id=self._daily_job_id(chat_id),
+            func=run_daily_message,
+            trigger=DateTrigger(run_date=run_date),
+            executor='default',
+            args=(chat_id, task_id),
+            kwargs={},
+            name=run_daily_message.__name__,
+            misfire_grace_time=DAILY_MISFIRE_GRACE_TIME,
+            coalesce=True,
+            max_instances=1,
+            next_run_time=run_date
+        )
+
+    def _add_daily_job(self, task_id: int, chat_id: int, scheduled_time: datetime):
+        """Добавляет задачу ежедневного сообщения в постоянное хранилище."""
+        self._scheduler.add_job(
+            run_daily_message,
+            trigger=DateTrigger(run_date=scheduled_time.astimezone(UTC)),
+            args=[chat_id, task_id],
+            id=self._daily_job_id(chat_id),
+            jobstore=DAILY_JOBSTORE,
+            misfire_grace_time=DAILY_MISFIRE_GRACE_TIME,
+            coalesce=True,
+            replace_existing=True
+        )
 
     async def _schedule_task(self, task: SchedulerTask):
         """Планирует отдельную задачу в планировщике."""
-        scheduled_time = task.scheduled_time.astimezone(UTC_TZ)
-        self._scheduler.add_job(
-            self._daily_handler.send_daily_message,
-            trigger=CronTrigger(
-                year=scheduled_time.year,
-                month=scheduled_time.month,
-                day=scheduled_time.day,
-                hour=scheduled_time.hour,
-                minute=scheduled_time.minute
-            ),
-            args=[task.chat_id, task.id],
-            id=f'daily_message_{task.chat_id}',
-            replace_existing=True,
-            kwargs={'scheduler': self}
+        scheduled_time = task.scheduled_time.astimezone(UTC)
+        await asyncio.to_thread(self._add_daily_job, task.id, task.chat_id, scheduled_time)
+        self._slot_allocator.book(task.chat_id, scheduled_time)
+        self.daily_states.task_scheduled(task.chat_id, scheduled_time)
+        logging.info(
+            "Запланирована задача %s для чата %s на %s", task.id, task.chat_id, scheduled_time,
+            extra={'category': CATEGORY_SCHEDULE, 'chat_id': task.chat_id}
         )
-        logging.info(f"Восстановлена задача {task.id} для чата {task.chat_id} на {scheduled_time}")
 
     async def _setup_active_chats(self, session):
         """Планирует задачи для активных чатов без существующих задач."""
         # Создаем подзапрос для активных задач
         active_tasks = (
-            select(SchedulerTask)
+            select(SchedulerTask.id, SchedulerTask.chat_id)
             .where(
                 and_(
                     SchedulerTask.is_completed == False,
@@ -158,7 +384,7 @@ class Scheduler:
 
         # Основной запрос с LEFT JOIN
         query = (
-            select(Chat, active_tasks)
+            select(Chat.chat_id)
             .outerjoin(
                 active_tasks,
                 and_(
@@ -174,16 +400,19 @@ class Scheduler:
         )
         
         result = await session.execute(query)
-        chats_without_tasks = result.scalars().all()
+        chat_ids = result.scalars().all()
         
-        for chat in chats_without_tasks:
-            await self.schedule_daily_master(chat.chat_id)
-            logging.info(f"Создана новая задача для чата {chat.chat_id}")
+        for chat_id in chat_ids:
+            await self.schedule_daily_master(chat_id)
+            logging.info(
+                "Создана новая задача для чата %s", chat_id,
+                extra={'category': CATEGORY_SCHEDULE, 'chat_id': chat_id}
+            )
 
     def _setup_cleanup_job(self):
         """Настраивает ежедневную задачу очистки."""
         self._scheduler.add_job(
-            self._cleanup_handler.cleanup_old_tasks,
+            self._run_cleanup,
             trigger=CronTrigger(hour=3, minute=0),
             id='cleanup_old_tasks',
             replace_existing=True
@@ -192,6 +421,10 @@ class Scheduler:
     async def setup_jobs(self, session):
         """Основная функция настройки планировщика."""
         try:
+            # Запускаем на паузе: задачи сразу пишутся в хранилище, но не выполняются,
+            # пока восстановление не закончено. Запуск проверяет таблицу хранилища - в потоке
+            await asyncio.to_thread(self._scheduler.start, paused=True)
+
             # 1. Восстанавливаем существующие задачи
             restored_count = await self._restore_pending_tasks(session)
             
@@ -201,8 +434,8 @@ class Scheduler:
             # 3. Настраиваем задачу очистки
             self._setup_cleanup_job()
             
-            # Запускаем планировщик
-            self._scheduler.start()
+            # Снимаем с паузы
+            self._scheduler.resume()
             logging.info(f"Планировщик успешно запущен. Восстановлено {restored_count} задач")
             
         except Exception as e:
@@ -0,0 +1,119 @@
+# Стандартные библиотеки
+import logging
+import random
+from collections import Counter
+from datetime import date, datetime, time, timedelta, tzinfo
+
+# Локальные импорты
+from .clock import UTC
+
+
+class SlotAllocator:
+    """Распределяет время ежедневных сообщений с учетом уже занятых минут.
+
+    Держит гистограмму занятости по минутам и по секундам для ожидающих задач.
+    Для каждой новой задачи выбирается несколько случайных минут окна,
+    из них берется наименее загруженная, а внутри минуты - свободная секунда.
+    Так время остается случайным для пользователей, а пик отправок сглаживается.
+    """
+    _start_hour: int
+    _end_hour: int
+    _max_sends_per_second: int
+    _candidates: int
+    _per_minute: Counter
+    _per_second: Counter
+    _booked: dict[int, int]
+
+    def __init__(
+        self,
+        start_hour: int = 6,
+        end_hour: int = 18,
+        max_sends_per_second: int = 25,
+        candidates: int = 3
+    ):
+        self._start_hour = start_hour
+        self._end_hour = end_hour
+        self._max_sends_per_second = max_sends_per_second
+        self._candidates = candidates
+        self._per_minute = Counter()
+        self._per_second = Counter()
+        self._booked = {}
+
+    def book(self, chat_id: int, scheduled_time: datetime):
+        """Учитывает задачу чата в гистограмме (предыдущая запись чата снимается)."""
+        self.release(chat_id)
+        # Ключи гистограмм - целые UTC timestamp, это дешевле операций с datetime
+        second = int(scheduled_time.timestamp())
+        self._booked[chat_id] = second
+        self._per_minute[second - second % 60] += 1
+        self._per_second[second] += 1
+
+    def release(self, chat_id: int):
+        """Убирает задачу чата из гистограммы."""
+        second = self._booked.pop(chat_id, None)
+        if second is None:
+            return
+
+        minute = second - second % 60
+        self._per_minute[minute] -= 1
+        if self._per_minute[minute] <= 0:
+            del self._per_minute[minute]
+
+        self._per_second[second] -= 1
+        if self._per_second[second] <= 0:
+            del self._per_second[second]
+
+    def pick(
+        self,
+        day: date,
+        start_hour: int | None = None,
+        end_hour: int | None = None,
+        zone: tzinfo = UTC
+    ) -> datetime:
+        """Выбирает время отправки на день day в поясе zone, часы окна - местные. Результат в UTC."""
+        start_hour = self._start_hour if start_hour is None else start_hour
+        end_hour = self._end_hour if end_hour is None else end_hour
+
+        # Границы окна через timestamp: в день перехода на летнее время окно на час короче или длиннее
+        window_start = int(datetime.combine(day, time(hour=start_hour), tzinfo=zone).timestamp())
+        window_end = int((datetime.combine(day, time(hour=end_hour), tzinfo=zone) + timedelta(hours=1)).timestamp())
+        window_minutes = (window_end - window_start) // 60
+
+        # Из нескольких случайных минут берем наименее загруженную
+        minute = min(
+            (
+                window_start + 60 * random.randrange(window_minutes)
+                for _ in range(self._candidates)
+            ),
+            key=lambda candidate: self._per_minute[candidate]
+        )
+        # Во всей минуте не осталось мест - переходим к следующим минутам окна (по кругу)
+        for step in range(window_minutes):
+            candidate = window_start + (minute - window_start + 60 * step) % (window_minutes * 60)
+            offset = self._pick_second(candidate)
+            if offset is not None:
+                return datetime.fromtimestamp(candidate + offset, UTC)
+
+        # Окно заполнено целиком: превышения лимита не избежать
+        logging.warning(f"Все секунды окна {day} заняты, лимит {self._max_sends_per_second} в секунду превышен")
+        return datetime.fromtimestamp(minute + min(range(60), key=lambda offset: self._per_second[minute + offset]), UTC)
+
+    def _pick_second(self, minute: int) -> int | None:
+        """Выбирает секунду внутри минуты, не превышая лимит отправок в секунду. None - мест нет."""
+        offset = random.randrange(60)
+        if self._per_second[minute + offset] < self._max_sends_per_second:
+            return offset
+
+        # Случайная секунда занята - берем наименее загруженную, если в ней есть место
+        offset = min(range(60), key=lambda offset: self._per_second[minute + offset])
+        if self._per_second[minute + offset] < self._max_sends_per_second:
+            return offset
+        return None
+
+    def peak_minute(self) -> int:
+        """Максимальное число задач, запланированных на одну минуту."""
+        return max(self._per_minute.values(), default=0)
+
+    def peak_second(self) -> int:
+        """Максимальное число задач, запланированных на одну секунду."""
+        return max(self._per_second.values(), default=0)
@@ -0,0 +1,212 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+import random
+import time
+from typing import Any
+
+# Сторонние библиотеки
+from aiohttp import (
+    ClientConnectorCertificateError,
+    ClientConnectorError,
+    ClientConnectorSSLError,
+    ClientProxyConnectionError,
+    FormData
+)
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+# Локальные импорты
+from .keyboards import keyboards
+
+# Повтор этих методов не меняет результат: чтение или установка значения
+_IDEMPOTENT_PREFIXES = ('get', 'set', 'edit', 'delete', 'pin', 'unpin')
+
+# Ошибки установки соединения: запрос гарантированно не ушел. aiogram
+# передает только текст "Класс: описание", поэтому сравнивается имя класса
+_NOT_SENT_ERRORS = frozenset(
+    cls.__name__ for cls in (
+        ClientConnectorError, ClientConnectorCertificateError, ClientConnectorSSLError, ClientProxyConnectionError
+    )
+)
+
+
+class RetryMiddleware(BaseRequestMiddleware):
+    """Повторяет запросы при ошибках сети и 5xx, соблюдает flood control.
+
+    Ошибки сети и сервера повторяются с экспоненциальной задержкой и полным
+    джиттером. Ошибка сети после отправки не говорит, выполнен ли запрос,
+    поэтому она повторяется только для идемпотентных методов (get*, edit*,
+    delete* и т.п.), а sendMessage - только если соединение не установилось.
+    На TelegramRetryAfter чат (или весь бот, если чата в запросе нет)
+    закрывается на retry_after секунд: запросы в этот чат ждут, а не получают
+    тот же отказ. Вызов ждет flood control не дольше max_retry_after секунд
+    в сумме, потом ошибка пробрасывается - хендлер не висит с блокировкой
+    чата. getUpdates не трогается - у polling свой backoff.
+    """
+    _max_attempts: int
+    _base_delay: float
+    _max_delay: float
+    _max_retry_after: float
+    _blocked_until: dict[int | str | None, float]
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        max_retry_after: float = 60.0
+    ):
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_retry_after = max_retry_after
+        self._blocked_until = {}
+        self.stats = {'retries': 0, 'retry_after': 0, 'gave_up': 0, 'not_repeated': 0}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            await self._wait_unblocked(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if time.monotonic() - started + e.retry_after > self._max_retry_after:
+                    self.stats['gave_up'] += 1
+                    raise
+                self.stats['retry_after'] += 1
+                self._blocked_until[chat_id] = max(
+                    self._blocked_until.get(chat_id, 0.0),
+                    time.monotonic() + e.retry_after
+                )
+                logging.warning(f"Flood control для {chat_id or 'бота'}: ждем {e.retry_after} с ({method.__api_method__})")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if isinstance(e, TelegramNetworkError) and not self._safe_to_repeat(method, e):
+                    self.stats['not_repeated'] += 1
+                    raise
+                attempt += 1
+                if attempt >= self._max_attempts:
+                    self.stats['gave_up'] += 1
+                    raise
+                self.stats['retries'] += 1
+                delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+                logging.warning(f"{method.__api_method__}: {e}, повтор {attempt} через {delay:.2f} с")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _safe_to_repeat(method: TelegramMethod, error: TelegramNetworkError) -> bool:
+        """Можно ли повторить запрос после ошибки сети, не рискуя выполнить его дважды."""
+        if method.__api_method__.startswith(_IDEMPOTENT_PREFIXES):
+            return True
+        return error.message.split(':', 1)[0] in _NOT_SENT_ERRORS
+
+    async def _wait_unblocked(self, chat_id: int | str | None):
+        """Ждет окончания flood control для чата и для бота в целом."""
+        while True:
+            now = time.monotonic()
+            until = max(self._blocked_until.get(chat_id, 0.0), self._blocked_until.get(None, 0.0))
+            if until <= now:
+                self._blocked_until.pop(chat_id, None)
+                return
+            await asyncio.sleep(until - now)
+
+
+class LatencyMiddleware(BaseRequestMiddleware):
+    """Считает число вызовов, ошибки и время ответа по методам Bot API."""
+    def __init__(self):
+        # метод -> [вызовы, ошибки, суммарное время, максимальное время]
+        self.stats: dict[str, list] = {}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self.stats.setdefault(method.__api_method__, [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+
+    def report(self) -> str:
+        """Таблица по методам: вызовы, ошибки, среднее и максимальное время в мс."""
+        lines = [f"{'метод':<24}{'вызовы':>8}{'ошибки':>8}{'ср. мс':>10}{'макс. мс':>10}"]
+        for name, (calls, errors, total, longest) in sorted(self.stats.items()):
+            lines.append(f"{name:<24}{calls:>8}{errors:>8}{1000 * total / calls:>10.1f}{1000 * longest:>10.1f}")
+        return "\n".join(lines)
+
+
+class TunedAiohttpSession(AiohttpSession):
+    """Сессия aiohttp с настроенным пулом соединений, повторами и метриками.
+
+    Соединения с Bot API переиспользуются (keep-alive), их число ограничено
+    limit, DNS кэшируется - рассылка не открывает соединение на каждый запрос.
+    Клавиатуры из KeyboardRegistry отправляются готовым JSON.
+    """
+    latency: LatencyMiddleware
+    retry: RetryMiddleware
+
+    def __init__(
+        self,
+        limit: int = 100,
+        keepalive_timeout: float = 60.0,
+        ttl_dns_cache: int = 300,
+        retry: RetryMiddleware | None = None,
+        **kwargs: Any
+    ):
+        super().__init__(**kwargs)
+        self._connector_init.update(
+            limit=limit,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=ttl_dns_cache
+        )
+        self.latency = LatencyMiddleware()
+        self.retry = retry or RetryMiddleware()
+        # Метрики снаружи: в задержку входят повторы и ожидание flood control
+        self.middleware(self.latency)
+        self.middleware(self.retry)
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod[TelegramType]) -> FormData:
+        reply_markup = keyboards.cached_json(
+            getattr(method, 'reply_markup', None),
+            lambda markup: self.prepare_value(markup.model_dump(warnings=False), bot=bot, files={})
+        )
+        if reply_markup is None:
+            return super().build_form_data(bot, method)
+
+        # Форму собирает aiogram, без клавиатуры (None пропускается), готовый JSON добавляется в конец
+        form = super().build_form_data(bot, method.model_copy(update={'reply_markup': None}))
+        form.add_field('reply_markup', reply_markup)
+        return form
+
+
+def create_bot_session(api_url: str | None = None, limit: int = 100) -> TunedAiohttpSession:
+    """Сессия бота. api_url направляет запросы на локальный Bot API сервер (или его имитацию)."""
+    if api_url:
+        return TunedAiohttpSession(limit=limit, api=TelegramAPIServer.from_base(api_url))
+    return TunedAiohttpSession(limit=limit)
@@ -0,0 +1,88 @@
+# Стандартные библиотеки
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class TtlCache:
+    """Кэш результатов запросов на ttl секунд с объединением одинаковых запросов.
+
+    Очередь чата (ChatSerializationMiddleware) не гарантирует, что одинаковых
+    запросов одновременно нет: апдейты без event_chat и вызовы вне
+    Dispatcher идут мимо нее, а листание лидерборда (handle_leaderboard_page)
+    несколькими пользователями дает одинаковые ключи. Пока запрос выполняется,
+    повторные с тем же ключом ждут его результат, а не идут в БД. Ошибка
+    отдается всем ожидающим и не кэшируется. invalidate сбрасывает и
+    выполняющиеся запросы: их результат отдается тем, кто уже ждет, но не
+    сохраняется, а новые вызовы загружают данные заново.
+    """
+    _ttl: float
+    _max_entries: int
+    _results: dict[Hashable, tuple[float, Any]]
+    _in_flight: dict[Hashable, asyncio.Future]
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 10000):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._results = {}
+        self._in_flight = {}
+        self.stats = {'calls': 0, 'executed': 0, 'joined': 0}
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats['calls'] += 1
+
+        while True:
+            cached = self._results.get(key)
+            if cached and time.monotonic() - cached[0] < self._ttl:
+                return cached[1]
+
+            future = self._in_flight.get(key)
+            if future is None:
+                break
+            self.stats['joined'] += 1
+            try:
+                # shield: отмена ожидающего не отменяет чужой запрос
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили выполнявшего запрос - загружаем сами
+                if not future.cancelled():
+                    raise
+
+        self.stats['executed'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Ожидающих может не быть - не выводим "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            current = self._in_flight.get(key) is future
+            if current:
+                del self._in_flight[key]
+
+        if current:
+            self._store(key, result)
+        future.set_result(result)
+        return result
+
+    def _store(self, key: Hashable, result: Any):
+        now = time.monotonic()
+        if len(self._results) >= self._max_entries:
+            self._results = {
+                cached_key: cached for cached_key, cached in self._results.items()
+                if now - cached[0] < self._ttl
+            }
+        self._results[key] = (now, result)
+
+    def invalidate(self, match: Callable[[Hashable], bool]):
+        """Сбрасывает результаты и выполняющиеся запросы для подходящих ключей."""
+        for key in [key for key in self._results if match(key)]:
+            del self._results[key]
+        for key in [key for key in self._in_flight if match(key)]:
+            del self._in_flight[key]
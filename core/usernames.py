@@ -0,0 +1,108 @@
+# Стандартные библиотеки
+import asyncio
+import logging
+from collections import OrderedDict
+
+# Локальные импорты
+from database import queries
+from database.database import Database
+from .ttl_cache import TtlCache
+
+
+class UsernameTracker:
+    """Поддерживает users.username актуальным без записи на каждый апдейт.
+
+    observe сравнивает имя отправителя с кэшем последних записанных имен и
+    только измененные (или еще не проверенные) откладывает до сброса. Раз в
+    flush_interval секунд отложенные имена записываются пачками через
+    UPDATE ... FROM (VALUES ...), который не трогает строки с тем же именем.
+    RETURNING отдает чаты, где имена действительно изменились, - только их
+    лидерборды сбрасываются.
+    """
+    _db: Database
+    _leaderboards: TtlCache | None
+    _flush_interval: float
+    _cache_size: int
+    _known: OrderedDict[tuple[int, int], str | None]
+    _pending: dict[tuple[int, int], str | None]
+
+    def __init__(
+        self,
+        db: Database,
+        leaderboards: TtlCache | None = None,
+        flush_interval: float = 60.0,
+        cache_size: int = 50000
+    ):
+        self._db = db
+        self._leaderboards = leaderboards
+        self._flush_interval = flush_interval
+        self._cache_size = cache_size
+        self._known = OrderedDict()
+        self._pending = {}
+        self._task: asyncio.Task | None = None
+        self.stats = {'observed': 0, 'queued': 0, 'flushes': 0, 'updated': 0}
+
+    def observe(self, chat_id: int, user_id: int, username: str | None):
+        self.stats['observed'] += 1
+        key = (chat_id, user_id)
+        if key in self._known and self._known[key] == username:
+            self._known.move_to_end(key)
+            return
+        if key not in self._pending:
+            self.stats['queued'] += 1
+        self._pending[key] = username
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает периодический сброс и записывает оставшиеся имена."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        logging.info(f"Обновление имен остановлено: {self.stats}")
+
+    async def flush(self) -> int:
+        """Записывает отложенные имена. Возвращает число измененных строк."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+
+        rows = [(chat_id, user_id, username) for (chat_id, user_id), username in pending.items()]
+        changed_chats: list[int] = []
+        try:
+            async for session in self._db.get_session():
+                for start in range(0, len(rows), queries.USERNAMES_BATCH):
+                    result = await session.execute(
+                        queries.update_usernames(rows[start:start + queries.USERNAMES_BATCH])
+                    )
+                    changed_chats.extend(result.scalars().all())
+                await session.commit()
+        except Exception:
+            # Не потерять имена: вернуть в очередь, не затирая более свежие
+            self._pending = {**pending, **self._pending}
+            raise
+
+        for key, username in pending.items():
+            self._known[key] = username
+            self._known.move_to_end(key)
+        while len(self._known) > self._cache_size:
+            self._known.popitem(last=False)
+
+        updated = len(changed_chats)
+        self.stats['flushes'] += 1
+        self.stats['updated'] += updated
+        if changed_chats and self._leaderboards:
+            chat_ids = set(changed_chats)
+            self._leaderboards.invalidate(lambda key: key[0] in chat_ids)
+        return updated
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Ошибка обновления имен пользователей: {e}")
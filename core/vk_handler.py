@@ -1,24 +1,33 @@
 # Стандартные библиотеки
 import logging
 import random
-from datetime import datetime
+from typing import TYPE_CHECKING
 
 # Сторонние библиотеки
-import pytz
-from sqlalchemy import select, and_
-from vk_api.vk_api import VkApiMethod
+if TYPE_CHECKING:
+    from vk_api.vk_api import VkApiMethod
 
 # Локальные импорты
-from database.models import User, UserStats
-
-UTC_TZ = pytz.UTC
+from .clock import clock
+from .log_pipeline import CATEGORY_VK
+from database import queries
 
 class VKHandler:
     GROUP_ID = '-209871225'
     ALBUM_ID = '282103569'
 
-    def __init__(self, vk: VkApiMethod):
-        self._vk = vk
+    def __init__(self, token: str):
+        self._token = token
+        self._api: 'VkApiMethod | None' = None
+
+    @property
+    def _vk(self) -> 'VkApiMethod':
+        """Клиент VK API, создается при первом обращении."""
+        if self._api is None:
+            # vk_api (и requests) импортируются только когда нужны
+            from vk_api import VkApi
+            self._api = VkApi(token=self._token).get_api()
+        return self._api
 
     def _get_photo_url(self, photo: dict) -> str:
         """Получает URL фотографии максимального качества."""
@@ -29,23 +38,14 @@ class VKHandler:
 
     async def is_picture_limited(self, session, user_id: int, chat_id: int) -> bool:
         """Проверяет, может ли пользователь использовать команду сегодня."""
-        query = (
-            select(UserStats)
-            .join(User)
-            .where(
-                and_(
-                    User.user_id == user_id,
-                    User.chat_id == chat_id
-                )
-            )
-        )
-        result = await session.execute(query)
+        result = await session.execute(queries.GET_USER_STATS, {'user_id': user_id, 'chat_id': chat_id})
         stats = result.scalar_one_or_none()
         
         if not stats:
             return True
         
-        today = datetime.now(UTC_TZ).date()
+        # Лимит сбрасывается в полночь по времени чата
+        today = clock.today(chat_id).date
         
         if stats.last_picture_date == today:
             return True
@@ -74,7 +74,7 @@ class VKHandler:
             
             # Получаем URL фотографии
             photo_url = self._get_photo_url(photo)
-            logging.info(f"Получен URL фото: {photo_url}")
+            logging.info("Получен URL фото: %s", photo_url, extra={'category': CATEGORY_VK})
             
             return photo_url
             
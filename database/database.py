@@ -1,39 +1,61 @@
 # Стандартные библиотеки
+from contextlib import aclosing
 from typing import Any, AsyncGenerator, Awaitable, Callable, Dict
 
 # Сторонние библиотеки
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 # Локальные импорты
 from config import Config
+from .fast import FastPath
 
 
 # Создаем класс с настройками для базы данных
 class DatabaseConfig:
     database_url: str
+    sync_database_url: str
+    fast_path: bool
     def __init__(self, config: Config):
         self.database_url = f"postgresql+asyncpg://{config.db.user}:{config.db.password}@{config.db.host}:{config.db.port}/{config.db.database}"
+        # Синхронный URL (psycopg2) для постоянного хранилища задач APScheduler
+        self.sync_database_url = f"postgresql://{config.db.user}:{config.db.password}@{config.db.host}:{config.db.port}/{config.db.database}"
+        self.fast_path = config.db.fast_path
 
 # Создаем engine и сессию
 class Database:
+    _engine: AsyncEngine
     _session_maker: sessionmaker[AsyncSession]
+    fast_path: FastPath | None
 
     def __init__(self, config: DatabaseConfig):
-        engine = create_async_engine(
+        self._engine = engine = create_async_engine(
             config.database_url,
             echo=False,
+            # Кэш скомпилированных запросов SQLAlchemy
+            query_cache_size=1200,
+            # Кэш prepared statements asyncpg на каждом соединении
+            connect_args={'prepared_statement_cache_size': 500},
         )
         self._session_maker = sessionmaker(
             engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
+        # DSN без драйвера SQLAlchemy подходит asyncpg напрямую
+        self.fast_path = FastPath(config.sync_database_url) if config.fast_path else None
+
+    async def close(self):
+        """Закрывает соединения пула SQLAlchemy и пул FastPath."""
+        await self._engine.dispose()
+        if self.fast_path:
+            await self.fast_path.close()
 
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         async with self._session_maker() as session:
+            session.info['fast_path'] = self.fast_path
             yield session 
 
 class DatabaseMiddleware(BaseMiddleware):
@@ -47,8 +69,10 @@ class DatabaseMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        async for session in self.database.get_session():
-            if session is None:
-                raise RuntimeError("Session is None")
-            data['session'] = session
-            return await handler(event, data)
\ No newline at end of file
+        # aclosing: сессия закрывается сразу после обработчика, а не финализатором генератора
+        async with aclosing(self.database.get_session()) as sessions:
+            async for session in sessions:
+                if session is None:
+                    raise RuntimeError("Session is None")
+                data['session'] = session
+                return await handler(event, data)
\ No newline at end of file
@@ -0,0 +1,95 @@
+# Стандартные библиотеки
+import asyncio
+
+# Сторонние библиотеки
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Локальные импорты
+from . import queries
+from .records import ChatRecord, TaskRecord, UserRecord
+
+
+class FastPath:
+    """Прямой доступ к самым частым запросам на чтение через общий пул asyncpg.
+
+    Минует ORM (identity map, создание объектов) и возвращает легкие записи.
+    Пул создается при первом запросе.
+    """
+    GET_CHAT_SQL = "SELECT chat_id, name, is_active FROM chats WHERE chat_id = $1"
+    GET_USER_SQL = (
+        "SELECT id, user_id, chat_id, username, is_active FROM users "
+        "WHERE user_id = $1 AND chat_id = $2"
+    )
+    GET_TASK_SQL = "SELECT id, chat_id, scheduled_time, is_completed FROM scheduler_tasks WHERE id = $1"
+
+    _dsn: str
+    _min_size: int
+    _max_size: int
+    _pool: asyncpg.Pool | None
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 5):
+        self._dsn = dsn
+        self._min_size = min_size
+        self._max_size = max_size
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        self._dsn,
+                        min_size=self._min_size,
+                        max_size=self._max_size
+                    )
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def get_chat(self, chat_id: int) -> ChatRecord | None:
+        pool = await self._get_pool()
+        row = await pool.fetchrow(self.GET_CHAT_SQL, chat_id)
+        return ChatRecord(*row) if row else None
+
+    async def get_user(self, user_id: int, chat_id: int) -> UserRecord | None:
+        pool = await self._get_pool()
+        row = await pool.fetchrow(self.GET_USER_SQL, user_id, chat_id)
+        return UserRecord(*row) if row else None
+
+    async def get_task(self, task_id: int) -> TaskRecord | None:
+        pool = await self._get_pool()
+        row = await pool.fetchrow(self.GET_TASK_SQL, task_id)
+        return TaskRecord(*row) if row else None
+
+
+# Чтение записей: через FastPath, если он включен для сессии, иначе проекцией колонок через ORM-сессию.
+# Результат одинаковый в обоих случаях, поэтому хендлерам неважно, какой путь используется.
+
+def get_fast_path(session: AsyncSession) -> FastPath | None:
+    return session.info.get('fast_path')
+
+async def get_chat_record(session: AsyncSession, chat_id: int) -> ChatRecord | None:
+    fast_path = get_fast_path(session)
+    if fast_path:
+        return await fast_path.get_chat(chat_id)
+    row = (await session.execute(queries.GET_CHAT_ROW, {'chat_id': chat_id})).first()
+    return ChatRecord(*row) if row else None
+
+async def get_user_record(session: AsyncSession, user_id: int, chat_id: int) -> UserRecord | None:
+    fast_path = get_fast_path(session)
+    if fast_path:
+        return await fast_path.get_user(user_id, chat_id)
+    row = (await session.execute(queries.GET_USER_ROW, {'user_id': user_id, 'chat_id': chat_id})).first()
+    return UserRecord(*row) if row else None
+
+async def get_task_record(session: AsyncSession, task_id: int) -> TaskRecord | None:
+    fast_path = get_fast_path(session)
+    if fast_path:
+        return await fast_path.get_task(task_id)
+    row = (await session.execute(queries.GET_TASK_ROW, {'task_id': task_id})).first()
+    return TaskRecord(*row) if row else None
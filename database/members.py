@@ -0,0 +1,148 @@
+# Регистрация участников чата через INSERT ... ON CONFLICT: одного (/addme) -
+# одним запросом, пачки (импорт) - одним INSERT в users и одним INSERT ... SELECT
+# в user_stats на пачку - вместо вставки, flush, второй вставки и коммита на каждого.
+
+# Стандартные библиотеки
+import csv
+import enum
+import io
+from dataclasses import dataclass
+from typing import Iterable
+
+# Сторонние библиотеки
+from sqlalchemy import false, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Локальные импорты
+from . import queries
+from .models import User, UserStats
+from .records import UserRecord
+
+_INSERT = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Строк в одном запросе: у asyncpg не больше 32767 параметров, на строку users - 4
+BATCH_SIZE = 1000
+
+
+class Registration(enum.Enum):
+    CREATED = "created"
+    REACTIVATED = "reactivated"
+    ALREADY_ACTIVE = "already_active"
+
+
+@dataclass(slots=True)
+class MemberSyncResult:
+    created: int = 0
+    reactivated: int = 0
+    unchanged: int = 0  # уже были активны
+
+
+def read_members_csv(content: str) -> list[tuple[int, str | None]]:
+    """Разбирает CSV user_id,username. Строка заголовка пропускается, пустое имя - None."""
+    members = []
+    for line_number, row in enumerate(csv.reader(io.StringIO(content)), start=1):
+        if not row or not row[0].strip():
+            continue
+        user_id = row[0].strip()
+        if not user_id.lstrip('-').isdigit():
+            if line_number == 1:
+                continue
+            raise ValueError(f"Строка {line_number}: неверный user_id {user_id!r}")
+        username = row[1].strip().lstrip('@') if len(row) > 1 else ''
+        members.append((int(user_id), username[:32] or None))
+    return members
+
+
+async def sync_members(
+    session: AsyncSession,
+    chat_id: int,
+    members: Iterable[tuple[int, str | None]],
+    batch_size: int = BATCH_SIZE
+) -> MemberSyncResult:
+    """Регистрирует участников в чате: новых создает, неактивных возвращает в поиск.
+
+    Известное имя не затирается пустым. Чат должен существовать, коммитит вызывающий.
+    """
+    # Один пользователь дважды в пачке - ошибка ON CONFLICT, остается последнее упоминание
+    items = list(dict(members).items())
+    insert = _INSERT[session.get_bind().dialect.name]
+    result = MemberSyncResult()
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        user_ids = [user_id for user_id, _ in batch]
+
+        existing = dict((await session.execute(
+            select(User.user_id, User.is_active).where(User.chat_id == chat_id, User.user_id.in_(user_ids))
+        )).all())
+        result.created += len(batch) - len(existing)
+        result.reactivated += sum(not is_active for is_active in existing.values())
+        result.unchanged += sum(existing.values())
+
+        statement = insert(User).values([
+            {'user_id': user_id, 'chat_id': chat_id, 'username': username, 'is_active': True}
+            for user_id, username in batch
+        ])
+        await session.execute(statement.on_conflict_do_update(
+            index_elements=['user_id', 'chat_id'],
+            set_={
+                'is_active': True,
+                'username': func.coalesce(statement.excluded.username, User.username)
+            }
+        ))
+        # Статистика для новых пользователей; значения по умолчанию подставляет from_select
+        await session.execute(
+            insert(UserStats)
+            .from_select(['id'], select(User.id).where(User.chat_id == chat_id, User.user_id.in_(user_ids)))
+            .on_conflict_do_nothing(index_elements=['id'])
+        )
+
+    return result
+
+
+async def register_member(session: AsyncSession, chat_id: int, user_id: int, username: str | None) -> Registration:
+    """Регистрирует пользователя в чате или возвращает его в поиск.
+
+    Повторный вызов (двойное нажатие, гонка апдейтов) ничего не меняет и
+    возвращает ALREADY_ACTIVE. Если чата нет - IntegrityError (внешний ключ).
+    Коммитит вызывающий.
+    """
+    params = {'chat_id': chat_id, 'user_id': user_id, 'username': username}
+    if session.get_bind().dialect.name == 'postgresql':
+        inserted = (await session.execute(queries.REGISTER_USER, params)).scalar_one_or_none()
+    else:
+        inserted = await _register_member_portable(session, params)
+
+    if inserted is None:
+        return Registration.ALREADY_ACTIVE
+    return Registration.CREATED if inserted else Registration.REACTIVATED
+
+
+async def _register_member_portable(session: AsyncSession, params: dict) -> bool | None:
+    """REGISTER_USER для баз без xmax и изменяющих CTE (SQLite): два-три запроса вместо одного."""
+    users = User.__table__
+    insert = _INSERT[session.get_bind().dialect.name]
+    created = (await session.execute(
+        insert(users)
+        .values(user_id=params['user_id'], chat_id=params['chat_id'], username=params['username'], is_active=True)
+        .on_conflict_do_nothing(index_elements=['user_id', 'chat_id'])
+        .returning(users.c.id)
+    )).scalar_one_or_none()
+    if created is not None:
+        await session.execute(insert(UserStats.__table__).values(id=created))
+        return True
+
+    reactivated = (await session.execute(
+        update(users)
+        .where(users.c.user_id == params['user_id'], users.c.chat_id == params['chat_id'], users.c.is_active == false())
+        .values(is_active=True, username=func.coalesce(params['username'], users.c.username))
+        .returning(users.c.id)
+    )).scalar_one_or_none()
+    return False if reactivated is not None else None
+
+
+async def deactivate_member(session: AsyncSession, chat_id: int, user_id: int) -> UserRecord | None:
+    """Убирает пользователя из поиска. None - его нет в чате или он уже неактивен. Коммитит вызывающий."""
+    row = (await session.execute(queries.DEACTIVATE_USER, {'b_chat_id': chat_id, 'b_user_id': user_id})).first()
+    return UserRecord(*row) if row else None
@@ -1,15 +1,18 @@
+import asyncio
 import sys
 from os.path import abspath, dirname
 
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from alembic import context
 
 sys.path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 
 from config import load_config
+from database.database import DatabaseConfig
 from database.models import Base
 
 # this is the Alembic Config object, which provides
@@ -34,10 +37,13 @@ target_metadata = Base.metadata
 
 config_path = ".env"
 
-def get_url():
-    cfg = load_config(config_path)
-    url = f"postgresql://{cfg.db.user}:{cfg.db.password}@{cfg.db.host}:{cfg.db.port}/{cfg.db.database}"
-    return url
+def get_url(sync: bool = False) -> str:
+    """URL из того же DatabaseConfig, что и у бота (asyncpg); -x url=... - другая БД."""
+    url = context.get_x_argument(as_dictionary=True).get("url")
+    if url:
+        return url
+    db_config = DatabaseConfig(load_config(config_path))
+    return db_config.sync_database_url if sync else db_config.database_url
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -51,18 +57,42 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = get_url()
+    url = get_url(sync=True)
     context.configure(
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
     )
 
     with context.begin_transaction():
         context.run_migrations()
 
 
+def do_run_migrations(connection: Connection) -> None:
+    # Своя транзакция на каждую миграцию: пачки данных и CONCURRENTLY-индексы
+    # (database/online_migrations.py) коммитятся отдельно от остальных миграций
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Миграции через asyncpg, как и у бота: синхронный код Alembic идет в run_sync."""
+    connectable = create_async_engine(get_url(), poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
@@ -70,21 +100,7 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = get_url()
-    connectable = engine_from_config(
-        configuration,
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    asyncio.run(run_async_migrations())
 
 
 if context.is_offline_mode():
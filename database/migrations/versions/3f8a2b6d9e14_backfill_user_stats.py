@@ -0,0 +1,34 @@
+"""backfill user_stats
+
+Revision ID: 3f8a2b6d9e14
+Revises: e4b1a7c3d852
+Create Date: 2026-10-20 10:12:37.418205
+
+"""
+from database.online_migrations import execute_batched
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a2b6d9e14'
+down_revision = 'e4b1a7c3d852'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Записи user_stats для пользователей, у которых их нет, - пачками, чтобы не
+    # держать одну долгую транзакцию на всей таблице users. Прерванное заполнение
+    # можно перезапустить: созданные записи не выбираются
+    execute_batched("""
+        INSERT INTO user_stats (id, rating, master_count, slave_count)
+        SELECT id, 0, 0, 0
+        FROM users
+        WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_stats.id = users.id)
+        ORDER BY id
+        LIMIT :batch_size
+    """)
+
+
+def downgrade() -> None:
+    # Заполненные записи - обычная статистика пользователей, удалять нечего
+    pass
@@ -1,7 +1,7 @@
 import enum
 
 # Сторонние библиотеки
-from sqlalchemy import BigInteger, String, Column, Integer, ForeignKey, UniqueConstraint, Boolean, DateTime, Enum, Date
+from sqlalchemy import BigInteger, String, Column, Integer, ForeignKey, UniqueConstraint, Boolean, DateTime, Enum, Date, Index, JSON, Text, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -32,6 +32,8 @@ class User(Base):
     __table_args__ = (
         # Создаем уникальный индекс для комбинации user_id и chat_id
         UniqueConstraint('user_id', 'chat_id', name='unique_user_chat'),
+        # Выборка пользователей чата для лидербордов и случайного выбора
+        Index('ix_users_chat_active', 'chat_id', 'is_active', 'id'),
     ) 
 
 class TaskType(enum.Enum):
@@ -48,6 +50,15 @@ class SchedulerTask(Base):
     
     chat = relationship("Chat", back_populates="tasks") 
 
+    __table_args__ = (
+        # Покрывающий индекс для /daily_status: запрос не обращается к таблице
+        Index(
+            'ix_scheduler_tasks_chat_daily',
+            'chat_id', 'task_type', 'scheduled_time',
+            postgresql_include=['is_completed']
+        ),
+    )
+
 class UserStats(Base):
     __tablename__ = 'user_stats'
     
@@ -58,4 +69,69 @@ class UserStats(Base):
     launched_count = Column(Integer, default=0, nullable=False)
     last_picture_date = Column(Date, nullable=True)
     
-    user = relationship("User", back_populates="stats") 
\ No newline at end of file
+    user = relationship("User", back_populates="stats")
+
+class OutboxStatus(enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+class OutboxMessage(Base):
+    """Исходящее сообщение: пишется в одной транзакции с изменением данных, отправляется воркером."""
+    __tablename__ = 'outbox'
+    
+    id = Column(Integer, primary_key=True)
+    # Повторная постановка того же сообщения (например, daily:<id задачи>) не создает дубль
+    idempotency_key = Column(String(64), unique=True, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    payload = Column(JSON, nullable=False)  # аргументы sendMessage: text, reply_markup
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Очередь воркера: только ожидающие отправки сообщения
+        Index(
+            'ix_outbox_pending',
+            'available_at', 'id',
+            postgresql_where=(status == OutboxStatus.PENDING)
+        ),
+    )
+
+class FsmRecord(Base):
+    """Состояние FSM aiogram (StorageKey -> state и data) с временем истечения."""
+    __tablename__ = 'fsm_states'
+
+    bot_id = Column(BigInteger, primary_key=True)
+    chat_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    thread_id = Column(BigInteger, primary_key=True, default=0)  # 0 - вне топика
+    destiny = Column(String(32), primary_key=True, default='default')
+    state = Column(String(128), nullable=True)
+    data = Column(JSON, nullable=True)
+    expires_at = Column(BigInteger, nullable=False)  # unix-время: одинаково сравнивается в Postgres и SQLite
+
+    __table_args__ = (
+        # Очистка истекших записей
+        Index('ix_fsm_states_expires_at', 'expires_at'),
+    )
+
+class ChatSettings(Base):
+    """Настройки чата. NULL - значение по умолчанию (core.chat_settings.DEFAULT_SETTINGS)."""
+    __tablename__ = 'chat_settings'
+
+    chat_id = Column(BigInteger, ForeignKey('chats.chat_id'), primary_key=True)
+    daily_start_hour = Column(Integer, nullable=True)  # окно ежедневного сообщения, часы в поясе чата
+    daily_end_hour = Column(Integer, nullable=True)
+    initiator_points = Column(Integer, nullable=True)
+    master_points = Column(Integer, nullable=True)
+    slave_points = Column(Integer, nullable=True)
+    picture_limited = Column(Boolean, nullable=True)  # одна картинка на пользователя в день
+    picture_limit_message = Column(Text, nullable=True)
+    daily_message = Column(Text, nullable=True)
+    timezone = Column(String(64), nullable=True)
+    # Растет при каждом изменении: кэш не откатывается на более старую запись
+    version = Column(Integer, default=1, nullable=False)
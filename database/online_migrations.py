@@ -0,0 +1,89 @@
+# Операции миграций, которые не блокируют работающего бота: индексы строятся
+# CONCURRENTLY, а большие изменения данных идут пачками, каждая в своей
+# транзакции, с паузой между ними. Размер пачки и паузу можно задать при
+# запуске: alembic -x batch_size=5000 -x batch_pause=0.2 upgrade head
+
+# Стандартные библиотеки
+import logging
+import time
+
+# Сторонние библиотеки
+import sqlalchemy as sa
+from alembic import context, op
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_BATCH_PAUSE = 0.1  # секунд между пачками
+
+# Без ограничения: в режиме --sql пачки не считаются, выражение выводится один раз
+_UNLIMITED = 2 ** 31 - 1
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def _x_argument(name: str, default: float) -> float:
+    return type(default)(context.get_x_argument(as_dictionary=True).get(name, default))
+
+
+def _is_postgresql() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def create_index_concurrently(name: str, table: str, columns: list[str], **kwargs):
+    """CREATE INDEX CONCURRENTLY: таблица остается доступной для записи.
+
+    Выполняется вне транзакции миграции. Недостроенный индекс прошлой
+    неудачной попытки (indisvalid = false) удаляется и строится заново.
+    На других СУБД - обычный create_index.
+    """
+    if not _is_postgresql():
+        op.create_index(name, table, columns, **kwargs)
+        return
+
+    with op.get_context().autocommit_block():
+        if not context.is_offline_mode():
+            invalid = op.get_bind().execute(
+                sa.text(
+                    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                    "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+                ),
+                {'name': name}
+            ).first()
+            if invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def drop_index_concurrently(name: str, table: str):
+    """DROP INDEX CONCURRENTLY вне транзакции миграции (на других СУБД - обычный drop_index)."""
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def execute_batched(statement: str, batch_size: int | None = None, pause: float | None = None) -> int:
+    """Повторяет statement, пока он обрабатывает полную пачку строк.
+
+    statement должен брать не больше :batch_size строк и не находить уже
+    обработанные (например, WHERE NOT EXISTS ... LIMIT :batch_size). Каждая
+    пачка коммитится сама, поэтому блокировки строк держатся недолго, а
+    прерванную миграцию можно перезапустить. Возвращает число строк.
+    """
+    batch_size = batch_size or int(_x_argument('batch_size', DEFAULT_BATCH_SIZE))
+    pause = _x_argument('batch_pause', DEFAULT_BATCH_PAUSE) if pause is None else pause
+    query = sa.text(statement)
+
+    if context.is_offline_mode():
+        op.execute(query.bindparams(batch_size=_UNLIMITED))
+        return 0
+
+    total = 0
+    with op.get_context().autocommit_block():
+        while True:
+            rowcount = op.get_bind().execute(query, {'batch_size': batch_size}).rowcount
+            total += rowcount
+            logger.info(f"Обработано строк: {total}")
+            if rowcount < batch_size:
+                return total
+            time.sleep(pause)
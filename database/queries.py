@@ -0,0 +1,201 @@
+# Заранее собранные запросы для горячих путей.
+# Запросы строятся один раз при импорте, значения передаются через bind-параметры:
+# session.execute(GET_USER, {'user_id': ..., 'chat_id': ...}). Так не тратится CPU
+# на сборку конструкций при каждом вызове, а SQL-строка всегда одна и та же -
+# она берется из кэша компиляции SQLAlchemy и из кэша prepared statements asyncpg.
+
+# Сторонние библиотеки
+from sqlalchemy import Boolean, and_, bindparam, case, column, false, func, literal_column, select, true, update, values
+from sqlalchemy.dialects import postgresql
+
+# Локальные импорты
+from .models import Chat, SchedulerTask, TaskType, User, UserStats
+
+# Чаты
+GET_CHAT = select(Chat).where(Chat.chat_id == bindparam('chat_id'))
+
+GET_ACTIVE_CHAT_IDS = select(Chat.chat_id).where(Chat.is_active == True)
+
+# Проекции колонок для легких записей (database.records)
+GET_CHAT_ROW = select(Chat.chat_id, Chat.name, Chat.is_active).where(Chat.chat_id == bindparam('chat_id'))
+
+GET_USER_ROW = select(User.id, User.user_id, User.chat_id, User.username, User.is_active).where(
+    and_(
+        User.user_id == bindparam('user_id'),
+        User.chat_id == bindparam('chat_id')
+    )
+)
+
+GET_RANDOM_USER_ROWS = (
+    select(User.id, User.user_id, User.chat_id, User.username, User.is_active)
+    .where(
+        and_(
+            User.chat_id == bindparam('chat_id'),
+            User.is_active == True
+        )
+    )
+    .order_by(func.random())
+    .limit(bindparam('limit'))
+)
+
+GET_TASK_ROW = select(
+    SchedulerTask.id,
+    SchedulerTask.chat_id,
+    SchedulerTask.scheduled_time,
+    SchedulerTask.is_completed
+).where(SchedulerTask.id == bindparam('task_id'))
+
+# Пользователи
+GET_USER = select(User).where(
+    and_(
+        User.user_id == bindparam('user_id'),
+        User.chat_id == bindparam('chat_id')
+    )
+)
+
+# Регистрация одним запросом (Postgres): новый пользователь вставляется вместе со
+# статистикой, неактивный возвращается в поиск, активный не переписывается.
+# Строки нет - уже был активен, inserted (xmax = 0) - создан, иначе - возвращен
+_users = User.__table__
+_register_insert = postgresql.insert(_users).values(
+    user_id=bindparam('user_id'),
+    chat_id=bindparam('chat_id'),
+    username=bindparam('username'),
+    is_active=True
+)
+_registered = (
+    _register_insert.on_conflict_do_update(
+        index_elements=[_users.c.user_id, _users.c.chat_id],
+        set_={
+            'is_active': True,
+            'username': func.coalesce(_register_insert.excluded.username, _users.c.username)
+        },
+        where=_users.c.is_active == false()
+    )
+    .returning(_users.c.id, literal_column('(xmax = 0)', Boolean).label('inserted'))
+    .cte('registered')
+)
+REGISTER_USER = select(_registered.c.inserted).add_cte(
+    postgresql.insert(UserStats.__table__)
+    .from_select(['id'], select(_registered.c.id).where(_registered.c.inserted))
+    .on_conflict_do_nothing(index_elements=['id'])
+    .cte('registered_stats')
+)
+
+# Возвращает пользователя, только если он был активен
+DEACTIVATE_USER = (
+    update(_users)
+    .where(
+        and_(
+            _users.c.user_id == bindparam('b_user_id'),
+            _users.c.chat_id == bindparam('b_chat_id'),
+            _users.c.is_active == true()
+        )
+    )
+    .values(is_active=False)
+    .returning(_users.c.id, _users.c.user_id, _users.c.chat_id, _users.c.username, _users.c.is_active)
+)
+
+# Выход пачки участников: возвращает всех зарегистрированных (и уже неактивных - для прощания)
+DEACTIVATE_USERS = (
+    update(_users)
+    .where(
+        and_(
+            _users.c.chat_id == bindparam('b_chat_id'),
+            _users.c.user_id.in_(bindparam('b_user_ids', expanding=True))
+        )
+    )
+    .values(is_active=False)
+    .returning(_users.c.user_id, _users.c.username)
+)
+
+# Для executemany: Core-таблица, а не ORM-сущность (иначе ORM ждет первичный ключ в параметрах).
+# Строка не переписывается, если имя не изменилось
+USERNAMES_BATCH = 1000
+
+def update_usernames(rows: list[tuple[int, int, str | None]]):
+    """WITH changes AS (VALUES (chat_id, user_id, username), ...) UPDATE users ... RETURNING chat_id.
+
+    Строится на пачку, а не при импорте: rowcount у executemany на asyncpg
+    равен -1, а RETURNING говорит, какие строки действительно изменились.
+    VALUES в CTE, а не в FROM: так его понимает и SQLite.
+    """
+    changes = values(
+        column('chat_id', _users.c.chat_id.type),
+        column('user_id', _users.c.user_id.type),
+        column('username', _users.c.username.type),
+        name='changes'
+    ).data(rows).cte('changes')
+    return (
+        update(_users)
+        .where(
+            and_(
+                _users.c.user_id == changes.c.user_id,
+                _users.c.chat_id == changes.c.chat_id,
+                _users.c.username.is_distinct_from(changes.c.username)
+            )
+        )
+        .values(username=changes.c.username)
+        .returning(_users.c.chat_id)
+    )
+
+GET_USER_STATS = (
+    select(UserStats)
+    .join(User)
+    .where(
+        and_(
+            User.user_id == bindparam('user_id'),
+            User.chat_id == bindparam('chat_id')
+        )
+    )
+)
+
+# Статистика
+ADD_USER_RATING = (
+    update(UserStats)
+    .where(UserStats.id == bindparam('stats_id'))
+    .values(rating=UserStats.rating + bindparam('rating_delta'))
+    .execution_options(synchronize_session=False)
+)
+
+_master_id = bindparam('master_id')
+_slave_id = bindparam('slave_id')
+_initiator_id = bindparam('initiator_id')
+
+UPDATE_DAILY_STATS = (
+    update(UserStats)
+    .where(UserStats.id.in_([_master_id, _slave_id, _initiator_id]))
+    .values(
+        master_count=case(
+            (UserStats.id == _master_id, UserStats.master_count + 1),
+            else_=UserStats.master_count
+        ),
+        slave_count=case(
+            (UserStats.id == _slave_id, UserStats.slave_count + 1),
+            else_=UserStats.slave_count
+        ),
+        launched_count=case(
+            (UserStats.id == _initiator_id, UserStats.launched_count + 1),
+            else_=UserStats.launched_count
+        ),
+        rating=case(
+            (UserStats.id == _master_id, UserStats.rating + bindparam('master_points')),
+            (UserStats.id == _slave_id, UserStats.rating + bindparam('slave_points')),
+            else_=UserStats.rating
+        )
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Задачи планировщика
+GET_TASK = select(SchedulerTask).where(SchedulerTask.id == bindparam('task_id'))
+
+# Все ежедневные задачи чата за [start, end) - читается только из ix_scheduler_tasks_chat_daily
+GET_DAILY_TASKS_IN_RANGE = select(SchedulerTask.scheduled_time, SchedulerTask.is_completed).where(
+    and_(
+        SchedulerTask.chat_id == bindparam('chat_id'),
+        SchedulerTask.task_type == TaskType.DAILY_MESSAGE,
+        SchedulerTask.scheduled_time >= bindparam('start'),
+        SchedulerTask.scheduled_time < bindparam('end')
+    )
+)
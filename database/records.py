@@ -0,0 +1,41 @@
+# Легкие записи только для чтения вместо ORM-объектов.
+# Без состояния сессии и связей: только нужные колонки в __slots__.
+
+# Стандартные библиотеки
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True, frozen=True)
+class ChatRecord:
+    chat_id: int
+    name: str | None
+    is_active: bool
+
+
+@dataclass(slots=True, frozen=True)
+class UserRecord:
+    id: int
+    user_id: int
+    chat_id: int
+    username: str | None
+    is_active: bool
+
+
+@dataclass(slots=True, frozen=True)
+class TaskRecord:
+    id: int
+    chat_id: int
+    scheduled_time: datetime
+    is_completed: bool
+
+
+@dataclass(slots=True, frozen=True)
+class LeaderboardRow:
+    id: int
+    user_id: int
+    username: str | None
+    is_active: bool
+    rating: int
+    master_count: int
+    slave_count: int
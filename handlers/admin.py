@@ -1,6 +1,5 @@
 # Стандартные библиотеки
 import logging
-import pytz
 
 # Сторонние библиотеки
 from aiogram import Router, F
@@ -8,16 +7,19 @@ from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
-from sqlalchemy import select
 
 # Локальные импорты
-from database.models import Chat
+from database import queries
+from database.fast import get_chat_record
+from database.members import read_members_csv, sync_members
+from core.clock import clock
+from core.chat_settings import SETTING_NAMES, ChatSettingsCache, ChatSettingsRecord, parse_setting
 from core.scheduler import Scheduler
+from core.ttl_cache import TtlCache
 
 router = Router()
 
 ALEHANDRO_ID = 454397941
-MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 
 class AdminMessageStates(StatesGroup):
     waiting_for_message = State()
@@ -63,20 +65,19 @@ async def process_message_to_send(message: Message, session, state: FSMContext):
         
         if target_chat_id == 'all':
             # Получаем все активные чаты
-            query = select(Chat).where(Chat.is_active == True)
-            result = await session.execute(query)
-            chats = result.scalars().all()
+            result = await session.execute(queries.GET_ACTIVE_CHAT_IDS)
+            chat_ids = result.scalars().all()
             
             success_count = 0
-            for chat in chats:
+            for chat_id in chat_ids:
                 try:
                     await message.bot.send_message(
-                        chat_id=chat.chat_id,
+                        chat_id=chat_id,
                         text=message.text
                     )
                     success_count += 1
                 except Exception as e:
-                    logging.error(f"Ошибка при отправке в чат {chat.chat_id}: {e}")
+                    logging.error(f"Ошибка при отправке в чат {chat_id}: {e}")
                     
             await message.reply(f"Сообщение отправлено в {success_count} чатов")
         else:
@@ -123,7 +124,8 @@ async def cmd_tasks(message: Message, scheduler: Scheduler):
         
         for job in jobs:
             job_time = job['next_run_time']
-            formatted_time = job_time.astimezone(MOSCOW_TZ).strftime("%d.%m.%Y %H:%M")
+            chat_id = job['args'][0] if job['args'] else None
+            formatted_time = job_time.astimezone(clock.zone(chat_id)).strftime("%d.%m.%Y %H:%M")
             
             lines.append(
                 f"🔹 ID: {job['id']}\n"
@@ -138,3 +140,111 @@ async def cmd_tasks(message: Message, scheduler: Scheduler):
         await message.reply("Произошла ошибка при получении списка задач.")
         logging.error(f"Error in cmd_tasks: {e}")
 
+
+@router.message(Command("import_members"), F.document)
+async def cmd_import_members(message: Message, session, leaderboards: TtlCache):
+    """Массовая регистрация участников чата из CSV (user_id,username).
+
+    Файл отправляется с подписью /import_members <chat_id>.
+    """
+    if message.chat.type != 'private':
+        return
+
+    # Проверка на админа
+    if message.from_user.id != ALEHANDRO_ID:
+        await message.reply("У вас нет прав для использования этой команды!")
+        return
+
+    try:
+        args = message.caption.split()
+        if len(args) < 2 or not args[1].lstrip('-').isdigit():
+            await message.reply("Укажите ID чата: /import_members <chat_id>")
+            return
+        chat_id = int(args[1])
+
+        if not await get_chat_record(session, chat_id):
+            await message.reply("Чат не зарегистрирован!")
+            return
+
+        content = await message.bot.download(message.document)
+        try:
+            members = read_members_csv(content.read().decode('utf-8-sig'))
+        except (UnicodeDecodeError, ValueError) as e:
+            await message.reply(f"Не удалось разобрать CSV: {e}")
+            return
+
+        result = await sync_members(session, chat_id, members)
+        await session.commit()
+        leaderboards.invalidate(lambda key: key[0] == chat_id)
+
+        await message.reply(
+            f"Импорт в чат {chat_id} завершен:\n"
+            f"новых: {result.created}\n"
+            f"возвращено в поиск: {result.reactivated}\n"
+            f"уже активных: {result.unchanged}"
+        )
+        logging.info(f"Импорт участников в чат {chat_id}: {result}")
+
+    except Exception as e:
+        await message.reply("Произошла ошибка при импорте участников.")
+        logging.error(f"Error in cmd_import_members: {e}")
+
+def _format_settings(chat_id: int, settings: ChatSettingsRecord) -> str:
+    lines = [f"Настройки чата {chat_id} (версия {settings.version}):"]
+    lines += [f"{name} = {getattr(settings, name)}" for name in SETTING_NAMES]
+    return "\n".join(lines)
+
+@router.message(Command("chat_settings"))
+async def cmd_chat_settings(message: Message, session, chat_settings: ChatSettingsCache):
+    """Показывает или меняет настройки чата.
+
+    /chat_settings <chat_id> - текущие настройки; изменения - по одной на
+    строке после команды: имя=значение, значение "-" возвращает умолчание.
+    """
+    if message.chat.type != 'private':
+        return
+
+    # Проверка на админа
+    if message.from_user.id != ALEHANDRO_ID:
+        await message.reply("У вас нет прав для использования этой команды!")
+        return
+
+    try:
+        command, *lines = message.text.split('\n')
+        args = command.split()
+        if len(args) < 2 or not args[1].lstrip('-').isdigit():
+            await message.reply("Укажите ID чата: /chat_settings <chat_id>\nимя=значение")
+            return
+        chat_id = int(args[1])
+
+        changes = {}
+        try:
+            for line in filter(None, map(str.strip, lines)):
+                name, separator, value = line.partition('=')
+                if not separator:
+                    raise ValueError(f"ожидается имя=значение: {line}")
+                changes[name.strip()] = parse_setting(name.strip(), value.strip())
+        except ValueError as e:
+            await message.reply(f"Неверная настройка: {e}")
+            return
+
+        if not changes:
+            await message.reply(_format_settings(chat_id, chat_settings.get(chat_id)))
+            return
+
+        if not await get_chat_record(session, chat_id):
+            await message.reply("Чат не зарегистрирован!")
+            return
+
+        try:
+            settings = await chat_settings.update(session, chat_id, changes)
+        except ValueError as e:
+            await message.reply(f"Неверная настройка: {e}")
+            return
+
+        await message.reply(_format_settings(chat_id, settings))
+        logging.info(f"Настройки чата {chat_id} изменены: {changes}")
+
+    except Exception as e:
+        await message.reply("Произошла ошибка при изменении настроек.")
+        logging.error(f"Error in cmd_chat_settings: {e}")
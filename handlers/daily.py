@@ -1,146 +1,93 @@
 # Стандартные библиотеки
 import logging
-import pytz
-from datetime import datetime
+from datetime import date
 
 # Сторонние библиотеки
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
-from sqlalchemy import select, and_, update, func, or_, case
 from aiogram.utils.markdown import hbold
 from core.vk_handler import VKHandler
 
 # Локальные импорты
-from database.models import SchedulerTask, TaskType, User, UserStats
+from core.chat_settings import ChatSettingsCache, ChatSettingsRecord
+from core.clock import clock
+from core.commands import CommandContext, CommandResult, send_result
+from core.daily_button import daily_button
+from core.log_pipeline import CATEGORY_DAILY
+from core.scheduler import Scheduler
+from core.ttl_cache import TtlCache
+from database import queries
+from database.fast import get_task_record, get_user_record
+from database.records import UserRecord
 
 router = Router()
-MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 
-@router.message(Command("daily_status"))
-async def cmd_daily_status(message: Message, session):
-    if message.chat.type == 'private':
-        await message.reply("Эта команда работает только в групповых чатах!")
-        return
+async def daily_status_command(ctx: CommandContext, session, scheduler: Scheduler) -> CommandResult:
+    """Состояние ежедневного сообщения чата на сегодня."""
+    if ctx.is_private:
+        return CommandResult("Эта команда работает только в групповых чатах!")
 
     try:
-        # Получаем текущую дату в МСК
-        utc_tz = pytz.UTC
-        now = datetime.now(utc_tz)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Ищем выполненную задачу на сегодня
-        query = select(SchedulerTask).where(
-            and_(
-                SchedulerTask.chat_id == message.chat.id,
-                SchedulerTask.task_type == TaskType.DAILY_MESSAGE,
-                SchedulerTask.scheduled_time >= today_start,
-                SchedulerTask.scheduled_time <= now,
-                SchedulerTask.is_completed == True
+        # И день, и время в ответе - в поясе чата
+        now = clock.now()
+        state = await scheduler.daily_states.get(session, ctx.chat_id)
+        
+        if state.fired_at and state.fired_at <= now:
+            return CommandResult(
+                f"Локатор пидоров уже был запущен сегодня в {state.fired_at.astimezone(clock.zone(ctx.chat_id)).strftime('%H:%M')} 🎉",
+                as_reply=False
             )
+        if state.pending_at and state.pending_at >= now:
+            return CommandResult("Локатор пидоров запланирован на сегодня, ждите ⏰", as_reply=False)
+        return CommandResult(
+            "На сегодня нет запланированных сообщений. Возможно, оно запланировано на завтра 🤔",
+            as_reply=False
         )
-        
-        result = await session.execute(query)
-        completed_task = result.scalar_one_or_none()
-        
-        if completed_task:
-            completed_time = completed_task.scheduled_time.astimezone(utc_tz)
-            await message.answer(
-                f"Локатор пидоров уже был запущен сегодня в {completed_time.astimezone(MOSCOW_TZ).strftime('%H:%M')} 🎉"
-            )
-        else:
-            # Проверяем, запланировано ли сообщение на сегодня
-            query = select(SchedulerTask).where(
-                and_(
-                    SchedulerTask.chat_id == message.chat.id,
-                    SchedulerTask.task_type == TaskType.DAILY_MESSAGE,
-                    SchedulerTask.scheduled_time >= now,
-                    SchedulerTask.scheduled_time <= now.replace(hour=23, minute=59, second=59),
-                    SchedulerTask.is_completed == False
-                )
-            )
-            
-            result = await session.execute(query)
-            pending_task = result.scalar_one_or_none()
-            
-            if pending_task:
-                await message.answer(
-                    f"Локатор пидоров запланирован на сегодня, ждите ⏰"
-                )
-            else:
-                await message.answer(
-                    "На сегодня нет запланированных сообщений. Возможно, оно запланировано на завтра 🤔"
-                )
 
     except Exception as e:
-        await message.reply("Произошла ошибка при проверке статуса ежедневного сообщения.")
-        logging.error(f"Error in cmd_daily_status: {e}")
+        logging.error(f"Error in daily_status: {e}")
+        return CommandResult("Произошла ошибка при проверке статуса ежедневного сообщения.")
+
+@router.message(Command("daily_status"))
+async def cmd_daily_status(message: Message, session, scheduler: Scheduler):
+    await send_result(message, await daily_status_command(CommandContext.from_message(message), session, scheduler))
 
 class DailyHandler:
-    async def _get_user_by_id(self, session, user_id: int, chat_id: int) -> User | None:
+    async def _get_user_by_id(self, session, user_id: int, chat_id: int) -> UserRecord | None:
         """Получает пользователя по ID и чату."""
-        query = select(User).where(
-            and_(
-                User.user_id == user_id,
-                User.chat_id == chat_id
-            )
-        )
-        result = await session.execute(query)
-        return result.scalar_one_or_none()
+        return await get_user_record(session, user_id, chat_id)
 
     async def _update_user_rating(self, session, user_id: int, rating_delta: int):
         """Обновляет рейтинг пользователя."""
-        await session.execute(
-            update(UserStats)
-            .where(UserStats.id == user_id)
-            .values(rating=UserStats.rating + rating_delta)
-        )
+        await session.execute(queries.ADD_USER_RATING, {'stats_id': user_id, 'rating_delta': rating_delta})
 
-    async def _get_random_users(self, session, chat_id: int, limit: int = 2) -> list[User]:
+    async def _get_random_users(self, session, chat_id: int, limit: int = 2) -> list[UserRecord]:
         """Выбирает случайных активных пользователей из чата."""
-        query = select(User).where(
-            and_(
-                User.chat_id == chat_id,
-                User.is_active == True
-            )
-        ).order_by(func.random()).limit(limit)
-        
-        result = await session.execute(query)
-        return result.scalars().all()
+        result = await session.execute(queries.GET_RANDOM_USER_ROWS, {'chat_id': chat_id, 'limit': limit})
+        return [UserRecord(*row) for row in result.all()]
 
-    async def _update_stats(self, session, master_id: int, slave_id: int, initiator_id: int):
+    async def _update_stats(
+        self,
+        session,
+        master_id: int,
+        slave_id: int,
+        initiator_id: int,
+        settings: ChatSettingsRecord
+    ):
         """Обновляет статистику после daily."""
         await session.execute(
-            update(UserStats)
-            .where(
-                or_(
-                    UserStats.id == master_id,
-                    UserStats.id == slave_id,
-                    UserStats.id == initiator_id
-                )
-            )
-            .values(
-                master_count=case(
-                    (UserStats.id == master_id, UserStats.master_count + 1),
-                    else_=UserStats.master_count
-                ),
-                slave_count=case(
-                    (UserStats.id == slave_id, UserStats.slave_count + 1),
-                    else_=UserStats.slave_count
-                ),
-                launched_count=case(
-                    (UserStats.id == initiator_id, UserStats.launched_count + 1),
-                    else_=UserStats.launched_count
-                ),
-                rating=case(
-                    (UserStats.id == master_id, UserStats.rating + 100),
-                    (UserStats.id == slave_id, UserStats.rating + 50),
-                    else_=UserStats.rating
-                )
-            )
+            queries.UPDATE_DAILY_STATS,
+            {
+                'master_id': master_id,
+                'slave_id': slave_id,
+                'initiator_id': initiator_id,
+                'master_points': settings.master_points,
+                'slave_points': settings.slave_points
+            }
         )
 
-    def _format_result_message(self, master: User, slave: User, initiator: User) -> str:
+    def _format_result_message(self, master: UserRecord, slave: UserRecord, initiator: UserRecord) -> str:
         """Форматирует сообщение с результатами."""
         master_username = f"@{master.username}" if master.username else f"ID: {master.user_id}"
         slave_username = f"@{slave.username}" if slave.username else f"ID: {slave.user_id}"
@@ -153,34 +100,31 @@ class DailyHandler:
             f"🎮 Локатор запустил: {initiator_username}"
         )
 
-@router.callback_query(F.data.startswith("daily_first_"))
-async def handle_daily_first(callback: CallbackQuery, session, vk_handler: VKHandler):
+@router.callback_query(daily_button)
+async def handle_daily_first(
+    callback: CallbackQuery,
+    session,
+    vk_handler: VKHandler,
+    leaderboards: TtlCache,
+    chat_settings: ChatSettingsCache,
+    task_id: int,
+    task_day: date | None
+):
     try:
         chat_id = callback.message.chat.id
         initiator_user_id = callback.from_user.id
-        task_id = int(callback.data.split('_')[-1])
-        
-        # Проверяем, что задача была запланирована на сегодня
-        query = select(SchedulerTask).where(SchedulerTask.id == task_id)
-        result = await session.execute(query)
-        task = result.scalar_one_or_none()
         
-        if not task:
-            await callback.message.reply("Произошла ошибка при поиске задачи.")
-            return
+        # День подписанной кнопки уже проверен фильтром, в БД идем только для старых кнопок
+        if task_day is None:
+            task = await get_task_record(session, task_id)
             
-        # Сравниваем текущий день с днем задачи
-        utc_tz = pytz.UTC
-        current_date = datetime.now(utc_tz).date()
-        task_date = task.scheduled_time.astimezone(utc_tz).date()
-        
-        if current_date != task_date:
-            # Удаляем клавиатуру у сообщения
-            await callback.message.edit_reply_markup(reply_markup=None)
-            await callback.message.reply(
-                "Вы не успели выполнить команду в нужный день! 😢"
-            )
-            return
+            if not task:
+                await callback.message.reply("Произошла ошибка при поиске задачи.")
+                return
+                
+            if task.scheduled_time not in clock.today(chat_id):
+                await callback.answer("Вы не успели выполнить команду в нужный день! 😢", show_alert=True)
+                return
         
         handler = DailyHandler()
         # Проверяем пользователя и обновляем рейтинг
@@ -192,7 +136,8 @@ async def handle_daily_first(callback: CallbackQuery, session, vk_handler: VKHan
         # Удаляем сообщение с кнопкой
         await callback.message.delete()
         
-        await handler._update_user_rating(session, user.id, 25)
+        settings = chat_settings.get(chat_id)
+        await handler._update_user_rating(session, user.id, settings.initiator_points)
         
         # Выбираем случайных пользователей
         random_users = await handler._get_random_users(session, chat_id)
@@ -203,8 +148,9 @@ async def handle_daily_first(callback: CallbackQuery, session, vk_handler: VKHan
         master, slave = random_users
         
         # Обновляем статистику
-        await handler._update_stats(session, master.id, slave.id, user.id)
+        await handler._update_stats(session, master.id, slave.id, user.id, settings)
         await session.commit()
+        leaderboards.invalidate(lambda key: key[0] == chat_id)
         
         # Получаем случайное фото
         photo_url = await vk_handler.get_random_photo()
@@ -229,8 +175,8 @@ async def handle_daily_first(callback: CallbackQuery, session, vk_handler: VKHan
             )
         
         logging.info(
-            f"Выбраны master ({master.username}) и slave ({slave.username}) "
-            f"в чате {chat_id}"
+            "Выбраны master (%s) и slave (%s) в чате %s", master.username, slave.username, chat_id,
+            extra={'category': CATEGORY_DAILY}
         )
         
     except Exception as e:
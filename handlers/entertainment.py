@@ -7,28 +7,38 @@ from aiogram.filters import Command
 from aiogram.types import Message
 
 # Локальные импорты
+from core.chat_settings import ChatSettingsCache
+from core.commands import CommandContext, CommandResult, send_result
 from core.vk_handler import VKHandler
 
 router = Router()
 
-@router.message(Command("picture"))
-async def cmd_picture(message: Message, vk_handler: VKHandler, session):
-    """Отправляет случайную фотографию из альбома группы."""
+async def picture_command(
+    ctx: CommandContext,
+    session,
+    vk_handler: VKHandler,
+    chat_settings: ChatSettingsCache
+) -> CommandResult:
+    """Случайная фотография из альбома группы."""
     try:
-        if await vk_handler.is_picture_limited(session, message.from_user.id, message.chat.id):
-            await message.delete()
-            return
+        settings = chat_settings.get(ctx.chat_id)
+        if settings.picture_limited and await vk_handler.is_picture_limited(session, ctx.user_id, ctx.chat_id):
+            return CommandResult(settings.picture_limit_message, drop_request=True)
         photo_url = await vk_handler.get_random_photo()
             
         if photo_url:
-            # Отправляем фото
-            await message.reply_photo(
-                photo=photo_url,
-                caption="Вот вам пидорская картинка 📸"
-            )
-        else:
-            await message.reply("Фото не нашлось 😢")
+            return CommandResult("Вот вам пидорская картинка 📸", photo=photo_url)
+        return CommandResult("Фото не нашлось 😢")
         
+    except Exception as e:
+        logging.error(f"Error in picture: {e}")
+        return CommandResult("Произошла ошибка при получении фотографии.")
+
+@router.message(Command("picture"))
+async def cmd_picture(message: Message, vk_handler: VKHandler, session, chat_settings: ChatSettingsCache):
+    """Отправляет случайную фотографию из альбома группы."""
+    try:
+        await send_result(message, await picture_command(CommandContext.from_message(message), session, vk_handler, chat_settings))
     except Exception as e:
         await message.reply("Произошла ошибка при получении фотографии.")
-        logging.error(f"Error in cmd_picture: {e}") 
\ No newline at end of file
+        logging.error(f"Error in cmd_picture: {e}")
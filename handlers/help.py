@@ -1,52 +1,64 @@
+# Стандартные библиотеки
+from typing import Awaitable, Callable
+
+# Сторонние библиотеки
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
-from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardMarkup
+
+# Локальные импорты
+from core.chat_settings import ChatSettingsCache
+from core.commands import CommandContext, CommandResult
+from core.keyboards import keyboards
+from core.scheduler import Scheduler
+from core.ttl_cache import TtlCache
+from core.vk_handler import VKHandler
+from handlers.daily import daily_status_command
+from handlers.entertainment import picture_command
+from handlers.registration import addme_command, disableme_command
+from handlers.stats import leaderboard_command
 
 
 router = Router()
 
-def get_main_keyboard() -> InlineKeyboardMarkup:
-    """Создает основную клавиатуру."""
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="📋 База", callback_data="activation"))
-    builder.row(InlineKeyboardButton(text="📊 Статистика", callback_data="stats"))
-    builder.row(InlineKeyboardButton(text="🎮 Фан", callback_data="fun"))
-    builder.row(InlineKeyboardButton(text="❌ Закрыть", callback_data="close"))
-    return builder.as_markup()
-
-def get_activation_keyboard() -> InlineKeyboardMarkup:
-    """Создает клавиатуру базы."""
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="Активироваться", callback_data="cmd_addme"))
-    builder.row(InlineKeyboardButton(text="Деактивироваться", callback_data="cmd_disableme"))
-    builder.row(InlineKeyboardButton(text="Статус локатора", callback_data="cmd_daily_status"))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back"))
-    return builder.as_markup()
-
-def get_stats_keyboard() -> InlineKeyboardMarkup:
-    """Создает клавиатуру статистики."""
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="Рейтинг", callback_data="cmd_ratings"))
-    builder.row(InlineKeyboardButton(text="Пидорасы", callback_data="cmd_masters"))
-    builder.row(InlineKeyboardButton(text="Пассивы", callback_data="cmd_slaves"))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back"))
-    return builder.as_markup()
-
-def get_fun_keyboard() -> InlineKeyboardMarkup:
-    """Создает клавиатуру развлечений."""
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="Картинка", callback_data="cmd_picture"))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back"))
-    return builder.as_markup()
+# Клавиатуры меню собираются и сериализуются один раз при импорте
+BACK_BUTTON = ("◀️ Назад", "back")
+
+MAIN_KEYBOARD = keyboards.add(
+    'help_main',
+    (("📋 База", "activation"),),
+    (("📊 Статистика", "stats"),),
+    (("🎮 Фан", "fun"),),
+    (("❌ Закрыть", "close"),)
+)
+ACTIVATION_KEYBOARD = keyboards.add(
+    'help_activation',
+    (("Активироваться", "cmd_addme"),),
+    (("Деактивироваться", "cmd_disableme"),),
+    (("Статус локатора", "cmd_daily_status"),),
+    (BACK_BUTTON,)
+)
+STATS_KEYBOARD = keyboards.add(
+    'help_stats',
+    (("Рейтинг", "cmd_ratings"),),
+    (("Пидорасы", "cmd_masters"),),
+    (("Пассивы", "cmd_slaves"),),
+    (BACK_BUTTON,)
+)
+FUN_KEYBOARD = keyboards.add(
+    'help_fun',
+    (("Картинка", "cmd_picture"),),
+    (BACK_BUTTON,)
+)
+BACK_KEYBOARD = keyboards.add('help_back', (BACK_BUTTON,))
 
 @router.message(Command("help"))
 async def cmd_help(message: Message):
     """Обработчик команды /help."""
     await message.reply(
         "Вот пидорское меню команд:",
-        reply_markup=get_main_keyboard()
+        reply_markup=MAIN_KEYBOARD
     )
 
 @router.callback_query(F.data == "activation")
@@ -55,7 +67,7 @@ async def show_activation(callback: CallbackQuery):
         return
     await callback.message.edit_text(
         "Вот пидорские команды:",
-        reply_markup=get_activation_keyboard()
+        reply_markup=ACTIVATION_KEYBOARD
     )
 
 @router.callback_query(F.data == "stats")
@@ -64,7 +76,7 @@ async def show_stats(callback: CallbackQuery):
         return
     await callback.message.edit_text(
         "Вот пидорские команды:",
-        reply_markup=get_stats_keyboard()
+        reply_markup=STATS_KEYBOARD
     )
 
 @router.callback_query(F.data == "fun")
@@ -73,7 +85,7 @@ async def show_fun(callback: CallbackQuery):
         return
     await callback.message.edit_text(
         "Вот пидорские команды:",
-        reply_markup=get_fun_keyboard()
+        reply_markup=FUN_KEYBOARD
     )
 
 @router.callback_query(F.data == "back")
@@ -82,7 +94,7 @@ async def go_back(callback: CallbackQuery):
         return
     await callback.message.edit_text(
         "Вот пидорское меню команд:",
-        reply_markup=get_main_keyboard()
+        reply_markup=MAIN_KEYBOARD
     )
 
 @router.callback_query(F.data == "close")
@@ -92,16 +104,64 @@ async def close_menu(callback: CallbackQuery):
     await callback.message.reply_to_message.delete()
     await callback.message.delete()
 
+# Кнопка меню -> команда. Команды вызываются напрямую, без повторной отправки /команды пользователем
+MENU_COMMANDS: dict[str, Callable[..., Awaitable[CommandResult]]] = {
+    'addme': lambda ctx, session, leaderboards, **_: addme_command(ctx, session, leaderboards),
+    'disableme': lambda ctx, session, leaderboards, **_: disableme_command(ctx, session, leaderboards),
+    'daily_status': lambda ctx, session, scheduler, **_: daily_status_command(ctx, session, scheduler),
+    'ratings': lambda ctx, session, leaderboards, **_: leaderboard_command(ctx, session, leaderboards, 'rating'),
+    'masters': lambda ctx, session, leaderboards, **_: leaderboard_command(ctx, session, leaderboards, 'master_count'),
+    'slaves': lambda ctx, session, leaderboards, **_: leaderboard_command(ctx, session, leaderboards, 'slave_count'),
+    'picture': lambda ctx, session, vk_handler, chat_settings, **_: picture_command(
+        ctx, session, vk_handler, chat_settings
+    ),
+}
+
+def _with_back_button(markup: InlineKeyboardMarkup | None) -> InlineKeyboardMarkup:
+    """Добавляет к клавиатуре результата кнопку возврата в меню."""
+    if markup is None:
+        return BACK_KEYBOARD
+    back = BACK_KEYBOARD.inline_keyboard[0]
+    return InlineKeyboardMarkup(inline_keyboard=[*markup.inline_keyboard, back])
+
 @router.callback_query(F.data.startswith("cmd_"))
-async def handle_command_button(callback: CallbackQuery):
-    """Обработчик кнопок команд."""
+async def handle_command_button(
+    callback: CallbackQuery,
+    session,
+    leaderboards: TtlCache,
+    scheduler: Scheduler,
+    vk_handler: VKHandler,
+    chat_settings: ChatSettingsCache
+):
+    """Выполняет команду кнопки и показывает результат на месте меню."""
     # Проверяем, что кнопку нажал тот же пользователь, который вызвал меню
     if callback.message.reply_to_message and callback.message.reply_to_message.from_user.id != callback.from_user.id:
         return
 
-    command = callback.data.replace("cmd_", "")
-    user_mention = f"@{callback.from_user.username if callback.from_user.username else callback.from_user.id}"
-    await callback.message.answer(f"{user_mention}\nвот нужная тебе команда: /{command}")
-    await callback.message.reply_to_message.delete()
-    await callback.message.delete()
-    
+    command = MENU_COMMANDS.get(callback.data.replace("cmd_", ""))
+    if command is None:
+        await callback.answer()
+        return
+
+    result = await command(
+        CommandContext.from_callback(callback),
+        session=session,
+        leaderboards=leaderboards,
+        scheduler=scheduler,
+        vk_handler=vk_handler,
+        chat_settings=chat_settings
+    )
+
+    if result.drop_request:
+        await callback.answer(result.text, show_alert=True)
+    elif result.photo:
+        # Текстовое сообщение меню нельзя превратить в фото - отправляем фото вместо меню
+        await callback.message.answer_photo(photo=result.photo, caption=result.text)
+        await callback.message.delete()
+    else:
+        await callback.message.edit_text(
+            result.text,
+            parse_mode=result.parse_mode,
+            reply_markup=_with_back_button(result.reply_markup)
+        )
+        await callback.answer()
@@ -5,11 +5,17 @@ import logging
 from aiogram import Router
 from aiogram.filters import Command, ChatMemberUpdatedFilter, IS_NOT_MEMBER, IS_MEMBER
 from aiogram.types import Message, ChatMemberUpdated
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
 # Локальные импорты
+from core.commands import CommandContext, CommandResult, send_result
+from core.member_events import MemberEventAggregator
 from core.scheduler import Scheduler
-from database.models import Chat, User, UserStats
+from core.ttl_cache import TtlCache
+from database import queries
+from database.fast import get_chat_record, get_user_record
+from database.members import Registration, deactivate_member, register_member
+from database.models import Chat
 
 
 router = Router()
@@ -42,9 +48,7 @@ async def cmd_start(message: Message, session, scheduler: Scheduler):
         handler = RegistrationHandler()
         
         # Проверяем существование чата
-        chat = await handler._get_chat(session, message.chat.id)
-        
-        if chat:
+        if await get_chat_record(session, message.chat.id):
             await message.reply("Бот уже активирован в группе!")
             return
             
@@ -63,8 +67,7 @@ class RegistrationHandler:
     @staticmethod
     async def _get_chat(session, chat_id: int) -> Chat | None:
         """Получает существующий чат."""
-        query = select(Chat).where(Chat.chat_id == chat_id)
-        result = await session.execute(query)
+        result = await session.execute(queries.GET_CHAT, {'chat_id': chat_id})
         return result.scalar_one_or_none()
 
     @staticmethod
@@ -75,50 +78,6 @@ class RegistrationHandler:
         await session.commit()
         return chat
 
-    @staticmethod
-    async def _get_user(session, user_id: int, chat_id: int) -> User | None:
-        """Получает пользователя из базы данных."""
-        query = select(User).where(
-            User.user_id == user_id,
-            User.chat_id == chat_id
-        )
-        result = await session.execute(query)
-        return result.scalar_one_or_none()
-
-    @staticmethod
-    async def _create_user(session, user_id: int, chat_id: int, username: str | None, is_active: bool = True) -> User:
-        """Создает нового пользователя и его статистику."""
-        new_user = User(
-            user_id=user_id,
-            chat_id=chat_id,
-            username=username,
-            is_active=is_active
-        )
-        session.add(new_user)
-        await session.flush()
-
-        # Создаем запись в таблице статистики
-        new_stats = UserStats(id=new_user.id)
-        session.add(new_stats)
-        await session.commit()
-
-        return new_user
-
-    @staticmethod
-    async def _deactivate_user(session, user: User) -> bool:
-        """Деактивирует пользователя в чате.
-        
-        Returns:
-            bool: True если пользователь был активен и деактивирован,
-                 False если пользователь уже был неактивен
-        """
-        if not user.is_active:
-            return False
-            
-        user.is_active = False
-        await session.commit()
-        return True
-
     @staticmethod
     async def _setup_new_chat(session, chat: Chat, scheduler: Scheduler) -> bool:
         """Настраивает новый чат и планирует задачи.
@@ -148,111 +107,74 @@ class RegistrationHandler:
         await session.commit()
         return True
 
-@router.message(Command("addme"))
-async def cmd_addme(message: Message, session):
-    """Обработчик команды регистрации пользователя в чате."""
-    if message.chat.type == 'private':
-        await message.reply("Эта команда работает только в групповых чатах!")
-        return
+async def addme_command(ctx: CommandContext, session, leaderboards: TtlCache) -> CommandResult:
+    """Регистрирует пользователя в поиске (или возвращает деактивированного)."""
+    if ctx.is_private:
+        return CommandResult("Эта команда работает только в групповых чатах!")
 
     try:
-        handler = RegistrationHandler()
-        
-        # Проверяем существование чата
-        chat = await handler._get_chat(session, message.chat.id)
-        if not chat:
-            await message.reply("Этот чат не зарегистрирован! Сначала выполните команду /start")
-            return
-
-        # Проверяем существование пользователя
-        user = await handler._get_user(session, message.from_user.id, message.chat.id)
-
-        if user:
-            if not user.is_active:
-                user.is_active = True
-                await session.commit()
-                await message.reply("Вы снова доступны для поиска пидоров!")
-                return
-            await message.reply("Вы уже учавствуете в поиске пидоров!")
-            return
+        # Один запрос вместо проверки чата, поиска пользователя и вставок; незарегистрированный чат - внешний ключ
+        try:
+            registration = await register_member(session, ctx.chat_id, ctx.user_id, ctx.username)
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            return CommandResult("Этот чат не зарегистрирован! Сначала выполните команду /start")
 
-        # Создаем нового пользователя
-        await handler._create_user(
-            session,
-            message.from_user.id,
-            message.chat.id,
-            message.from_user.username,
-            is_active=True
-        )
+        if registration is Registration.ALREADY_ACTIVE:
+            return CommandResult("Вы уже учавствуете в поиске пидоров!")
 
-        await message.reply("Ты успешно зарегестрирован в кандидаты на пидора!")
+        leaderboards.invalidate(lambda key: key[0] == ctx.chat_id)
+        if registration is Registration.REACTIVATED:
+            return CommandResult("Вы снова доступны для поиска пидоров!")
+        return CommandResult("Ты успешно зарегестрирован в кандидаты на пидора!")
 
     except Exception as e:
-        await message.reply("Произошла ошибка при регистрации.")
-        logging.error(f"Error in cmd_addme: {e}")
+        logging.error(f"Error in addme: {e}")
+        return CommandResult("Произошла ошибка при регистрации.")
 
-@router.message(Command("disableme"))
-async def cmd_disableme(message: Message, session):
-    """Обработчик команды деактивации пользователя в чате."""
-    if message.chat.type == 'private':
-        await message.reply("Эта команда работает только в групповых чатах!")
-        return
+async def disableme_command(ctx: CommandContext, session, leaderboards: TtlCache) -> CommandResult:
+    """Убирает пользователя из поиска."""
+    if ctx.is_private:
+        return CommandResult("Эта команда работает только в групповых чатах!")
 
     try:
-        handler = RegistrationHandler()
-        
-        # Получаем пользователя
-        user = await handler._get_user(session, message.from_user.id, message.chat.id)
-
-        if not user:
-            await message.reply("Вы не учавствуете в поиске пидоров!")
-            return
-        
         # Деактивируем пользователя
-        if await handler._deactivate_user(session, user):
-            await message.reply("Вы успешно убраны из поиска пидоров! Используйте /addme чтобы снова добавиться в поиск.")
-        else:
-            await message.reply("Вы уже не учавствуете в поиске пидоров!")
+        if await deactivate_member(session, ctx.chat_id, ctx.user_id):
+            await session.commit()
+            leaderboards.invalidate(lambda key: key[0] == ctx.chat_id)
+            return CommandResult("Вы успешно убраны из поиска пидоров! Используйте /addme чтобы снова добавиться в поиск.")
+
+        # Редкий путь: различаем "не зарегистрирован" и "уже неактивен"
+        if await get_user_record(session, ctx.user_id, ctx.chat_id):
+            return CommandResult("Вы уже не учавствуете в поиске пидоров!")
+        return CommandResult("Вы не учавствуете в поиске пидоров!")
 
     except Exception as e:
-        await message.reply("Произошла ошибка при деактивации.")
-        logging.error(f"Error in cmd_disableme: {e}")
+        logging.error(f"Error in disableme: {e}")
+        return CommandResult("Произошла ошибка при деактивации.")
+
+@router.message(Command("addme"))
+async def cmd_addme(message: Message, session, leaderboards: TtlCache):
+    """Обработчик команды регистрации пользователя в чате."""
+    await send_result(message, await addme_command(CommandContext.from_message(message), session, leaderboards))
+
+@router.message(Command("disableme"))
+async def cmd_disableme(message: Message, session, leaderboards: TtlCache):
+    """Обработчик команды деактивации пользователя в чате."""
+    await send_result(message, await disableme_command(CommandContext.from_message(message), session, leaderboards))
 
 @router.chat_member(ChatMemberUpdatedFilter(IS_NOT_MEMBER))
-async def member_leave_chat(event: ChatMemberUpdated, session):
+async def member_leave_chat(event: ChatMemberUpdated, member_events: MemberEventAggregator):
     """Обработчик события когда участника удаляют или он выходит из чата."""
-    try:
-        handler = RegistrationHandler()
-        
-        # Получаем пользователя
-        user = await handler._get_user(session, event.old_chat_member.user.id, event.chat.id)
-        
-        if user:
-            # Деактивируем пользователя
-            await handler._deactivate_user(session, user)
-            await event.bot.send_message(
-                chat_id=event.chat.id,
-                text=f"Пользователь {user.username or user.user_id} сбежал из видимости моего радара!"
-            )
-            logging.info(f"Пользователь {user.username or user.user_id} деактивирован в чате {event.chat.id}")
-            
-    except Exception as e:
-        logging.error(f"Ошибка при обработке удаления участника: {e}")
+    # Деактивация и прощание - пачкой по окончании окна событий чата
+    member_events.left(event.chat.id, event.old_chat_member.user.id)
 
 @router.chat_member(ChatMemberUpdatedFilter(IS_MEMBER))
-async def member_join_chat(event: ChatMemberUpdated):
+async def member_join_chat(event: ChatMemberUpdated, member_events: MemberEventAggregator):
     """Обработчик события когда участник присоединяется к чату."""
-    try:
-
-        username = event.new_chat_member.user.username or event.new_chat_member.user.first_name
-        await event.bot.send_message(
-            chat_id=event.chat.id,
-            text=f"Привет, {username}! 👋\n\n"
-                    f"Если хочешь участвовать в поиске пидорасов, используй команду /addme"
-        )
-            
-    except Exception as e:
-        logging.error(f"Ошибка при обработке присоединения участника: {e}")
+    user = event.new_chat_member.user
+    member_events.joined(event.chat.id, user.id, user.username or user.first_name)
 
 @router.my_chat_member(ChatMemberUpdatedFilter(IS_NOT_MEMBER))
 async def bot_removed_from_chat(event: ChatMemberUpdated, session):
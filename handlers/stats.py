@@ -1,51 +1,140 @@
 # Стандартные библиотеки
 import logging
+from dataclasses import dataclass
 
 # Сторонние библиотеки
-from aiogram import Router
+from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message
-from sqlalchemy import select
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy import select, tuple_
 
 # Локальные импорты
+from core.commands import CommandContext, CommandResult, send_result
+from core.ttl_cache import TtlCache
 from database.models import User, UserStats
+from database.records import LeaderboardRow
 
 router = Router()
 
+PAGE_SIZE = 30
+
+# Поле статистики -> (колонка сортировки, заголовок)
+LEADERBOARDS = {
+    'rating': (UserStats.rating, "📊 <b>Рейтинг пидорасов:</b>"),
+    'master_count': (UserStats.master_count, "👑 <b>Статистика пидоров дня:</b>"),
+    'slave_count': (UserStats.slave_count, "🔗 <b>Статистика пассивов:</b>"),
+}
+
+LEADERBOARD_ERRORS = {
+    'rating': "Произошла ошибка при получении рейтинга.",
+    'master_count': "Произошла ошибка при получении статистики мастеров.",
+    'slave_count': "Произошла ошибка при получении статистики рабов.",
+}
+
+# Позиция строки в сортировке (is_active, значение поля, users.id) для keyset-пагинации
+Cursor = tuple[bool, int, int]
+
+@dataclass(frozen=True)
+class Leaderboard:
+    """Готовая страница лидерборда, общая для всех, кто ее запросил."""
+    field: str
+    page: int
+    lines: tuple[str, ...]
+    user_lines: dict[int, int]  # user_id -> индекс строки пользователя
+    first: Cursor | None = None
+    last: Cursor | None = None
+    has_next: bool = False
+
+    def render(self, command_user_id: int) -> str:
+        """Собирает текст, отмечая клоуном вызвавшего команду."""
+        index = self.user_lines.get(command_user_id)
+        if index is None:
+            return "\n".join(self.lines)
+        lines = list(self.lines)
+        lines[index] = f"{lines[index]} 🤡"
+        return "\n".join(lines)
+
+    def keyboard(self) -> InlineKeyboardMarkup | None:
+        """Кнопки перелистывания страниц."""
+        if self.page == 1 and not self.has_next:
+            return None
+
+        builder = InlineKeyboardBuilder()
+        buttons = []
+        if self.page > 1:
+            buttons.append(InlineKeyboardButton(
+                text="◀️",
+                callback_data=_page_callback(self.field, 'p', self.page - 1, self.first)
+            ))
+        if self.has_next:
+            buttons.append(InlineKeyboardButton(
+                text="▶️",
+                callback_data=_page_callback(self.field, 'n', self.page + 1, self.last)
+            ))
+        builder.row(*buttons)
+        return builder.as_markup()
+
+def _page_callback(field: str, direction: str, page: int, cursor: Cursor) -> str:
+    """callback_data страницы: lb:<поле>:<n|p>:<страница>:<is_active>:<значение>:<id>."""
+    return f"lb:{field}:{direction}:{page}:{int(cursor[0])}:{cursor[1]}:{cursor[2]}"
+
 class StatsHandler:
     @staticmethod
-    async def _get_chat_users_stats(
+    async def _get_stats_page(
         session,
         chat_id: int,
-        order_by_field = UserStats.rating
-    ) -> list[tuple[User, UserStats]]:
+        order_by_field,
+        cursor: Cursor | None = None,
+        backward: bool = False,
+        limit: int = PAGE_SIZE
+    ) -> list[LeaderboardRow]:
         """
-        Получает всех пользователей чата с их статистикой.
+        Получает страницу пользователей чата с их статистикой (keyset-пагинация).
         
         Args:
             session: Сессия базы данных
             chat_id: ID чата
-            order_by_field: Поле для сортировки (по умолчанию rating)
+            order_by_field: Поле для сортировки
+            cursor: Позиция, после (или перед) которой начинается страница
+            backward: Выбирать строки перед cursor, а не после
+            limit: Максимальное число строк
         
         Returns:
-            list[tuple[User, UserStats]]: Список пар (пользователь, статистика)
+            list[LeaderboardRow]: Строки пользователей со статистикой в порядке лидерборда
         """
+        # Сначала активные, затем по указанному полю, id - для однозначного порядка
+        sort_key = (User.is_active, order_by_field, User.id)
         query = (
-            select(User, UserStats)
+            select(
+                User.id,
+                User.user_id,
+                User.username,
+                User.is_active,
+                UserStats.rating,
+                UserStats.master_count,
+                UserStats.slave_count
+            )
             .join(UserStats, User.id == UserStats.id)
             .where(User.chat_id == chat_id)
-            .order_by(
-                User.is_active.desc(),  # Сначала активные
-                order_by_field.desc()   # Затем по указанному полю
-            )
         )
-        result = await session.execute(query)
-        return result.all()
+
+        if cursor is not None:
+            position = tuple_(*sort_key)
+            query = query.where(position > cursor if backward else position < cursor)
+
+        if backward:
+            query = query.order_by(*(column.asc() for column in sort_key))
+        else:
+            query = query.order_by(*(column.desc() for column in sort_key))
+
+        result = await session.execute(query.limit(limit))
+        rows = [LeaderboardRow(*row) for row in result.all()]
+        return rows[::-1] if backward else rows
 
     @staticmethod
     def _format_stats_line(
-        user: User,
-        stats: UserStats,
+        row: LeaderboardRow,
         is_command_user: bool,
         field: str = 'rating'
     ) -> str:
@@ -53,15 +142,14 @@ class StatsHandler:
         Форматирует строку статистики пользователя.
         
         Args:
-            user: Пользователь
-            stats: Статистика пользователя
+            row: Строка пользователя со статистикой
             is_command_user: Является ли пользователь вызвавшим команду
             field: Поле статистики ('rating', 'master_count', 'slave_count')
         """
-        name = user.username or f"User{user.user_id}"
+        name = row.username or f"User{row.user_id}"
         
         # Получаем значение и суффикс в зависимости от поля
-        value = getattr(stats, field)
+        value = getattr(row, field)
         suffix = {
             'rating': 'очков',
             'master_count': 'раз(а)',
@@ -76,153 +164,144 @@ class StatsHandler:
             line = f"{line} 🤡"
         
         # Зачеркиваем неактивных пользователей
-        if not user.is_active:
+        if not row.is_active:
             line = f"{line}"
             
         return line
 
-@router.message(Command("ratings"))
-async def cmd_ratings(message: Message, session):
-    """Показывает рейтинг всех участников чата."""
-    if message.chat.type == 'private':
-        await message.reply("Эта команда работает только в групповых чатах!")
-        return
+    @staticmethod
+    async def _build_leaderboard(
+        session,
+        chat_id: int,
+        field: str,
+        page: int = 1,
+        cursor: Cursor | None = None,
+        backward: bool = False
+    ) -> Leaderboard:
+        """Загружает страницу статистики чата и форматирует строки лидерборда."""
+        order_by_field, title = LEADERBOARDS[field]
 
-    try:
-        handler = StatsHandler()
-        
-        # Получаем всех пользователей с их статистикой
-        users_with_stats = await handler._get_chat_users_stats(
-            session,
-            message.chat.id,
-            UserStats.rating
-        )
-        
-        if not users_with_stats:
-            await message.reply("В этом чате пока нет зарегистрированных пользователей!")
-            return
-        
-        # Формируем список
-        lines = ["📊 <b>Рейтинг пидорасов:</b>\n"]
-        
-        # Добавляем активных пользователей
-        active_users = [
-            handler._format_stats_line(user, stats, user.user_id == message.from_user.id, 'rating')
-            for user, stats in users_with_stats
-            if user.is_active
-        ]
-        lines.extend(active_users)
-        
-        # Добавляем разделитель если есть неактивные пользователи
-        inactive_users = [
-            handler._format_stats_line(user, stats, user.user_id == message.from_user.id, 'rating')
-            for user, stats in users_with_stats
-            if not user.is_active
-        ]
-        if inactive_users:
-            lines.append("\n💤 <b>Неактивные пидорасы:</b>")
-            lines.extend(inactive_users)
-        
-        # Отправляем сообщение
-        await message.answer(
-            "\n".join(lines),
-            parse_mode="HTML"
+        # Лишняя строка показывает, есть ли следующая страница
+        rows = await StatsHandler._get_stats_page(
+            session, chat_id, order_by_field, cursor, backward, PAGE_SIZE + 1
         )
+        if backward:
+            has_next = True
+            rows = rows[-PAGE_SIZE:]
+        else:
+            has_next = len(rows) > PAGE_SIZE
+            rows = rows[:PAGE_SIZE]
 
-    except Exception as e:
-        await message.reply("Произошла ошибка при получении рейтинга.")
-        logging.error(f"Error in cmd_ratings: {e}")
+        if not rows:
+            return Leaderboard(field=field, page=page, lines=(), user_lines={})
 
-@router.message(Command("masters"))
-async def cmd_masters(message: Message, session):
-    """Показывает статистику мастеров."""
-    if message.chat.type == 'private':
-        await message.reply("Эта команда работает только в групповых чатах!")
-        return
+        lines = [f"{title} (стр. {page})\n" if page > 1 or has_next else f"{title}\n"]
+        user_lines = {}
 
-    try:
-        handler = StatsHandler()
-        
-        # Получаем пользователей, сортированных по master_count
-        users_with_stats = await handler._get_chat_users_stats(
-            session,
-            message.chat.id,
-            UserStats.master_count
+        # Перед первым неактивным пользователем на странице ставим разделитель
+        previous_active = True
+        for row in rows:
+            if not row.is_active and previous_active:
+                lines.append("\n💤 <b>Неактивные пидорасы:</b>")
+            previous_active = row.is_active
+            user_lines[row.user_id] = len(lines)
+            lines.append(StatsHandler._format_stats_line(row, False, field))
+
+        def position(row: LeaderboardRow) -> Cursor:
+            return (row.is_active, getattr(row, field), row.id)
+
+        return Leaderboard(
+            field=field,
+            page=page,
+            lines=tuple(lines),
+            user_lines=user_lines,
+            first=position(rows[0]),
+            last=position(rows[-1]),
+            has_next=has_next
         )
-        
-        if not users_with_stats:
-            await message.reply("В этом чате пока нет зарегистрированных пользователей!")
-            return
-        
-        lines = ["👑 <b>Статистика пидоров дня:</b>\n"]
-        
-        # Активные пользователи
-        active_users = [
-            handler._format_stats_line(user, stats, user.user_id == message.from_user.id, 'master_count')
-            for user, stats in users_with_stats
-            if user.is_active
-        ]
-        lines.extend(active_users)
-        
-        # Неактивные пользователи
-        inactive_users = [
-            handler._format_stats_line(user, stats, user.user_id == message.from_user.id, 'master_count')
-            for user, stats in users_with_stats
-            if not user.is_active
-        ]
-        if inactive_users:
-            lines.append("\n💤 <b>Неактивные пидорасы:</b>")
-            lines.extend(inactive_users)
-        
-        await message.answer("\n".join(lines), parse_mode="HTML")
 
+async def _get_leaderboard(
+    session,
+    leaderboards: TtlCache,
+    chat_id: int,
+    field: str,
+    page: int = 1,
+    cursor: Cursor | None = None,
+    backward: bool = False
+) -> Leaderboard:
+    """Страница лидерборда. Повторный запрос в течение LEADERBOARD_TTL берется из кэша."""
+    return await leaderboards.get_or_load(
+        (chat_id, field, page, cursor, backward),
+        lambda: StatsHandler._build_leaderboard(session, chat_id, field, page, cursor, backward)
+    )
+
+async def leaderboard_command(
+    ctx: CommandContext,
+    session,
+    leaderboards: TtlCache,
+    field: str
+) -> CommandResult:
+    """Первая страница лидерборда."""
+    if ctx.is_private:
+        return CommandResult("Эта команда работает только в групповых чатах!")
+
+    try:
+        leaderboard = await _get_leaderboard(session, leaderboards, ctx.chat_id, field)
     except Exception as e:
-        await message.reply("Произошла ошибка при получении статистики мастеров.")
-        logging.error(f"Error in cmd_masters: {e}")
+        logging.error(f"Error in leaderboard {field}: {e}")
+        return CommandResult(LEADERBOARD_ERRORS[field])
 
-@router.message(Command("slaves"))
-async def cmd_slaves(message: Message, session):
-    """Показывает статистику рабов."""
-    if message.chat.type == 'private':
-        await message.reply("Эта команда работает только в групповых чатах!")
-        return
+    if not leaderboard.lines:
+        return CommandResult("В этом чате пока нет зарегистрированных пользователей!")
+
+    return CommandResult(
+        leaderboard.render(ctx.user_id),
+        parse_mode="HTML",
+        reply_markup=leaderboard.keyboard(),
+        as_reply=False
+    )
 
+@router.callback_query(F.data.startswith("lb:"))
+async def handle_leaderboard_page(callback: CallbackQuery, session, leaderboards: TtlCache):
+    """Перелистывает страницу лидерборда в том же сообщении."""
     try:
-        handler = StatsHandler()
-        
-        # Получаем пользователей, сортированных по slave_count
-        users_with_stats = await handler._get_chat_users_stats(
+        _, field, direction, page, is_active, value, user_pk = callback.data.split(":")
+        leaderboard = await _get_leaderboard(
             session,
-            message.chat.id,
-            UserStats.slave_count
+            leaderboards,
+            callback.message.chat.id,
+            field,
+            int(page),
+            (is_active == '1', int(value), int(user_pk)),
+            direction == 'p'
         )
-        
-        if not users_with_stats:
-            await message.reply("В этом чате пока нет зарегистрированных пользователей!")
+
+        if not leaderboard.lines:
+            await callback.answer("Эта страница уже пуста")
             return
-        
-        lines = ["🔗 <b>Статистика пассивов:</b>\n"]
-        
-        # Активные пользователи
-        active_users = [
-            handler._format_stats_line(user, stats, user.user_id == message.from_user.id, 'slave_count')
-            for user, stats in users_with_stats
-            if user.is_active
-        ]
-        lines.extend(active_users)
-        
-        # Неактивные пользователи
-        inactive_users = [
-            handler._format_stats_line(user, stats, user.user_id == message.from_user.id, 'slave_count')
-            for user, stats in users_with_stats
-            if not user.is_active
-        ]
-        if inactive_users:
-            lines.append("\n💤 <b>Неактивные пидорасы:</b>")
-            lines.extend(inactive_users)
-        
-        await message.answer("\n".join(lines), parse_mode="HTML")
+
+        await callback.message.edit_text(
+            leaderboard.render(callback.from_user.id),
+            parse_mode="HTML",
+            reply_markup=leaderboard.keyboard()
+        )
+        await callback.answer()
 
     except Exception as e:
-        await message.reply("Произошла ошибка при получении статистики рабов.")
-        logging.error(f"Error in cmd_slaves: {e}") 
\ No newline at end of file
+        await callback.answer("Не удалось открыть страницу")
+        logging.error(f"Error in handle_leaderboard_page: {e}")
+
+@router.message(Command("ratings"))
+async def cmd_ratings(message: Message, session, leaderboards: TtlCache):
+    """Показывает рейтинг всех участников чата."""
+    await send_result(message, await leaderboard_command(CommandContext.from_message(message), session, leaderboards, 'rating'))
+
+@router.message(Command("masters"))
+async def cmd_masters(message: Message, session, leaderboards: TtlCache):
+    """Показывает статистику мастеров."""
+    await send_result(message, await leaderboard_command(CommandContext.from_message(message), session, leaderboards, 'master_count'))
+
+@router.message(Command("slaves"))
+async def cmd_slaves(message: Message, session, leaderboards: TtlCache):
+    """Показывает статистику рабов."""
+    await send_result(message, await leaderboard_command(CommandContext.from_message(message), session, leaderboards, 'slave_count'))
@@ -1,51 +1,168 @@
 # Стандартные библиотеки
 import asyncio
 import logging
+import sys
+import time
+
+STARTED_AT = time.perf_counter()
 
 # Сторонние библиотеки
 from aiogram import Bot, Dispatcher
 
 # Локальные импорты
 from config import load_config
+from core.chat_settings import ChatSettingsCache
+from core.clock import clock
 from core.generals import send_status_message
-from core.middleware import SchedulerMiddleware, VKMiddleware
+from core.fsm_storage import SqlStorage
+from core.lifecycle import Lifecycle
+from core.log_pipeline import setup_logging
+from core.member_events import MemberEventAggregator
+from core.outbox import OutboxWorker
+from core.telegram_session import create_bot_session
+from core.usernames import UsernameTracker
+from core.chat_executor import ChatKeyedExecutor
+from core.daily_button import daily_button
+from core.middleware import (
+    SchedulerMiddleware,
+    VKMiddleware,
+    StartupProfilerMiddleware,
+    LoggingContextMiddleware,
+    ChatSerializationMiddleware,
+    LeaderboardMiddleware,
+    ChatSettingsMiddleware,
+    LifecycleMiddleware,
+    MemberEventsMiddleware,
+    UsernameMiddleware
+)
+from core.ttl_cache import TtlCache
+from core.profiler import StartupProfiler
 from core.scheduler import Scheduler
 from database import DatabaseMiddleware, Database, DatabaseConfig
 from handlers import registration, daily, stats, admin, entertainment, help
 
-# Включаем логирование
+IMPORTS_DONE_AT = time.perf_counter()
+
+# Включаем логирование (до загрузки конфига, затем заменяется на очередь)
 logging.basicConfig(level=logging.INFO)
 
 config_path = ".env"
 
+async def finish_startup(bot: Bot, db: Database, scheduler: Scheduler, profiler: StartupProfiler):
+    """Восстанавливает задачи в фоне, пока бот уже принимает апдейты.
+
+    Параллельный /start того же чата не создаст вторую задачу:
+    schedule_daily_master проверяет задачи чата под блокировкой чата.
+    """
+    try:
+        # Проверяем пропущенные сообщения и настраиваем задачи
+        with profiler.phase("восстановление задач"):
+            async for session in db.get_session():
+                await scheduler.check_missed_dailies(session)
+                await scheduler.setup_jobs(session)
+
+        # Отправляем сообщение о запуске
+        await send_status_message(
+            bot,
+            db,
+            "🟢 Бот запущен и готов к работе!"
+        )
+    except Exception as e:
+        logging.error(f"Ошибка при завершении запуска: {e}")
+
 async def main():
+    profiler = StartupProfiler("--profile-startup" in sys.argv, STARTED_AT)
+    profiler.record("импорты", IMPORTS_DONE_AT - STARTED_AT)
+
     # Загружаем конфиг
-    config = load_config(config_path)
-    
-    # Инициализируем бота и диспетчер
-    bot = Bot(token=config.tg_bot.token)
-    dp = Dispatcher()
+    with profiler.phase("конфиг"):
+        config = load_config(config_path)
+
+    # Переводим логирование на очередь с фоновым слушателем
+    log_listener = setup_logging(
+        config.logging.level,
+        config.logging.sampling,
+        config.logging.json
+    )
+
+    # Границы "сегодня" считаются в этом поясе, если у чата нет своего
+    clock.set_default_timezone(config.scheduler.timezone)
+
+    # Инициализируем бота
+    bot_session = create_bot_session(config.tg_bot.api_url, config.tg_bot.connection_limit)
+    bot = Bot(token=config.tg_bot.token, session=bot_session)
+    lifecycle = Lifecycle(config.updates.drain_timeout)
 
     # Инициализируем базу данных
-    db_config = DatabaseConfig(config)
-    db = Database(db_config)
-    
+    with profiler.phase("движок БД"):
+        db_config = DatabaseConfig(config)
+        db = Database(db_config)
+
+    # Состояния FSM переживают перезапуск; хранилище закрывает Dispatcher при остановке polling
+    if config.fsm.storage_url:
+        fsm_storage = SqlStorage.from_url(
+            config.fsm.storage_url, ttl=config.fsm.ttl, cache_size=config.fsm.cache_size
+        )
+    else:
+        fsm_storage = SqlStorage(db, ttl=config.fsm.ttl, cache_size=config.fsm.cache_size)
+    dp = Dispatcher(storage=fsm_storage)
+
+    # Настройки чатов читаются из памяти; загружаются одним запросом перед polling
+    chat_settings = ChatSettingsCache(clock)
+
+    # Отправка запланированных сообщений из outbox
+    outbox = OutboxWorker(bot, db, config.scheduler.outbox_concurrency)
+
     # Инициализируем и настраиваем планировщик
-    scheduler = Scheduler(bot, db)
+    # Задачи хранятся в Postgres, если не указано другое хранилище (например, sqlite:///jobs.sqlite)
+    with profiler.phase("планировщик"):
+        scheduler = Scheduler(
+            bot,
+            db,
+            config.scheduler.jobstore_url or db_config.sync_database_url,
+            config.scheduler.max_sends_per_second,
+            lifecycle,
+            outbox,
+            chat_settings
+        )
 
-    # Инициализируем VK API
+    # Инициализируем VK API (клиент создается лениво)
     vk_middleware = VKMiddleware(config.vk.token)
-    
+
+    # Имена пользователей обновляются пачками, лидерборды с новыми именами сбрасываются
+    leaderboards = TtlCache(config.updates.leaderboard_ttl)
+    usernames = UsernameTracker(db, leaderboards, config.updates.username_flush_interval)
+
+    # Входы и выходы участников обрабатываются пачками по чатам
+    member_events = MemberEventAggregator(
+        bot,
+        db,
+        leaderboards,
+        config.member_events.window,
+        config.member_events.max_delay,
+        config.member_events.message_interval,
+        config.member_events.max_names
+    )
+
     # Добавляем middleware
+    profiler_middleware = StartupProfilerMiddleware(profiler)
+    if profiler.enabled:
+        dp.update.outer_middleware(profiler_middleware)
+    # Учет незавершенных апдейтов для корректной остановки
+    dp.update.outer_middleware(LifecycleMiddleware(lifecycle))
+    dp.update.outer_middleware(LoggingContextMiddleware())
+    dp.update.outer_middleware(UsernameMiddleware(usernames))
+    # Апдейты одного чата выполняются последовательно
+    chat_executor = ChatKeyedExecutor(config.updates.max_chat_queue)
+    dp.update.outer_middleware(ChatSerializationMiddleware(chat_executor))
     dp.update.middleware(DatabaseMiddleware(db))
     dp.update.middleware(SchedulerMiddleware(scheduler))
     dp.update.middleware(vk_middleware)
-    # Проверяем пропущенные сообщения и настраиваем задачи
-    async for session in db.get_session():
-        await scheduler.check_missed_dailies(session)
-        await scheduler.setup_jobs(session)
+    dp.update.middleware(LeaderboardMiddleware(leaderboards))
+    dp.update.middleware(MemberEventsMiddleware(member_events))
+    dp.update.middleware(ChatSettingsMiddleware(chat_settings))
 
-    # Регистрируем роутеры
+    # Регистрируем роутеры до старта polling
     dp.include_router(registration.router)
     dp.include_router(daily.router)
     dp.include_router(stats.router)
@@ -53,17 +170,40 @@ async def main():
     dp.include_router(entertainment.router)
     dp.include_router(help.router)
 
+    # Шаги остановки выполняются после того, как дождались незавершенной работы
+    lifecycle.on_shutdown("сообщение о выключении", lambda: send_status_message(
+        bot,
+        db,
+        "🔴 Бот выключается на техническое обслуживание..."
+    ))
+    lifecycle.on_shutdown("события участников", member_events.stop)
+    lifecycle.on_shutdown("outbox", outbox.stop)
+    lifecycle.on_shutdown("часы", clock.stop)
+    lifecycle.on_shutdown("имена пользователей", usernames.stop)
+    lifecycle.on_shutdown("метрики Bot API", lambda: logging.info(
+        f"Запросы к Bot API:\n{bot_session.latency.report()}\nповторы: {bot_session.retry.stats}"
+    ))
+    lifecycle.on_shutdown("метрики обработки", lambda: logging.info(
+        f"Очереди чатов: {chat_executor.stats}\nкнопки розыгрыша: {daily_button.stats}"
+    ))
+    lifecycle.on_shutdown("сессия бота", bot.session.close)
+    lifecycle.on_shutdown("пулы БД", db.close)
+
     # Пропускаем накопившиеся апдейты и запускаем polling
-    await bot.delete_webhook(drop_pending_updates=True)
+    with profiler.phase("сброс вебхука"):
+        await bot.delete_webhook(drop_pending_updates=True)
+    with profiler.phase("настройки чатов"):
+        async for session in db.get_session():
+            await chat_settings.load(session)
+    outbox.start()
+    await fsm_storage.start()
+    usernames.start()
+    clock.start()
+    startup_task = asyncio.create_task(finish_startup(bot, db, scheduler, profiler))
+    profiler_middleware.polling_started()
     try:
-        # Отправляем сообщение о запуске
-        await send_status_message(
-            bot, 
-            db, 
-            "🟢 Бот запущен и готов к работе!"
-        )
-
-        await dp.start_polling(bot, allowed_updates=[
+        # Сессию бота закрывает Lifecycle, когда хендлеры уже завершились
+        await dp.start_polling(bot, close_bot_session=False, allowed_updates=[
             "message",
             "chat_member",
             "my_chat_member",
@@ -73,13 +213,14 @@ async def main():
         logging.error(f"Критическая ошибка: {e}")
         raise e
     finally:
-        # Отправляем сообщение о выключении
-        await send_status_message(
-            bot, 
-            db, 
-            "🔴 Бот выключается на техническое обслуживание..."
-        )
-        await bot.session.close()
+        # Polling уже остановлен (SIGTERM/SIGINT обрабатывает aiogram): прерываем незаконченный
+        # запуск, останавливаем планировщик и дожидаемся апдейтов и задач, которые еще выполняются
+        startup_task.cancel()
+        await asyncio.gather(startup_task, return_exceptions=True)
+        scheduler.shutdown()
+        await lifecycle.shutdown()
+        # Последним сбрасываем очередь логов, чтобы записать и логи остановки
+        log_listener.stop()
 
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())